@@ -0,0 +1,112 @@
+"""
+Recall@k against query latency for the IVF vector index, across probe counts
+and corpus sizes.
+
+For each --sizes corpus of clustered synthetic unit vectors (or the
+embeddings of an indexed --root), builds the quantized index with IVF
+partitions, then for each --probes value searches RERANK_FACTOR * k
+candidates and re-ranks them exactly, as query_collection does. Ground truth
+is exact float32 search. "flat" is the unpartitioned scan.
+
+    python benchmarks/ann_recall.py --sizes 100000,1000000 --probes 1,4,16,64 --plot ann.png
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from quantize import QuantizedIndex, make_codec
+from ivf import IVFPartitions
+from quantization import synthetic_vectors, collection_vectors
+
+
+def evaluate(index, vectors, queries, truth, k, rerank_factor, probes):
+    latencies, recalls = [], []
+    for query, expected in zip(queries, truth):
+        started = time.perf_counter()
+        candidates = np.fromiter(
+            (int(cid) for cid, _ in index.search(query, k * rerank_factor, probes=probes)), dtype=np.int64
+        )
+        exact = vectors[candidates] @ query
+        found = candidates[np.argsort(-exact)[:k]]
+        latencies.append(time.perf_counter() - started)
+        recalls.append(len(set(found.tolist()) & expected) / k)
+    return float(np.mean(recalls)), float(np.percentile(latencies, 50) * 1000), float(np.percentile(latencies, 95) * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="100000,300000")
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rerank-factor", type=int, default=4)
+    parser.add_argument("--probes", default="1,2,4,8,16,32,64")
+    parser.add_argument("--lists", type=int, default=0, help="IVF lists (0 = default for the size)")
+    parser.add_argument("--storage", default="float16")
+    parser.add_argument("--root", help="use the embeddings of an indexed codebase instead of synthetic data")
+    parser.add_argument("--plot", help="write a recall vs latency chart here (needs matplotlib)")
+    args = parser.parse_args()
+
+    probe_counts = [int(p) for p in args.probes.split(",")]
+    rows = []
+    sizes = [None] if args.root else [int(s) for s in args.sizes.split(",")]
+    for size in sizes:
+        if args.root:
+            vectors = collection_vectors(args.root)
+        else:
+            vectors = synthetic_vectors(size + args.queries, args.dim)
+        queries, vectors = vectors[:args.queries], vectors[args.queries:]
+        n = len(vectors)
+        truth = [set(np.argsort(-(vectors @ q))[:args.k].tolist()) for q in queries]
+
+        index = QuantizedIndex(make_codec(args.storage), IVFPartitions(args.lists))
+        started = time.perf_counter()
+        index.add([str(i) for i in range(n)], [""] * n, vectors)
+        build = time.perf_counter() - started
+        started = time.perf_counter()
+        trained = index.maintain()
+        train = time.perf_counter() - started
+        lists = len(index.ivf.centroids) if trained else 0
+        print(f"\n{n} vectors, dim {vectors.shape[1]}, {args.storage}: encode {build:.1f}s, "
+              f"{lists} lists trained in {train:.1f}s")
+        print(f"{'probes':>8s} {'recall@' + str(args.k):>10s} {'p50 ms':>8s} {'p95 ms':>8s}")
+        for probes in probe_counts + [None]:
+            if probes is not None and not trained:
+                continue
+            recall, p50, p95 = evaluate(index, vectors, queries, truth, args.k, args.rerank_factor, probes)
+            label = "flat" if probes is None else str(probes)
+            print(f"{label:>8s} {recall:10.3f} {p50:8.2f} {p95:8.2f}")
+            rows.append((n, label, recall, p50))
+
+    if args.plot:
+        try:
+            import matplotlib
+            matplotlib.use("Agg")
+            import matplotlib.pyplot as plt
+        except ImportError:
+            print("matplotlib is not installed; skipping the chart")
+            return
+        fig, ax = plt.subplots(figsize=(7, 4.5))
+        for n in sorted({r[0] for r in rows}):
+            points = [r for r in rows if r[0] == n]
+            ax.plot([r[3] for r in points], [r[2] for r in points], marker="o", label=f"{n:,} vectors")
+            for _, label, recall, p50 in points:
+                ax.annotate(label, (p50, recall), textcoords="offset points", xytext=(4, -10), fontsize=7)
+        ax.set_xscale("log")
+        ax.set_xlabel("p50 query latency (ms, log scale)")
+        ax.set_ylabel(f"recall@{args.k}")
+        ax.set_title("IVF probes: recall vs latency")
+        ax.grid(True, alpha=0.3)
+        ax.legend()
+        fig.tight_layout()
+        fig.savefig(args.plot)
+        print(f"Chart written to {args.plot}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Index size and query payload of inline chunk documents vs documents stored
+by reference (DOCUMENT_STORAGE=reference).
+
+Chunks the Python files under --root as build_index does. For inline
+storage it counts the chunk text that Chroma would keep and return. For
+reference storage it counts the reference metadata and the compressed blob
+store. It then resolves --queries random top-k result sets: cold, warm, and
+after --modify of the files have been edited, when the blob store has to
+answer. The edits are made in a temporary copy of --root.
+
+    python benchmarks/document_storage.py --root /path/to/codebase --k 10 --modify 0.2
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import docstore
+from docstore import BlobStore, PageCache, chunk_refs, resolve
+from manifest import text_hash
+from scan import scan_files, parse_file, chunk_file_by_definitions
+
+
+def ref_bytes(meta):
+    """Metadata a reference adds to a chunk, in place of its document."""
+    return len(json.dumps({k: meta[k] for k in ("start_byte", "end_byte", "doc_hash")}))
+
+
+def collect(root, blobs):
+    """[(reference metadata, chunk text)] for every chunk under root; texts go into blobs."""
+    chunks = []
+    for path in scan_files(root):
+        if not path.endswith(".py"):
+            continue
+        try:
+            source, tree = parse_file(path)
+        except (OSError, SyntaxError, ValueError):
+            continue
+        file_chunks = chunk_file_by_definitions(path, source, tree)
+        blobs.put_many((text_hash(c["code"]), c["code"]) for c in file_chunks)
+        for i, (chunk, (start, end)) in enumerate(zip(file_chunks, chunk_refs(path, source, file_chunks))):
+            meta = {"path": path, "chunk": i, "start_byte": start, "end_byte": end, "doc_hash": text_hash(chunk["code"])}
+            chunks.append((meta, chunk["code"]))
+    return chunks
+
+
+def resolve_sets(sets, root):
+    times, wrong = [], 0
+    for chunk_set in sets:
+        started = time.perf_counter()
+        texts = [resolve(meta, root) for meta, _ in chunk_set]
+        times.append(time.perf_counter() - started)
+        wrong += sum(text != code for text, (_, code) in zip(texts, chunk_set))
+    times.sort()
+    return times[len(times) // 2] * 1000, times[int(len(times) * 0.95)] * 1000, wrong
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--root", default=os.getcwd())
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--modify", type=float, default=0.2, help="fraction of files edited before the last pass")
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix="docstore_")
+    copy = os.path.join(scratch, "tree")
+    shutil.copytree(os.path.abspath(args.root), copy, ignore=shutil.ignore_patterns(".git", "node_modules", ".venv", "venv"))
+    try:
+        blobs = BlobStore(os.path.join(scratch, "blobs"))
+        chunks = collect(copy, blobs)
+        docstore._stores[copy] = blobs
+        inline = sum(len(code.encode("utf-8")) for _, code in chunks)
+        refs = sum(ref_bytes(meta) for meta, _ in chunks)
+        by_ref = sum(meta["start_byte"] >= 0 for meta, _ in chunks)
+        print(f"{len(chunks)} chunks, {by_ref} resolvable from the file ({by_ref / max(len(chunks), 1):.0%}; "
+              f"the rest are empty or in files whose bytes differ from their text)")
+        print(f"inline documents:      {inline / 1024:10.0f} KiB in the collection (before Chroma's full-text index)")
+        print(f"reference metadata:    {refs / 1024:10.0f} KiB in the collection")
+        print(f"compressed blob store: {blobs.nbytes / 1024:10.0f} KiB ({blobs.nbytes / max(inline, 1):.0%} of inline)")
+
+        rng = random.Random(0)
+        sets = [rng.sample(chunks, min(args.k, len(chunks))) for _ in range(args.queries)]
+        payload_inline = sum(len(code.encode("utf-8")) for s in sets for _, code in s) / len(sets)
+        payload_ref = sum(ref_bytes(meta) for s in sets for meta, _ in s) / len(sets)
+        print(f"\nquery payload, top {args.k}: inline documents {payload_inline / 1024:.1f} KiB, "
+              f"references {payload_ref / 1024:.1f} KiB")
+
+        docstore._pages = PageCache()
+        for label in ("cold page cache", "warm page cache"):
+            p50, p95, wrong = resolve_sets(sets, copy)
+            print(f"resolve {label:16s} p50 {p50:6.2f} ms  p95 {p95:6.2f} ms  wrong {wrong}")
+
+        paths = sorted({meta["path"] for meta, _ in chunks})
+        for path in rng.sample(paths, int(len(paths) * args.modify)):
+            with open(path, "r+", encoding="utf-8") as f:
+                text = f.read()
+                f.seek(0)
+                f.write("# edited\n" + text)
+        p50, p95, wrong = resolve_sets(sets, copy)
+        print(f"resolve after editing {args.modify:.0%} of files: p50 {p50:6.2f} ms  p95 {p95:6.2f} ms  wrong {wrong}")
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Output size and apply time of the two edit protocols.
+
+Synthetic mode makes a one-line change in every function of --root and
+renders it as the model would in each protocol: the whole chunk ("chunks")
+or a search/replace hunk with one line of context ("search_replace").
+It reports estimated output tokens and parse+apply time per edit, checks both
+modes produce the same file, and with --perturb mangles the SEARCH
+indentation/whitespace to exercise fuzzy matching and count fallbacks.
+
+With --traces, it summarizes real completions instead: trace JSONL exported
+from the GUI's Last Trace window, grouped by edit_format.
+
+    python benchmarks/edit_formats.py --root /path/to/codebase [--perturb]
+    python benchmarks/edit_formats.py --traces traces.jsonl
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from edit import parse_updated_chunks, apply_chunks_cross_file, EditMismatch
+from embedding_utils import estimate_tokens
+from scan import scan_files, chunk_file_by_definitions
+
+
+def chunk_output(path, chunk, new_code):
+    return (
+        f"--- FILE: {path} ---\n"
+        f"--- CHUNK START: lines {chunk['start']}-{chunk['end']} ---\n"
+        f"{new_code}\n"
+        "--- CHUNK END ---"
+    )
+
+
+def search_replace_output(path, old_lines, new_lines, line, perturb=False):
+    lo, hi = max(0, line - 1), min(len(old_lines), line + 2)
+    search = old_lines[lo:hi]
+    if perturb:
+        # What a sloppy model does: lose the indentation, pad the ends
+        search = [s.strip() + "  " for s in search]
+    return (
+        f"--- FILE: {path} ---\n"
+        "<<<<<<< SEARCH\n" + "\n".join(search) + "\n"
+        "=======\n" + "\n".join(new_lines[lo:hi]) + "\n"
+        ">>>>>>> REPLACE"
+    )
+
+
+def timed_apply(output):
+    started = time.perf_counter()
+    merged = apply_chunks_cross_file(parse_updated_chunks(output))
+    return merged, time.perf_counter() - started
+
+
+def synthetic(args):
+    rng = random.Random(0)
+    stats = {mode: {"tokens": [], "seconds": []} for mode in ("chunks", "search_replace")}
+    mismatches = disagreements = 0
+    for path in scan_files(args.root)[:args.max_files]:
+        try:
+            chunks = chunk_file_by_definitions(path)
+        except (SyntaxError, ValueError):
+            continue
+        for chunk in chunks:
+            old_lines = chunk["code"].splitlines()
+            if chunk["type"] != "function" or len(old_lines) < 3:
+                continue
+            line = rng.randrange(1, len(old_lines))
+            new_lines = list(old_lines)
+            new_lines[line] = new_lines[line] + "  # edited"
+            outputs = {
+                "chunks": chunk_output(path, chunk, "\n".join(new_lines)),
+                "search_replace": search_replace_output(path, old_lines, new_lines, line, args.perturb),
+            }
+            results = {}
+            for mode, output in outputs.items():
+                stats[mode]["tokens"].append(estimate_tokens(output))
+                try:
+                    results[mode], seconds = timed_apply(output)
+                    stats[mode]["seconds"].append(seconds)
+                except EditMismatch:
+                    mismatches += 1
+            if len(results) == 2 and results["chunks"] != results["search_replace"]:
+                disagreements += 1
+
+    n = len(stats["chunks"]["tokens"])
+    print(f"{n} single-line edits across functions in {args.root}" + (" (perturbed SEARCH)" if args.perturb else ""))
+    print(f"{'mode':15s} {'tokens/edit':>11s} {'p50 ms':>7s} {'p95 ms':>7s}")
+    for mode, s in stats.items():
+        if not s["seconds"]:
+            continue
+        print(f"{mode:15s} {np.mean(s['tokens']):11.1f} "
+              f"{np.percentile(s['seconds'], 50) * 1000:7.2f} {np.percentile(s['seconds'], 95) * 1000:7.2f}")
+    print(f"search blocks not located (would fall back): {mismatches}; results differing between modes: {disagreements}")
+
+
+def from_traces(path):
+    groups = defaultdict(lambda: defaultdict(list))
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            if record.get("span") == "completion":
+                group = groups[record.get("edit_format", "chunks")]
+                group["completion_tokens"].append(record.get("completion_tokens", 0))
+                group["ms"].append(record["duration_ms"])
+    print(f"{'mode':15s} {'n':>4s} {'out tokens':>10s} {'mean ms':>8s} {'ms/token':>8s}")
+    for mode, g in groups.items():
+        tokens, ms = np.mean(g["completion_tokens"]), np.mean(g["ms"])
+        print(f"{mode:15s} {len(g['ms']):4d} {tokens:10.0f} {ms:8.0f} {ms / max(tokens, 1):8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--root", default=os.getcwd())
+    parser.add_argument("--max-files", type=int, default=200)
+    parser.add_argument("--perturb", action="store_true", help="mangle SEARCH whitespace to test fuzzy matching")
+    parser.add_argument("--traces", help="summarize completion spans from an exported trace JSONL instead")
+    args = parser.parse_args()
+    if args.traces:
+        from_traces(args.traces)
+    else:
+        synthetic(args)
+
+
+if __name__ == "__main__":
+    main()
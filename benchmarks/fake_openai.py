@@ -0,0 +1,173 @@
+"""
+Local stand-in for the OpenAI embeddings and chat-completions endpoints.
+
+Embeddings are deterministic feature-hashed unit vectors, so texts that share
+identifiers are close. Chat completions return canned but well-formed answers
+for the prompts this project sends (JSON summaries, file rankings, edits).
+Latency and a requests-per-second limit (answered with 429) are configurable.
+
+    python benchmarks/fake_openai.py --port 8765 --latency-ms 50 --rps 20
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=test python main.py
+"""
+import argparse
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_DIMENSIONS = 1536
+TOKEN_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+
+
+def fake_embedding(text, dimensions=DEFAULT_DIMENSIONS):
+    vector = [0.0] * dimensions
+    for token in TOKEN_RE.findall(text.lower()) or [text]:
+        digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+        slot = int.from_bytes(digest[:4], "little") % dimensions
+        vector[slot] += 1.0 if digest[4] & 1 else -1.0
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+def fake_chat_answer(messages, json_mode):
+    prompt = "\n".join(m.get("content", "") for m in messages)
+    if json_mode and "file number" in prompt:
+        numbers = re.findall(r"^### File (\d+):", prompt, re.MULTILINE)
+        return json.dumps({"summaries": {n: f"Synthetic summary for file {n}." for n in numbers}})
+    if "rank the files" in prompt:
+        paths = re.findall(r"^\s*\d+\. (.+?):", prompt, re.MULTILINE)
+        return json.dumps(paths[:5])
+    targets = re.findall(r"\[TARGET\] File: (.+)\nChunk: .* \(lines (\d+)-(\d+)\)\n", prompt)
+    if targets:
+        path, start, end = targets[0]
+        return f"--- FILE: {path} ---\n--- CHUNK START: lines {start}-{end} ---\npass\n--- CHUNK END ---"
+    return "OK"
+
+
+class RateLimiter:
+    def __init__(self, rps):
+        self.rps = rps
+        self.allowance = rps
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def allow(self):
+        if not self.rps:
+            return True
+        with self.lock:
+            now = time.monotonic()
+            self.allowance = min(self.rps, self.allowance + (now - self.last) * self.rps)
+            self.last = now
+            if self.allowance < 1:
+                return False
+            self.allowance -= 1
+            return True
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency_ms=0.0, per_item_ms=0.0, rps=0):
+        super().__init__(address, Handler)
+        self.latency_ms = latency_ms
+        self.per_item_ms = per_item_ms
+        self.limiter = RateLimiter(rps)
+        self.stats = {"embeddings": 0, "embedded_inputs": 0, "chat": 0, "rate_limited": 0}
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+
+class Handler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        server = self.server
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if not server.limiter.allow():
+            server.stats["rate_limited"] += 1
+            self._send(429, {"error": {"message": "Rate limit reached", "type": "rate_limit_error"}},
+                       {"Retry-After": "0.1"})
+            return
+
+        if self.path.endswith("/embeddings"):
+            inputs = request.get("input", [])
+            inputs = [inputs] if isinstance(inputs, str) else inputs
+            time.sleep((server.latency_ms + server.per_item_ms * len(inputs)) / 1000.0)
+            dims = request.get("dimensions") or DEFAULT_DIMENSIONS
+            server.stats["embeddings"] += 1
+            server.stats["embedded_inputs"] += len(inputs)
+            tokens = sum(len(t) // 4 + 1 for t in inputs)
+            self._send(200, {
+                "object": "list",
+                "model": request.get("model"),
+                "data": [
+                    {"object": "embedding", "index": i, "embedding": fake_embedding(text, dims)}
+                    for i, text in enumerate(inputs)
+                ],
+                "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+            })
+        elif self.path.endswith("/chat/completions"):
+            time.sleep(server.latency_ms / 1000.0)
+            server.stats["chat"] += 1
+            messages = request.get("messages", [])
+            json_mode = (request.get("response_format") or {}).get("type") == "json_object"
+            content = fake_chat_answer(messages, json_mode)
+            prompt_tokens = sum(len(m.get("content", "")) // 4 + 1 for m in messages)
+            completion_tokens = len(content) // 4 + 1
+            self._send(200, {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                },
+            })
+        else:
+            self._send(404, {"error": {"message": f"Unknown endpoint {self.path}"}})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--per-item-ms", type=float, default=0.0, help="extra embedding latency per input")
+    parser.add_argument("--rps", type=int, default=0, help="requests per second before 429s (0 = unlimited)")
+    args = parser.parse_args()
+    server = FakeOpenAIServer((args.host, args.port), args.latency_ms, args.per_item_ms, args.rps)
+    print(f"Serving fake OpenAI API at {server.base_url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Time to list and filter a large codebase's files as the file lists do.
+
+Walks --root into the shared FileRegistry (what opening the summary manager
+costs the first time; reopening reuses it), then types each --query one
+character at a time against its FuzzyIndex, reporting the worst keystroke.
+Without --root a synthetic tree of --files empty files is made in a temp dir.
+
+    python benchmarks/file_filter.py --files 100000 --query models/user --query tstview
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from file_registry import get_registry
+
+
+def make_tree(root, n_files, per_dir=200):
+    for d in range(0, n_files, per_dir):
+        directory = os.path.join(root, f"pkg{d // per_dir % 20}", f"module{d // per_dir}")
+        os.makedirs(directory, exist_ok=True)
+        for f in range(min(per_dir, n_files - d)):
+            open(os.path.join(directory, f"view_{f}.py"), "w").close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--root")
+    parser.add_argument("--files", type=int, default=100000)
+    parser.add_argument("--query", action="append")
+    args = parser.parse_args()
+
+    root = args.root
+    if root is None:
+        root = tempfile.mkdtemp(prefix="file_filter_")
+        make_tree(root, args.files)
+
+    started = time.perf_counter()
+    registry = get_registry(root).refresh()
+    print(f"{len(registry.rel_paths)} files, walk + index {(time.perf_counter() - started) * 1000:.0f} ms (worker thread)")
+
+    for query in args.query or ["module42/view_1", "pkg3vw19"]:
+        times = []
+        for n in range(1, len(query) + 1):
+            started = time.perf_counter()
+            matches = registry.index.search(query[:n])
+            times.append(time.perf_counter() - started)
+        print(f"{query!r:22s} {len(matches):6d} matches   worst keystroke {max(times) * 1000:6.1f} ms"
+              f"   total {sum(times) * 1000:6.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
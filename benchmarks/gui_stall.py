@@ -0,0 +1,100 @@
+"""
+How long showing a generated change for a large file blocks the Tk thread.
+
+Builds a --lines long file and an edited copy, then times:
+  old  difflib.unified_diff plus inserting the original, new and diff texts
+       whole into ScrolledText widgets, all on the Tk thread
+  new  fastdiff.unified_diff (on a worker in the GUI, timed separately) and
+       setting the three VirtualText panes, which is all the Tk thread does
+
+Needs a display for the widget timings; without one only the diffs are timed.
+
+    python benchmarks/gui_stall.py --lines 50000 --edits 200
+"""
+import argparse
+import difflib
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastdiff import unified_diff
+
+
+def make_files(n_lines, n_edits, seed=0):
+    rng = random.Random(seed)
+    old = [f"    result_{i} = transform(items[{i % 97}], scale={i % 13})" for i in range(n_lines)]
+    new = list(old)
+    for _ in range(n_edits):
+        i = rng.randrange(len(new))
+        if rng.random() < 0.5:
+            new[i] += "  # adjusted"
+        else:
+            new.insert(i, "    log.debug('checkpoint')")
+    return "\n".join(old), "\n".join(new)
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+def old_diff(old, new):
+    return "\n".join(difflib.unified_diff(old.splitlines(), new.splitlines(), lineterm="", fromfile="old", tofile="new"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--lines", type=int, default=50000)
+    parser.add_argument("--edits", type=int, default=200)
+    args = parser.parse_args()
+
+    old, new = make_files(args.lines, args.edits)
+    old_text, old_seconds = timed(old_diff, old, new)
+    diff, new_seconds = timed(unified_diff, old, new)
+    assert diff.text == old_text, "fastdiff output differs from difflib"
+    print(f"{args.lines} lines, {args.edits} edits, {len(diff.hunks)} hunks")
+    print(f"diff     difflib {old_seconds * 1000:8.1f} ms   fastdiff {new_seconds * 1000:8.1f} ms (worker thread)")
+
+    try:
+        import tkinter as tk
+        from tkinter import scrolledtext
+        root = tk.Tk()
+    except Exception as e:
+        print(f"No display ({e}); skipping widget timings.")
+        return
+    from textview import VirtualText
+
+    root.geometry("1100x750")
+    panes = [scrolledtext.ScrolledText(root, height=12) for _ in range(3)]
+    virtual = [VirtualText(root, height=12) for _ in range(3)]
+    for widget in panes + virtual:
+        widget.pack(fill=tk.BOTH, expand=True)
+    root.update()
+
+    def show_old():
+        text = old_diff(old, new)
+        for widget, content in zip(panes, (old, new, text)):
+            widget.delete("1.0", tk.END)
+            widget.insert(tk.END, content)
+        root.update()
+
+    def show_new():
+        virtual[0].set_text(old)
+        virtual[1].set_text(new)
+        virtual[2].set_lines(diff.lines, diff.kinds)
+        root.update()
+
+    _, stall_old = timed(show_old)
+    _, stall_new = timed(show_new)
+    _, scroll = timed(lambda: [virtual[0].see_line(i) for i in range(0, args.lines, args.lines // 50)])
+    print(f"Tk stall old {stall_old * 1000:8.1f} ms   new {stall_new * 1000:8.1f} ms")
+    print(f"jump to line (windowed re-render) {scroll / 50 * 1000:.2f} ms")
+    root.destroy()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Peak memory of holding file metadata for a large repo: the old plain dicts
+(each carrying the file's full source, as on a cold summary cache) versus
+FileMeta records that read source lazily.
+
+    python benchmarks/metadata_memory.py --files 100000 --avg-bytes 4000
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from file_meta import FileMeta
+
+
+def synthetic_entries(n_files, avg_bytes, seed=0):
+    rng = random.Random(seed)
+    # Real repos reuse names (main, __init__, get_config, ...) across many files
+    vocabulary = [f"name_{j}" for j in range(5000)]
+    for i in range(n_files):
+        path = f"/repo/pkg{i % 500}/module_{i}.py"
+        # Fresh str objects, as produced by ast parsing or json.load
+        symbols = ["".join(rng.choice(vocabulary)) for _ in range(rng.randint(1, 12))]
+        summary = f"Helpers for component {i % 997} of the synthetic repository."
+        yield path, summary, symbols, avg_bytes
+
+
+def make_source(size):
+    # A fresh string per file, like a real f.read()
+    return ("x = 1  # filler line\n" * (size // 21 + 1))[:size]
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    data = build()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del data
+    gc.collect()
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--files", type=int, default=100_000)
+    parser.add_argument("--avg-bytes", type=int, default=4000)
+    args = parser.parse_args()
+
+    def build_dicts():
+        return [
+            {"path": path, "summary": summary, "symbols": list(symbols), "code": make_source(size)}
+            for path, summary, symbols, size in synthetic_entries(args.files, args.avg_bytes)
+        ]
+
+    def build_dicts_no_code():
+        return [
+            {"path": path, "summary": summary, "symbols": list(symbols), "code": None}
+            for path, summary, symbols, _ in synthetic_entries(args.files, args.avg_bytes)
+        ]
+
+    def build_file_metas():
+        return [
+            FileMeta(path, summary, symbols)
+            for path, summary, symbols, _ in synthetic_entries(args.files, args.avg_bytes)
+        ]
+
+    print(f"{args.files} files, {args.avg_bytes} bytes of source each")
+    results = [
+        ("dicts with code (cold cache)", measure(build_dicts)),
+        ("dicts without code (warm cache)", measure(build_dicts_no_code)),
+        ("FileMeta (lazy code)", measure(build_file_metas)),
+    ]
+    for name, peak in results:
+        print(f"{name:34s} peak {peak / 1024 / 1024:9.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
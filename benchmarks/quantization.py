@@ -0,0 +1,105 @@
+"""
+Recall, size and latency of the vector storage options.
+
+Ground truth is exact float32 search at full dimensionality. Each setting is
+evaluated with and without exact re-ranking of RERANK_FACTOR * k candidates.
+Reduced dimensions are emulated the way text-embedding-3 shortens vectors:
+truncate, then re-normalize.
+
+    python benchmarks/quantization.py --vectors 100000 --queries 200
+    python benchmarks/quantization.py --root /path/to/indexed/codebase
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from quantize import QuantizedIndex, make_codec
+
+
+def synthetic_vectors(n, dim, n_clusters=200, seed=0):
+    # Clustered unit vectors, closer to real code embeddings than pure noise
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(n_clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(n_clusters, size=n)] + 0.6 * rng.normal(size=(n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def collection_vectors(root):
+    from codebases import get_collection
+    collection = get_collection(root)
+    got = collection.get(include=["embeddings"])
+    return np.asarray(got["embeddings"], dtype=np.float32)
+
+
+def shorten(vectors, dims):
+    if not dims or dims >= vectors.shape[1]:
+        return vectors
+    cut = vectors[:, :dims]
+    return cut / np.linalg.norm(cut, axis=1, keepdims=True)
+
+
+def percentile_ms(samples, pct):
+    return float(np.percentile(samples, pct) * 1000.0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--vectors", type=int, default=50_000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rerank-factor", type=int, default=4)
+    parser.add_argument("--dims", default="0,512,256", help="comma-separated reduced dimensions (0 = full)")
+    parser.add_argument("--storage", default="float32,float16,int8,pq")
+    parser.add_argument("--root", help="use the embeddings of an indexed codebase instead of synthetic data")
+    args = parser.parse_args()
+
+    data = collection_vectors(args.root) if args.root else synthetic_vectors(args.vectors, args.dim)
+    rng = np.random.default_rng(1)
+    query_rows = rng.choice(len(data), min(args.queries, len(data)), replace=False)
+    queries = data[query_rows] + 0.05 * rng.normal(size=(len(query_rows), data.shape[1])).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    truth = [set(np.argsort(-(data @ q))[:args.k]) for q in queries]
+    ids = [str(i) for i in range(len(data))]
+
+    print(f"{len(data)} vectors of dim {data.shape[1]}, {len(queries)} queries, recall@{args.k}")
+    print(f"{'storage':8s} {'dims':>5s} {'bytes/vec':>9s} {'index MiB':>9s} "
+          f"{'recall':>7s} {'+rerank':>7s} {'p50 ms':>7s} {'p95 ms':>7s}")
+
+    for dims in [int(d) for d in args.dims.split(",")]:
+        vectors = shorten(data, dims)
+        qs = shorten(queries, dims)
+        for storage in args.storage.split(","):
+            if storage == "float32":
+                codes_bytes = vectors.nbytes
+                search = lambda q, k: np.argsort(-(vectors @ q))[:k]
+            else:
+                codec = make_codec(storage, m=min(64, vectors.shape[1] // 4)) if storage == "pq" else make_codec(storage)
+                index = QuantizedIndex(codec)
+                index.add(ids, ids, vectors)
+                codes_bytes = index.nbytes
+                search = lambda q, k, index=index: np.array([int(i) for i, _ in index.search(q, k)])
+
+            hits = hits_rerank = 0
+            latencies = []
+            for q, expected in zip(qs, truth):
+                started = time.perf_counter()
+                candidates = search(q, args.k * args.rerank_factor)
+                # Exact re-rank using the stored float32 vectors, as query_collection does
+                reranked = candidates[np.argsort(-(vectors[candidates] @ q))][:args.k]
+                latencies.append(time.perf_counter() - started)
+                hits += len(expected & set(candidates[:args.k].tolist()))
+                hits_rerank += len(expected & set(reranked.tolist()))
+
+            total = args.k * len(qs)
+            print(f"{storage:8s} {vectors.shape[1]:5d} {codes_bytes / len(vectors):9.0f} "
+                  f"{codes_bytes / 1024 / 1024:9.1f} {hits / total:7.3f} {hits_rerank / total:7.3f} "
+                  f"{percentile_ms(latencies, 50):7.2f} {percentile_ms(latencies, 95):7.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""
+Offline evaluation of retrieval strategies against a fixed index.
+
+The dataset is JSONL, one case per line, with paths relative to --root:
+    {"instruction": "...", "expected_files": ["gui.py"], "expected_chunks": ["gui.py::on_apply"]}
+
+Strategies: vector (Chroma/quantized query with the codebase's own
+embedder), local (the same chunks re-embedded in memory with the local
+hashing embedder, for comparing it against the API embedder on one index),
+summary (LLM file ranking by summary), lexical (BM25 over chunk text) and
+hybrid (reciprocal rank fusion of vector and lexical). Query embeddings and ranking responses are
+recorded to --recordings on first use and replayed afterwards, so reruns
+are deterministic and free. Use --offline to fail instead of calling the
+API. Latencies include the recorded API time of the original call.
+
+    python benchmarks/retrieval_eval.py --dataset cases.jsonl --root /path/to/codebase --k 5,10,20
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from codebases import get_collection
+from embedders import LocalEmbedder, collection_embedder
+from embedding_utils import embed_query, estimate_tokens, load_all_file_metadata
+from lexical import BM25Index, reciprocal_rank_fusion
+from query import build_prompt, choose_files_by_summary
+from vector_search import query_collection
+
+STRATEGIES = ("vector", "local", "summary", "lexical", "hybrid")
+
+
+class Recorder:
+    """Caches API results (and how long they took) in a JSON file."""
+    def __init__(self, path, offline=False):
+        self.path = path
+        self.offline = offline
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+
+    def get(self, kind, key, compute):
+        digest = kind + ":" + hashlib.sha1(key.encode("utf-8")).hexdigest()
+        if digest not in self.entries:
+            if self.offline:
+                raise RuntimeError(f"No recording for {kind} {key[:60]!r} (offline mode)")
+            started = time.perf_counter()
+            value = compute()
+            self.entries[digest] = {"value": value, "seconds": time.perf_counter() - started}
+        entry = self.entries[digest]
+        return entry["value"], entry["seconds"]
+
+    def save(self):
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f)
+
+
+def rel(path, root):
+    return os.path.relpath(path, root).replace(os.sep, "/")
+
+
+def chunk_key(meta, root):
+    return f"{rel(meta['path'], root)}::{meta.get('chunk_name', '')}"
+
+
+def distinct_files(paths):
+    seen = []
+    for path in paths:
+        if path not in seen:
+            seen.append(path)
+    return seen
+
+
+def prompt_tokens(instruction, chunks, root):
+    if not chunks:
+        return 0
+    messages = build_prompt(instruction, chunks, chunks[0]["metadata"]["path"])
+    return sum(estimate_tokens(m["content"]) for m in messages)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dataset", required=True)
+    parser.add_argument("--root", required=True)
+    parser.add_argument("--k", default="5,10,20", help="comma-separated cutoffs")
+    parser.add_argument("--strategies", default=",".join(STRATEGIES))
+    parser.add_argument("--candidates", type=int, default=50, help="chunks fetched per strategy before cutoffs")
+    parser.add_argument("--recordings", default=os.path.join(os.path.dirname(__file__), "recorded_calls.json"))
+    parser.add_argument("--offline", action="store_true")
+    parser.add_argument("--out", help="write per-strategy results as JSON")
+    args = parser.parse_args()
+
+    root = os.path.abspath(args.root)
+    cutoffs = [int(k) for k in args.k.split(",")]
+    strategies = args.strategies.split(",")
+    with open(args.dataset, "r", encoding="utf-8") as f:
+        cases = [json.loads(line) for line in f if line.strip()]
+
+    recorder = Recorder(args.recordings, offline=args.offline)
+    collection = get_collection(root)
+    lexical = BM25Index.from_collection(collection, root=root) if {"lexical", "hybrid"} & set(strategies) else None
+    metas = load_all_file_metadata(root) if "summary" in strategies else []
+    local = LocalEmbedder()
+    local_docs, local_metas, local_matrix = [], [], None
+    if "local" in strategies:
+        offset = 0
+        while True:
+            page = collection.get(include=["documents", "metadatas"], limit=1000, offset=offset)
+            if not page["ids"]:
+                break
+            local_docs.extend(page["documents"])
+            local_metas.extend(page["metadatas"])
+            offset += len(page["ids"])
+        started = time.perf_counter()
+        local_matrix = np.asarray(local.embed(local_docs), dtype=np.float32)
+        elapsed = time.perf_counter() - started
+        print(f"Local embedder: {len(local_docs)} chunks in {elapsed:.2f}s "
+              f"({len(local_docs) / max(elapsed, 1e-9):.0f} chunks/s)")
+
+    def run_vector(instruction):
+        provider = collection_embedder(collection).name
+        embedding, api_seconds = recorder.get(
+            f"embed-{provider}", instruction, lambda: list(map(float, embed_query(instruction, collection)))
+        )
+        started = time.perf_counter()
+        results = query_collection(collection, root, embedding, n_results=args.candidates)
+        chunks = [{"code": d, "metadata": m} for d, m in zip(results["documents"][0], results["metadatas"][0])]
+        return chunks, api_seconds + time.perf_counter() - started
+
+    def run_local(instruction):
+        started = time.perf_counter()
+        scores = local_matrix @ np.asarray(local.embed([instruction])[0], dtype=np.float32)
+        order = np.argsort(-scores)[:args.candidates]
+        chunks = [{"code": local_docs[i], "metadata": local_metas[i]} for i in order]
+        return chunks, time.perf_counter() - started
+
+    def run_lexical(instruction):
+        started = time.perf_counter()
+        hits = lexical.search(instruction, args.candidates)
+        chunks = [{"id": doc_id, "metadata": meta} for doc_id, meta, _ in hits]
+        return chunks, time.perf_counter() - started
+
+    def run_summary(instruction):
+        ranked, api_seconds = recorder.get(
+            "rank", instruction,
+            lambda: [m["path"] for m in choose_files_by_summary(instruction, metas, max_files=max(cutoffs))]
+        )
+        return [{"metadata": {"path": p}} for p in ranked], api_seconds
+
+    def run_hybrid(instruction):
+        vector_chunks, vector_seconds = run_vector(instruction)
+        lexical_chunks, lexical_seconds = run_lexical(instruction)
+        by_key = {}
+        rankings = []
+        for chunks in (vector_chunks, lexical_chunks):
+            keys = [chunk_key(c["metadata"], root) for c in chunks]
+            for key, chunk in zip(keys, chunks):
+                by_key.setdefault(key, chunk)
+            rankings.append(keys)
+        fused = [by_key[key] for key in reciprocal_rank_fusion(rankings)][:args.candidates]
+        return fused, vector_seconds + lexical_seconds
+
+    runners = {
+        "vector": run_vector, "local": run_local, "lexical": run_lexical,
+        "summary": run_summary, "hybrid": run_hybrid,
+    }
+
+    report = {}
+    for strategy in strategies:
+        file_recall = {k: [] for k in cutoffs}
+        chunk_recall = {k: [] for k in cutoffs}
+        tokens = {k: [] for k in cutoffs}
+        reciprocal_ranks, latencies = [], []
+        for case in cases:
+            instruction = case["instruction"]
+            chunks, seconds = runners[strategy](instruction)
+            latencies.append(seconds)
+            files = distinct_files(rel(c["metadata"]["path"], root) for c in chunks)
+            expected_files = set(case.get("expected_files", []))
+            expected_chunks = set(case.get("expected_chunks", []))
+
+            rank = next((i for i, f in enumerate(files) if f in expected_files), None)
+            reciprocal_ranks.append(0.0 if rank is None else 1.0 / (rank + 1))
+            for k in cutoffs:
+                if expected_files:
+                    file_recall[k].append(len(expected_files & set(files[:k])) / len(expected_files))
+                if expected_chunks and strategy != "summary":
+                    keys = {chunk_key(c["metadata"], root) for c in chunks[:k]}
+                    chunk_recall[k].append(len(expected_chunks & keys) / len(expected_chunks))
+                if strategy == "summary":
+                    # What the ranking prompt costs: the whole path + summary list
+                    tokens[k].append(sum(estimate_tokens(f"{m['path']}: {m.get('summary', '')}") for m in metas))
+                else:
+                    with_code = [c for c in chunks[:k] if "code" in c]
+                    tokens[k].append(prompt_tokens(instruction, with_code, root))
+
+        mean = lambda xs: round(float(np.mean(xs)), 3) if xs else None
+        report[strategy] = {
+            "mrr": mean(reciprocal_ranks),
+            "p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 1),
+            "p95_ms": round(float(np.percentile(latencies, 95)) * 1000, 1),
+            "file_recall": {k: mean(v) for k, v in file_recall.items()},
+            "chunk_recall": {k: mean(v) for k, v in chunk_recall.items()},
+            "prompt_tokens": {k: mean(v) for k, v in tokens.items()},
+        }
+    recorder.save()
+
+    print(f"{len(cases)} cases against {root}")
+    print(f"{'strategy':8s} {'k':>3s} {'file R@k':>8s} {'chunk R@k':>9s} {'tokens':>7s} {'MRR':>6s} {'p50 ms':>7s} {'p95 ms':>7s}")
+    for strategy, r in report.items():
+        for k in cutoffs:
+            fmt = lambda v: "-" if v is None else f"{v:.3f}"
+            tok = r["prompt_tokens"][k]
+            print(f"{strategy:8s} {k:3d} {fmt(r['file_recall'][k]):>8s} {fmt(r['chunk_recall'][k]):>9s} "
+                  f"{'-' if tok is None else int(tok):>7} {r['mrr']:6.3f} {r['p50_ms']:7.1f} {r['p95_ms']:7.1f}")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
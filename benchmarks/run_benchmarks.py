@@ -0,0 +1,134 @@
+"""
+End-to-end performance benchmarks against a synthetic repo and the local
+fake OpenAI server. Each run appends one JSON line (commit, parameters,
+timings) to --out so results can be compared across commits.
+
+    python benchmarks/run_benchmarks.py --files 1000 --latency-ms 20 --out bench_results.jsonl
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+REPO = os.path.dirname(HERE)
+sys.path.insert(0, REPO)
+sys.path.insert(0, HERE)
+
+from fake_openai import FakeOpenAIServer
+from synthetic_repo import generate_repo
+
+QUERIES = ("load the summary cache", "apply chunk edits to a file", "parse config options",
+           "render the index state", "merge vector results", "scan files for tokens")
+
+
+def timed(fn, *args, **kwargs):
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=REPO, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--files", type=int, default=1000)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--per-item-ms", type=float, default=0.0)
+    parser.add_argument("--rps", type=int, default=0)
+    parser.add_argument("--queries", type=int, default=30)
+    parser.add_argument("--edit-files", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="bench_results.jsonl")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="aieditor-bench-")
+    root = os.path.join(workdir, "repo")
+    server = FakeOpenAIServer(("127.0.0.1", 0), args.latency_ms, args.per_item_ms, args.rps).start()
+
+    # Must be in place before the project modules create their clients/config
+    os.environ["OPENAI_BASE_URL"] = server.base_url
+    os.environ["OPENAI_API_KEY"] = "benchmark"
+    os.environ["CHROMA_DB_PATH"] = os.path.join(workdir, "chroma")
+    os.environ["PROJECT_PATH"] = root
+
+    from scan import scan_files, chunk_file_by_definitions
+    from embedding_utils import build_index, load_all_file_metadata, embed_query
+    from codebases import get_collection
+    from vector_search import query_collection
+    from edit import apply_chunks_cross_file
+
+    results = {}
+    _, results["generate_repo_s"] = timed(generate_repo, root, args.files, args.seed)
+
+    files, results["scan_files_s"] = timed(scan_files, root)
+    results["scanned_files"] = len(files)
+
+    def chunk_all():
+        total = 0
+        for path in files:
+            if path.endswith(".py"):
+                total += len(chunk_file_by_definitions(path))
+        return total
+    results["chunks"], results["chunk_file_by_definitions_s"] = timed(chunk_all)
+
+    stats, results["build_index_s"] = timed(build_index, root, full=True)
+    results["build_index_peak_rss_mb"] = stats.get("peak_rss_mb")
+    _, results["build_index_noop_s"] = timed(build_index, root)
+
+    _, results["load_all_file_metadata_s"] = timed(load_all_file_metadata, root)
+
+    collection = get_collection(root)
+    latencies = []
+    for i in range(args.queries):
+        started = time.perf_counter()
+        embedding = embed_query(QUERIES[i % len(QUERIES)], collection)
+        query_collection(collection, root, embedding, n_results=20)
+        latencies.append(time.perf_counter() - started)
+    results["query_p50_ms"] = round(percentile(latencies, 50) * 1000, 2)
+    results["query_p95_ms"] = round(percentile(latencies, 95) * 1000, 2)
+
+    rng = random.Random(args.seed)
+    edits = []
+    for path in rng.sample([p for p in files if p.endswith(".py")], min(args.edit_files, len(files))):
+        for chunk in chunk_file_by_definitions(path):
+            if chunk["type"] == "function":
+                edits.append({
+                    "file_path": path,
+                    "start_line": chunk["start"],
+                    "end_line": chunk["end"],
+                    "code": chunk["code"] + "\n    # edited",
+                })
+    _, results["apply_chunks_cross_file_s"] = timed(apply_chunks_cross_file, edits)
+    results["applied_edits"] = len(edits)
+
+    results = {k: round(v, 4) if isinstance(v, float) else v for k, v in results.items()}
+    record = {
+        "commit": git_commit(),
+        "timestamp": time.time(),
+        "params": vars(args),
+        "api_stats": dict(server.stats),
+        "results": results,
+    }
+    with open(args.out, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+    server.shutdown()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
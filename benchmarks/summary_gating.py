@@ -0,0 +1,119 @@
+"""
+How often fingerprint gating regenerates file summaries, compared with
+regenerating on every mtime change.
+
+Applies synthetic edits to the Python files under --root, in memory only.
+The edit kinds are: a comment, a body change, a docstring change, a new
+import, an added parameter, and a new function. For each kind it reports
+the share of edits whose fingerprint drift passes each --thresholds value.
+It then replays --edits random edits per file, using the same weights an
+active repository might see, and counts the summaries regenerated (each
+one resets the baseline) and the gpt-4.1-nano requests avoided.
+
+    python benchmarks/summary_gating.py --root /path/to/codebase --thresholds 0.1,0.2,0.3
+"""
+import argparse
+import ast
+import math
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from embedding_utils import SUMMARY_BATCH_FILES
+from file_meta import read_source
+from fingerprint import fingerprint, drift
+from scan import scan_files
+
+# Relative frequency of each kind in the replayed edit streams
+EDIT_WEIGHTS = {"comment": 25, "body": 45, "docstring": 5, "import": 8, "parameter": 7, "function": 10}
+
+
+def _functions(tree):
+    return [n for n in ast.walk(tree) if isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef))]
+
+
+def apply_edit(tree, kind, rng, serial):
+    """Edit tree in place; returns False if this kind of edit doesn't apply to it."""
+    functions = _functions(tree)
+    if kind == "comment":
+        return True  # comments and formatting never reach the AST
+    if kind == "body":
+        if not functions:
+            return False
+        fn = rng.choice(functions)
+        fn.body.append(ast.Expr(ast.Constant(serial)))
+    elif kind == "docstring":
+        documented = [f for f in functions if ast.get_docstring(f)]
+        if not documented:
+            return False
+        fn = rng.choice(documented)
+        fn.body[0] = ast.Expr(ast.Constant(f"{ast.get_docstring(fn)} Now also handles case {serial}."))
+    elif kind == "import":
+        tree.body.insert(0, ast.Import(names=[ast.alias(name=f"module_{serial}")]))
+    elif kind == "parameter":
+        top = [n for n in tree.body if isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef))]
+        if not top:
+            return False
+        rng.choice(top).args.args.append(ast.arg(arg=f"option_{serial}"))
+    elif kind == "function":
+        tree.body.append(ast.parse(f"def added_{serial}(value):\n    return value\n").body[0])
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--root", default=os.getcwd())
+    parser.add_argument("--thresholds", default="0.1,0.2,0.3")
+    parser.add_argument("--edits", type=int, default=50, help="edits replayed per file")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    thresholds = [float(t) for t in args.thresholds.split(",")]
+    rng = random.Random(args.seed)
+
+    sources = []
+    for path in scan_files(os.path.abspath(args.root)):
+        if path.endswith(".py"):
+            try:
+                sources.append(read_source(path))
+                ast.parse(sources[-1])
+            except (OSError, SyntaxError, ValueError):
+                sources.pop()
+    print(f"{len(sources)} Python files")
+
+    print(f"\n{'edit':10s} {'files':>6s} {'mean drift':>11s}" + "".join(f" {'>' + str(t):>7s}" for t in thresholds))
+    for kind in EDIT_WEIGHTS:
+        drifts = []
+        for serial, source in enumerate(sources):
+            tree = ast.parse(source)
+            before = fingerprint(tree)
+            if apply_edit(tree, kind, rng, serial):
+                drifts.append(drift(before, fingerprint(tree)))
+        if drifts:
+            rates = "".join(f" {sum(d > t for d in drifts) / len(drifts):7.0%}" for t in thresholds)
+            print(f"{kind:10s} {len(drifts):6d} {sum(drifts) / len(drifts):11.3f}{rates}")
+
+    kinds, weights = list(EDIT_WEIGHTS), list(EDIT_WEIGHTS.values())
+    print(f"\nReplaying {args.edits} edits per file ({len(sources) * args.edits} mtime changes):")
+    print(f"{'threshold':>10s} {'regenerated':>12s} {'rate':>6s} {'requests':>9s} {'avoided':>8s}")
+    for threshold in thresholds:
+        stream = random.Random(args.seed)
+        regenerated = 0
+        for serial, source in enumerate(sources):
+            tree = ast.parse(source)
+            baseline = fingerprint(tree)
+            for step in range(args.edits):
+                apply_edit(tree, stream.choices(kinds, weights)[0], stream, serial * args.edits + step)
+                current = fingerprint(tree)
+                if drift(baseline, current) > threshold:
+                    regenerated += 1
+                    baseline = current
+        total = len(sources) * args.edits
+        requests = math.ceil(regenerated / SUMMARY_BATCH_FILES)
+        avoided = math.ceil(total / SUMMARY_BATCH_FILES) - requests
+        print(f"{threshold:10.2f} {regenerated:12d} {regenerated / max(total, 1):6.1%} {requests:9d} {avoided:8d}")
+
+
+if __name__ == "__main__":
+    main()
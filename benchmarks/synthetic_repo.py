@@ -0,0 +1,82 @@
+"""
+Generate a synthetic repository for benchmarks: mostly Python with some
+JavaScript, TypeScript and Markdown, with log-normally distributed file sizes.
+
+    python benchmarks/synthetic_repo.py /tmp/synth --files 10000
+"""
+import argparse
+import os
+import random
+
+WORDS = ("load", "save", "parse", "index", "query", "chunk", "render", "apply", "merge", "scan",
+         "config", "cache", "token", "file", "path", "summary", "vector", "client", "event", "state")
+
+
+def name(rng, parts=2):
+    return "_".join(rng.choice(WORDS) for _ in range(parts))
+
+
+def python_source(rng, n_defs):
+    lines = [f'"""Module for {name(rng)} handling."""' if rng.random() < 0.5 else "# no docstring",
+             "import os", "import json", ""]
+    for i in range(n_defs):
+        if rng.random() < 0.2:
+            lines.append(f"class {name(rng).title().replace('_', '')}{i}:")
+            for j in range(rng.randint(1, 4)):
+                lines.append(f"    def {name(rng)}_{j}(self, value):")
+                lines.extend(f"        value = value + {k}  # {name(rng)}" for k in range(rng.randint(2, 12)))
+                lines.append("        return value")
+                lines.append("")
+        else:
+            lines.append(f"def {name(rng)}_{i}(path, options=None):")
+            lines.extend(f"    result_{k} = os.path.join(path, '{name(rng)}')" for k in range(rng.randint(2, 25)))
+            lines.append("    return json.dumps(options)")
+        lines.append("")
+    lines.append(f"{name(rng).upper()} = {rng.randint(0, 100)}")
+    return "\n".join(lines) + "\n"
+
+
+def js_source(rng, n_defs):
+    return "\n".join(
+        f"function {name(rng)}{i}(a, b) {{\n  return a + b + {i};\n}}\n" for i in range(n_defs)
+    )
+
+
+def md_source(rng, n_defs):
+    return "\n".join(f"## {name(rng, 3)}\n\nNotes about {name(rng)}.\n" for _ in range(n_defs))
+
+
+def generate_repo(root, n_files, seed=0, mean_defs=8):
+    rng = random.Random(seed)
+    written = []
+    for i in range(n_files):
+        package = os.path.join(root, f"pkg{i % max(1, n_files // 50)}", f"sub{i % 7}")
+        os.makedirs(package, exist_ok=True)
+        n_defs = max(1, int(rng.lognormvariate(0, 0.8) * mean_defs))
+        kind = rng.random()
+        if kind < 0.8:
+            path, source = os.path.join(package, f"mod_{i}.py"), python_source(rng, n_defs)
+        elif kind < 0.9:
+            path, source = os.path.join(package, f"mod_{i}.js"), js_source(rng, n_defs)
+        elif kind < 0.95:
+            path, source = os.path.join(package, f"mod_{i}.ts"), js_source(rng, n_defs)
+        else:
+            path, source = os.path.join(package, f"notes_{i}.md"), md_source(rng, n_defs)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(source)
+        written.append(path)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("root")
+    parser.add_argument("--files", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    paths = generate_repo(args.root, args.files, args.seed)
+    print(f"Wrote {len(paths)} files under {args.root}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Wall time of pre-apply validation for a multi-file change.
+
+Takes --files Python files under --root, appends a small function to each,
+and with --faults breaks three of them: a syntax error, an import of a name
+the target module doesn't define, and removal of a function other files
+use. The dependency graph is built in memory from --root, then the change is
+validated with a cold and a warm process pool.
+
+    python benchmarks/validate_edits.py --root /path/to/codebase --files 20 --faults
+"""
+import argparse
+import ast
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from depgraph import DependencyGraph, analyze_file, module_name
+from file_meta import read_source
+from scan import scan_files, chunk_file_by_definitions
+from validate import Validator, summarize
+
+
+def build_graph(root, paths):
+    graph = DependencyGraph()
+    for path in paths:
+        try:
+            source = read_source(path)
+            tree = ast.parse(source)
+        except (OSError, SyntaxError, ValueError):
+            continue
+        graph.update_file(path, analyze_file(path, root, tree, chunk_file_by_definitions(path, source, tree), ""))
+    return graph
+
+
+def make_change(root, paths, graph, n_files, faults):
+    changes = {}
+    for path in paths[:n_files]:
+        changes[path] = read_source(path) + "\n\ndef _validation_probe():\n    return 1\n"
+    if faults and len(changes) >= 3:
+        first, second, third = list(changes)[:3]
+        changes[first] += "\ndef broken(:\n    pass\n"
+        changes[second] = "from scan import no_such_function\n" + changes[second]
+        # Drop a top-level function some other file calls
+        for path in list(changes)[2:]:
+            tree = ast.parse(changes[path])
+            for node in tree.body:
+                if isinstance(node, ast.FunctionDef) and graph.users(f"{module_name(path, root)}.{node.name}") - {path}:
+                    lines = changes[path].splitlines(keepends=True)
+                    changes[path] = "".join(lines[:node.lineno - 1] + lines[node.end_lineno:])
+                    return changes
+    return changes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--root", default=os.getcwd())
+    parser.add_argument("--files", type=int, default=20)
+    parser.add_argument("--faults", action="store_true")
+    parser.add_argument("--workers", type=int, default=0)
+    args = parser.parse_args()
+
+    root = os.path.abspath(args.root)
+    paths = [p for p in scan_files(root) if p.endswith(".py")]
+    graph = build_graph(root, paths)
+    changes = make_change(root, paths, graph, args.files, args.faults)
+    modules = {path: module_name(path, root) for path in changes}
+
+    validator = Validator(args.workers or None)
+    try:
+        for label in ("cold pool", "warm pool"):
+            started = time.perf_counter()
+            results = validator.validate(root, changes, modules, graph)
+            errors, warnings = summarize(results)
+            print(f"{label}: {len(changes)} files in {time.perf_counter() - started:.2f}s, "
+                  f"{errors} errors, {warnings} warnings")
+        for result in results:
+            for item in result["issues"]:
+                print(f"  {os.path.relpath(item['path'], root)}:{item['line']} [{item['check']}] {item['message']}")
+    finally:
+        validator.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import chromadb
+from config import CHROMA_DB_PATH, PROJECT_PATH, MAX_INDEX_DISK_MB, INDEX_VERSION_GRACE_SECONDS
+
+# Every codebase gets its own collection, summary cache and manifest, keyed by
+# a stable hash of its root, so switching between codebases reopens an
+# existing index instead of rebuilding one.
+CODEBASES_DIR = os.path.join(CHROMA_DB_PATH, "codebases")
+REGISTRY_FILE = os.path.join(CHROMA_DB_PATH, "codebases.json")
+
+# A full rebuild writes a new version of the index (collection, manifest and
+# quantized vectors) while readers keep using the active one; active.json is
+# switched atomically once the build completes. Version 0 is the unversioned
+# layout of indexes built before versions existed. Retired versions are kept
+# for INDEX_VERSION_GRACE_SECONDS so queries already holding them can finish.
+ACTIVE_FILE = "active.json"
+
+# Chroma keeps every embedding twice (its SQLite log and the HNSW segment) as
+# float32, and each document once more in the full-text index, plus some
+# metadata per row. Used to estimate what evicting a collection frees, since
+# the shared SQLite file doesn't shrink when rows are deleted.
+ROW_OVERHEAD_BYTES = 256
+
+logger = logging.getLogger(__name__)
+
+
+def default_root():
+    return PROJECT_PATH or os.getcwd()
+
+
+def normalize_root(root):
+    return os.path.normcase(os.path.realpath(os.path.abspath(root or default_root())))
+
+
+def codebase_id(root):
+    return hashlib.sha1(normalize_root(root).encode("utf-8")).hexdigest()[:16]
+
+
+def codebase_dir(root):
+    return os.path.join(CODEBASES_DIR, codebase_id(root))
+
+
+def load_versions(root):
+    """{"active": version, "building": version or None, "retired": {version: retired at}}"""
+    try:
+        with open(os.path.join(codebase_dir(root), ACTIVE_FILE), "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        state = {}
+    return {
+        "active": state.get("active", 0),
+        "building": state.get("building"),
+        "retired": {int(v): t for v, t in state.get("retired", {}).items()},
+    }
+
+
+def save_versions(root, state):
+    directory = codebase_dir(root)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, ACTIVE_FILE)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def active_version(root):
+    return load_versions(root)["active"]
+
+
+def collection_name(root, version=None):
+    """Name of root's collection for version (default: the active one)."""
+    if version is None:
+        version = active_version(root)
+    return f"codebase_{codebase_id(root)}" + (f"_v{version}" if version else "")
+
+
+def version_dir(root, version=None):
+    """Directory holding the manifest and quantized vectors of a version."""
+    if version is None:
+        version = active_version(root)
+    if not version:
+        return codebase_dir(root)
+    return os.path.join(codebase_dir(root), "versions", str(version))
+
+
+def manifest_path(root, version=None):
+    return os.path.join(version_dir(root, version), "manifest.jsonl")
+
+
+def cache_path(root):
+    return os.path.join(codebase_dir(root), "file_summaries_cache.json")
+
+
+def get_client():
+    return chromadb.PersistentClient(path=CHROMA_DB_PATH)
+
+
+def get_collection(root, chroma_client=None):
+    """Open (or create) the active collection for root."""
+    chroma_client = chroma_client or get_client()
+    return chroma_client.get_or_create_collection(name=collection_name(root))
+
+
+def known_versions(root):
+    state = load_versions(root)
+    versions = {state["active"]} | set(state["retired"])
+    if os.path.exists(manifest_path(root, 0)):
+        versions.add(0)
+    if state["building"] is not None:
+        versions.add(state["building"])
+    try:
+        versions.update(int(v) for v in os.listdir(os.path.join(codebase_dir(root), "versions")) if v.isdigit())
+    except OSError:
+        pass
+    return versions
+
+
+def begin_version(root, chroma_client=None):
+    """
+    Allocate a new version for a rebuild and record it as building. An
+    unfinished build it replaces is discarded right away.
+    """
+    state = load_versions(root)
+    abandoned = state["building"]
+    version = max(known_versions(root)) + 1
+    state["building"] = version
+    save_versions(root, state)
+    if abandoned is not None and abandoned != state["active"]:
+        _drop_version(root, abandoned, chroma_client or get_client())
+    os.makedirs(version_dir(root, version), exist_ok=True)
+    return version
+
+
+def activate_version(root, version, chroma_client=None):
+    """Atomically make version the one readers use, then collect old versions."""
+    state = load_versions(root)
+    if state["active"] != version:
+        state["retired"][state["active"]] = time.time()
+    state["active"] = version
+    if state["building"] == version:
+        state["building"] = None
+    save_versions(root, state)
+    gc_versions(root, chroma_client)
+    # Collect the version just retired once its grace period is over
+    timer = threading.Timer(INDEX_VERSION_GRACE_SECONDS + 1, gc_versions, (root,))
+    timer.daemon = True
+    timer.start()
+
+
+def _drop_version(root, version, chroma_client):
+    try:
+        chroma_client.delete_collection(name=collection_name(root, version))
+    except (chromadb.errors.NotFoundError, ValueError):
+        pass
+    if version:
+        shutil.rmtree(version_dir(root, version), ignore_errors=True)
+    else:
+        # The unversioned layout shares codebase_dir with the summary cache
+        shutil.rmtree(os.path.join(codebase_dir(root), "vectors"), ignore_errors=True)
+        try:
+            os.remove(manifest_path(root, 0))
+        except OSError:
+            pass
+
+
+def gc_versions(root, chroma_client=None, grace=INDEX_VERSION_GRACE_SECONDS):
+    """Delete retired versions past their grace period and any stray ones. Returns those deleted."""
+    state = load_versions(root)
+    now = time.time()
+    keep = {state["active"], state["building"]}
+    doomed = [
+        v for v in known_versions(root)
+        if v not in keep and now - state["retired"].get(v, 0) >= grace
+    ]
+    if not doomed:
+        return []
+    chroma_client = chroma_client or get_client()
+    for version in doomed:
+        _drop_version(root, version, chroma_client)
+        state["retired"].pop(version, None)
+    save_versions(root, state)
+    return doomed
+
+
+def load_registry():
+    try:
+        with open(REGISTRY_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_registry(registry):
+    os.makedirs(os.path.dirname(REGISTRY_FILE) or ".", exist_ok=True)
+    tmp = REGISTRY_FILE + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(registry, f, indent=2)
+    os.replace(tmp, REGISTRY_FILE)
+
+
+def touch(root):
+    """Record root as the most recently used codebase."""
+    registry = load_registry()
+    registry[codebase_id(root)] = {"root": normalize_root(root), "last_used": time.time()}
+    save_registry(registry)
+
+
+def dir_size(path):
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for fn in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, fn))
+            except OSError:
+                continue
+    return total
+
+
+def drop_codebase(root, chroma_client=None):
+    """Delete every version of a codebase's collection, its summary cache and manifests."""
+    chroma_client = chroma_client or get_client()
+    for version in known_versions(root):
+        try:
+            chroma_client.delete_collection(name=collection_name(root, version))
+        except (chromadb.errors.NotFoundError, ValueError):
+            pass
+    shutil.rmtree(codebase_dir(root), ignore_errors=True)
+    registry = load_registry()
+    registry.pop(codebase_id(root), None)
+    save_registry(registry)
+
+
+def collection_bytes(name, chroma_client):
+    """Estimated bytes Chroma holds for a collection, from its row count and a sample of rows."""
+    try:
+        collection = chroma_client.get_collection(name=name)
+        rows = collection.count()
+        if not rows:
+            return 0
+        sample = collection.peek(limit=10)
+    except (chromadb.errors.NotFoundError, ValueError):
+        return 0
+    embeddings = sample.get("embeddings")
+    dims = len(embeddings[0]) if embeddings is not None and len(embeddings) else 0
+    documents = [d for d in sample.get("documents") or [] if d]
+    doc_bytes = sum(len(d.encode("utf-8")) for d in documents) / max(len(documents), 1)
+    return int(rows * (2 * 4 * dims + 2 * doc_bytes + ROW_OVERHEAD_BYTES))
+
+
+def codebase_bytes(root, chroma_client):
+    """Bytes that drop_codebase(root) frees: its directory plus its collections."""
+    total = dir_size(codebase_dir(root))
+    for version in known_versions(root):
+        total += collection_bytes(collection_name(root, version), chroma_client)
+    return total
+
+
+def enforce_disk_cap(keep_root, max_mb=MAX_INDEX_DISK_MB, chroma_client=None):
+    """
+    Evict least recently used codebases until the store fits in max_mb.
+    keep_root (the codebase in use) is never evicted. Returns evicted roots.
+    """
+    if not max_mb:
+        return []
+    limit = max_mb * 1024 * 1024
+    total = dir_size(CHROMA_DB_PATH)
+    if total <= limit:
+        return []
+    chroma_client = chroma_client or get_client()
+    keep = codebase_id(keep_root)
+    registry = load_registry()
+    candidates = sorted(
+        (entry["last_used"], entry["root"]) for cid, entry in registry.items() if cid != keep
+    )
+    evicted = []
+    for _, root in candidates:
+        if total <= limit:
+            break
+        size = codebase_bytes(root, chroma_client)
+        logger.info("Index store over %d MB, evicting least recently used codebase: %s (~%.0f MB)",
+                    max_mb, root, size / 1024 / 1024)
+        drop_codebase(root, chroma_client)
+        evicted.append(root)
+        total -= size
+    if total > limit:
+        logger.warning("Index store is still ~%.0f MB after evicting every other codebase (cap %d MB)",
+                       total / 1024 / 1024, max_mb)
+    return evicted
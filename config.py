@@ -5,6 +5,63 @@ load_dotenv()
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 PROJECT_PATH = os.getenv("PROJECT_PATH")
-CHROMA_DB_PATH = "chroma"
+# Resolved once at import: the GUI chdirs into whichever codebase is open, but
+# all codebases share one store.
+CHROMA_DB_PATH = os.path.abspath(os.getenv("CHROMA_DB_PATH", "chroma"))
 
-EXCLUDE_DIRS = {".git", "node_modules", ".venv", "venv", "__pycache__", ".json", ".html", ".css"}
\ No newline at end of file
+EXCLUDE_DIRS = {".git", "node_modules", ".venv", "venv", "__pycache__", ".json", ".html", ".css"}
+
+# Files larger than this are skipped when scanning; generated files are skipped too
+MAX_FILE_BYTES = int(os.getenv("MAX_FILE_BYTES", 1024 * 1024))
+# Set TRACE_MEMORY=1 to add tracemalloc figures to build_index memory reports
+TRACE_MEMORY = os.getenv("TRACE_MEMORY") == "1"
+# A file's cached summary is kept through edits until its structural
+# fingerprint (imports, top-level signatures, docstrings) has drifted this far
+# (Jaccard distance, 0-1) from the one it was summarized from; then it is
+# marked stale and regenerated in the background.
+SUMMARY_DRIFT_THRESHOLD = float(os.getenv("SUMMARY_DRIFT_THRESHOLD", 0.2))
+# Least recently used codebase indexes are evicted past this size (0 = no cap)
+MAX_INDEX_DISK_MB = int(os.getenv("MAX_INDEX_DISK_MB", 2048))
+# "inline" stores each chunk's text as its Chroma document. "reference" stores
+# only its byte range and hash, reads the text back from the working tree at
+# query time and keeps a compressed copy for files changed since indexing.
+# Changing it forces a full rebuild of existing indexes.
+DOCUMENT_STORAGE = os.getenv("DOCUMENT_STORAGE", "inline")
+# Full rebuilds write a new index version and swap it in when done; the old one
+# is deleted this long afterwards so queries still holding it can finish
+INDEX_VERSION_GRACE_SECONDS = int(os.getenv("INDEX_VERSION_GRACE_SECONDS", 60))
+
+# text-embedding-3-small can return shortened vectors; 0 keeps the full 1536.
+# Changing it forces a full rebuild of existing indexes.
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", 0))
+# Embedder for codebases indexed for the first time: "openai", or "local" for a
+# CPU-only hashing embedder that needs no network. A codebase keeps the
+# provider it was built with until build_index(provider=...) switches it.
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "openai")
+LOCAL_EMBEDDING_DIMENSIONS = int(os.getenv("LOCAL_EMBEDDING_DIMENSIONS", 384))
+# "float32" queries Chroma directly. "float16", "int8" or "pq" scan a compact
+# quantized copy of the vectors and re-rank the top RERANK_FACTOR * k exactly.
+VECTOR_STORAGE = os.getenv("VECTOR_STORAGE", "float32")
+RERANK_FACTOR = int(os.getenv("RERANK_FACTOR", 4))
+PQ_SUBVECTORS = int(os.getenv("PQ_SUBVECTORS", 64))
+# "ivf" partitions the quantized vectors into k-means lists (IVF_LISTS, 0 =
+# about 4 * sqrt(chunks)) and scores only the IVF_PROBES nearest lists per
+# query; "flat" scans every code. Only used with quantized VECTOR_STORAGE:
+# float32 queries go to Chroma's own HNSW index.
+VECTOR_INDEX = os.getenv("VECTOR_INDEX", "flat")
+IVF_LISTS = int(os.getenv("IVF_LISTS", 0))
+IVF_PROBES = int(os.getenv("IVF_PROBES", 16))
+
+# How the model returns edits: "chunks" (every modified chunk in full) or, opt
+# in, "search_replace" hunks (only the changed lines plus a little context).
+# Hunks that cannot be located or that overlap fall back to asking again in
+# "chunks" mode.
+EDIT_FORMAT = os.getenv("EDIT_FORMAT", "chunks")
+
+# Generated changes are compiled and their imports resolved on this many
+# processes (0 = one per CPU) before Apply is enabled. If set, the test
+# command (e.g. "pytest -q -x tests/unit") also runs against a scratch copy of
+# the tree with the change in place.
+VALIDATION_WORKERS = int(os.getenv("VALIDATION_WORKERS", 0))
+VALIDATION_TEST_COMMAND = os.getenv("VALIDATION_TEST_COMMAND", "")
+VALIDATION_TEST_TIMEOUT = int(os.getenv("VALIDATION_TEST_TIMEOUT", 120))
@@ -0,0 +1,309 @@
+import ast
+import json
+import logging
+import os
+from collections import defaultdict
+from codebases import codebase_dir
+from scan import chunk_file_by_definitions, parse_file
+
+# Which chunks define which names, and which names each chunk calls, so the
+# callers and callees of a chunk are dictionary lookups instead of another
+# semantic search. Call targets are resolved syntactically when a file is
+# analyzed ("pkg.mod.func", "pkg.mod.Class.method"); calls on objects of
+# unknown type are kept as "*.method" and only match a method name that is
+# defined exactly once in the codebase.
+
+GRAPH_VERSION = 1
+
+logger = logging.getLogger(__name__)
+
+_loaded = {}  # root -> (mtime of depgraph.json, DependencyGraph)
+
+
+def graph_path(root):
+    return os.path.join(codebase_dir(root), "depgraph.json")
+
+
+def module_name(path, root):
+    rel = os.path.splitext(os.path.relpath(path, root))[0]
+    parts = [p for p in rel.replace(os.sep, "/").split("/") if p]
+    if parts and parts[-1] == "__init__":
+        parts.pop()
+    return ".".join(parts)
+
+
+def chunk_id(path, index):
+    # Same ids build_index gives the chunks in the collection
+    return f"{path}-{index}"
+
+
+def _dotted(node):
+    """'a.b.c' for a Name/Attribute chain, else None."""
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if not isinstance(node, ast.Name):
+        return None
+    parts.append(node.id)
+    return ".".join(reversed(parts))
+
+
+class _Analyzer(ast.NodeVisitor):
+    def __init__(self, module, is_package, chunks):
+        self.module = module
+        self.package = module if is_package else module.rpartition(".")[0]
+        self.imports = {}     # local name -> dotted target
+        self.defines = {}     # qualified name -> chunk index
+        self.calls = set()    # (chunk index, called name, enclosing class path)
+        self.scope = []       # enclosing class/function names
+        self.classes = []     # scope of each enclosing class, innermost last
+        self.current = []     # enclosing function chunk indexes
+        self.top_level = set()
+        self.function_chunks = {
+            (c["start"], c["name"]): i for i, c in enumerate(chunks) if c["type"] == "function"
+        }
+        self.loose_chunks = [(c["start"], c["end"], i) for i, c in enumerate(chunks) if c["type"] == "loose"]
+
+    def _resolve_relative(self, level, module):
+        base = self.package.split(".") if self.package else []
+        if level > 1:
+            base = base[:len(base) - (level - 1)]
+        return ".".join(base + ([module] if module else []))
+
+    def visit_Import(self, node):
+        for alias in node.names:
+            if alias.asname:
+                self.imports[alias.asname] = alias.name
+            else:
+                top = alias.name.split(".")[0]
+                self.imports[top] = top
+
+    def visit_ImportFrom(self, node):
+        source = self._resolve_relative(node.level, node.module) if node.level else (node.module or "")
+        for alias in node.names:
+            if alias.name != "*":
+                self.imports[alias.asname or alias.name] = f"{source}.{alias.name}" if source else alias.name
+
+    def visit_ClassDef(self, node):
+        if not self.scope:
+            self.top_level.add(node.name)
+        self.scope.append(node.name)
+        self.classes.append(tuple(self.scope))
+        self.generic_visit(node)
+        self.classes.pop()
+        self.scope.pop()
+
+    def visit_FunctionDef(self, node):
+        if not self.scope:
+            self.top_level.add(node.name)
+        index = self.function_chunks.get((node.lineno, node.name))
+        qualname = ".".join([self.module] + self.scope + [node.name])
+        if index is not None:
+            self.defines[qualname] = index
+            if node.name == "__init__" and self.classes and tuple(self.scope) == self.classes[-1]:
+                # Calling the class runs its constructor
+                self.defines[qualname.rpartition(".")[0]] = index
+            self.current.append(index)
+        self.scope.append(node.name)
+        self.generic_visit(node)
+        self.scope.pop()
+        if index is not None:
+            self.current.pop()
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Call(self, node):
+        name = _dotted(node.func)
+        if name:
+            self.calls.add((self._chunk_at(node.lineno), name, self.classes[-1] if self.classes else ()))
+        self.generic_visit(node)
+
+    def _chunk_at(self, lineno):
+        if self.current:
+            return self.current[-1]
+        for start, end, index in self.loose_chunks:
+            if start <= lineno <= end:
+                return index
+        return None
+
+    def resolve(self, name, class_path):
+        """Resolved once the whole file is visited, so later definitions count too."""
+        head, _, rest = name.partition(".")
+        if head in ("self", "cls") and rest and "." not in rest and class_path:
+            return ".".join((self.module,) + class_path + (rest,))
+        if head in self.imports:
+            return self.imports[head] + ("." + rest if rest else "")
+        if not rest:
+            return f"{self.module}.{head}" if head in self.top_level else None
+        return "*." + name.rpartition(".")[2]
+
+
+def analyze_file(path, root, tree, chunks, digest):
+    """Dependency record for one parsed file; chunks as from chunk_file_by_definitions."""
+    module = module_name(path, root)
+    analyzer = _Analyzer(module, os.path.basename(path) == "__init__.py", chunks)
+    analyzer.visit(tree)
+    calls = set()
+    for index, name, class_path in analyzer.calls:
+        target = analyzer.resolve(name, class_path)
+        if index is not None and target and analyzer.defines.get(target) != index:
+            calls.add((index, target))
+    return {
+        "hash": digest,
+        "module": module,
+        "imports": sorted(set(analyzer.imports.values())),
+        "defines": analyzer.defines,
+        "calls": sorted(calls),
+    }
+
+
+class DependencyGraph:
+    def __init__(self):
+        self.files = {}                      # path -> record from analyze_file
+        self.defs = defaultdict(set)         # qualified name -> chunk ids
+        self.short = defaultdict(set)        # bare name -> chunk ids
+        self.names_of = defaultdict(set)     # chunk id -> qualified names it defines
+        self.calls_from = defaultdict(set)   # chunk id -> call targets
+        self.callers_of = defaultdict(set)   # call target -> calling chunk ids
+        self.importers_of = defaultdict(set) # imported dotted name -> importing file paths
+
+    def __len__(self):
+        return len(self.files)
+
+    def update_file(self, path, record):
+        self.remove_file(path)
+        self.files[path] = record
+        for qualname, index in record["defines"].items():
+            cid = chunk_id(path, index)
+            self.defs[qualname].add(cid)
+            self.short[qualname.rpartition(".")[2]].add(cid)
+            self.names_of[cid].add(qualname)
+        for index, target in record["calls"]:
+            cid = chunk_id(path, index)
+            self.calls_from[cid].add(target)
+            self.callers_of[target].add(cid)
+        for name in record["imports"]:
+            self.importers_of[name].add(path)
+
+    def remove_file(self, path):
+        record = self.files.pop(path, None)
+        if record is None:
+            return
+        for qualname, index in record["defines"].items():
+            cid = chunk_id(path, index)
+            self.defs[qualname].discard(cid)
+            self.short[qualname.rpartition(".")[2]].discard(cid)
+            self.names_of.pop(cid, None)
+        for index, target in record["calls"]:
+            cid = chunk_id(path, index)
+            self.calls_from.pop(cid, None)
+            self.callers_of[target].discard(cid)
+        for name in record["imports"]:
+            self.importers_of[name].discard(path)
+
+    def _targets(self, target):
+        if target.startswith("*."):
+            matches = self.short.get(target[2:], ())
+            return matches if len(matches) == 1 else ()
+        return self.defs.get(target, ())
+
+    def callees(self, cid):
+        found = set()
+        for target in self.calls_from.get(cid, ()):
+            found.update(self._targets(target))
+        found.discard(cid)
+        return found
+
+    def callers(self, cid):
+        found = set()
+        for qualname in self.names_of.get(cid, ()):
+            found.update(self.callers_of.get(qualname, ()))
+            short = qualname.rpartition(".")[2]
+            if len(self.short.get(short, ())) == 1:
+                found.update(self.callers_of.get("*." + short, ()))
+        found.discard(cid)
+        return found
+
+    def users(self, qualname):
+        """Paths of the files that import or call qualname."""
+        found = set(self.importers_of.get(qualname, ()))
+        found.update(cid.rpartition("-")[0] for cid in self.callers_of.get(qualname, ()))
+        return found
+
+    def neighbors(self, cids, limit=10):
+        """Direct callees then callers of cids, excluding cids themselves, up to limit ids."""
+        cids = list(cids)
+        exclude = set(cids)
+        ordered = []
+        for lookup in (self.callees, self.callers):
+            for cid in cids:
+                for other in sorted(lookup(cid)):
+                    if other not in exclude:
+                        exclude.add(other)
+                        ordered.append(other)
+        return ordered[:limit]
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": GRAPH_VERSION, "files": self.files}, f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        graph = cls()
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return graph
+        if data.get("version") != GRAPH_VERSION:
+            return graph
+        for file_path, record in data["files"].items():
+            record["calls"] = [tuple(call) for call in record["calls"]]
+            graph.update_file(file_path, record)
+        return graph
+
+
+def load_dependency_graph(root):
+    """The saved graph for root, reloaded only when it changed on disk."""
+    path = graph_path(root)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return DependencyGraph()
+    cached = _loaded.get(root)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    graph = DependencyGraph.load(path)
+    _loaded[root] = (mtime, graph)
+    return graph
+
+
+def sync_dependency_graph(manifest, root, records=None):
+    """
+    Bring root's graph in line with the manifest. records ({path: record})
+    are the files analyzed during this build; any other committed file whose
+    hash differs from its graph record (e.g. after a crash before the last
+    save) is parsed again here, and files no longer in the manifest dropped.
+    """
+    graph = DependencyGraph.load(graph_path(root))
+    for path, record in (records or {}).items():
+        if path in manifest.files and manifest.files[path]["hash"] == record["hash"]:
+            graph.update_file(path, record)
+    for path in [p for p in graph.files if p not in manifest.files]:
+        graph.remove_file(path)
+    for path, entry in manifest.files.items():
+        if graph.files.get(path, {}).get("hash") == entry["hash"]:
+            continue
+        try:
+            source, tree = parse_file(path)
+            chunks = chunk_file_by_definitions(path, source, tree)
+        except (OSError, SyntaxError, ValueError) as e:
+            logger.warning("Failed to analyze %s: %s", path, e)
+            continue
+        graph.update_file(path, analyze_file(path, root, tree, chunks, entry["hash"]))
+    graph.save(graph_path(root))
+    return graph
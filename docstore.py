@@ -0,0 +1,279 @@
+import json
+import logging
+import mmap
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from codebases import codebase_dir, default_root
+from file_meta import MMAP_THRESHOLD
+from manifest import text_hash
+
+# With DOCUMENT_STORAGE=reference the collection holds no chunk text. Each
+# chunk's metadata records where it lives in the file (start_byte, end_byte)
+# and the hash of its text (doc_hash); the text is read back from the working
+# tree when a query needs it and checked against the hash. Every chunk is also
+# kept zlib-compressed in a per-codebase BlobStore, which answers when the
+# file has changed since it was indexed.
+
+PAGE_CACHE_BYTES = 16 * 1024 * 1024  # small files kept in memory between lookups
+COMPACT_DEAD_RATIO = 0.5             # rewrite the pack once this much of it is unreferenced
+
+logger = logging.getLogger(__name__)
+
+
+def blob_dir(root):
+    return os.path.join(codebase_dir(root), "blobs")
+
+
+def document_storage(collection):
+    """How a collection stores chunk text; collections that predate the option are "inline"."""
+    return (collection.metadata or {}).get("document_storage", "inline")
+
+
+def chunk_refs(path, source, chunks):
+    """
+    [(start_byte, end_byte)] for each chunk, or (-1, -1) where the raw bytes
+    of the file don't spell out the chunk text exactly (CRLF line endings,
+    invalid UTF-8, unusual line separators). Those are served from the blob
+    store only.
+    """
+    with open(path, "rb") as f:
+        raw = f.read()
+    if source.encode("utf-8") != raw:
+        return [(-1, -1)] * len(chunks)
+    starts = [0]
+    for line in source.splitlines(keepends=True):
+        starts.append(starts[-1] + len(line.encode("utf-8")))
+    refs = []
+    for chunk in chunks:
+        if not chunk["code"]:
+            refs.append((-1, -1))
+            continue
+        start = starts[chunk["start"] - 1]
+        data = chunk["code"].encode("utf-8")
+        if raw[start:start + len(data)] == data:
+            refs.append((start, start + len(data)))
+        else:
+            refs.append((-1, -1))
+    return refs
+
+
+class BlobStore:
+    """
+    Append-only pack of zlib-compressed chunk texts keyed by text_hash. The
+    pack is written and fsynced before its index records, so after a crash
+    every indexed blob is intact; a torn last index line is ignored.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        self.pack_path = os.path.join(directory, "blobs.pack")
+        self.index_path = os.path.join(directory, "blobs.idx")
+        self.offsets = {}  # hash -> (offset, length)
+        self._index_mtime = None
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        self.offsets = {}
+        try:
+            self._index_mtime = os.stat(self.index_path).st_mtime_ns
+            pack_size = os.path.getsize(self.pack_path)
+            with open(self.index_path, "rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    try:
+                        digest, offset, length = json.loads(line)
+                    except ValueError:
+                        break
+                    if offset + length <= pack_size:
+                        self.offsets[digest] = (offset, length)
+        except OSError:
+            pass
+
+    def __contains__(self, digest):
+        return digest in self.offsets
+
+    @property
+    def nbytes(self):
+        try:
+            return os.path.getsize(self.pack_path)
+        except OSError:
+            return 0
+
+    def put_many(self, items):
+        """Store [(hash, text)], skipping texts already present."""
+        with self._lock:
+            new = {}
+            for digest, text in items:
+                if digest not in self.offsets and digest not in new:
+                    new[digest] = zlib.compress(text.encode("utf-8"), 9)
+            if not new:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            records = []
+            with open(self.pack_path, "ab") as pack:
+                offset = pack.tell()
+                for digest, data in new.items():
+                    pack.write(data)
+                    records.append((digest, offset, len(data)))
+                    offset += len(data)
+                pack.flush()
+                os.fsync(pack.fileno())
+            with open(self.index_path, "a", encoding="utf-8") as index:
+                index.write("".join(json.dumps(r) + "\n" for r in records))
+                index.flush()
+                os.fsync(index.fileno())
+            for digest, offset, length in records:
+                self.offsets[digest] = (offset, length)
+            self._index_mtime = os.stat(self.index_path).st_mtime_ns
+
+    def _reload_if_changed(self):
+        # Another process (a build) may have added to or compacted the pack
+        try:
+            mtime = os.stat(self.index_path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime != self._index_mtime:
+            self._load()
+
+    def _read(self, digest):
+        entry = self.offsets.get(digest)
+        if entry is None:
+            return None
+        offset, length = entry
+        with open(self.pack_path, "rb") as f:
+            f.seek(offset)
+            data = f.read(length)
+        text = zlib.decompress(data).decode("utf-8")
+        if text_hash(text) != digest:
+            raise ValueError(f"blob {digest} does not match its hash")
+        return text
+
+    def get(self, digest):
+        with self._lock:
+            # Offsets we already hold go stale when another process compacts
+            self._reload_if_changed()
+            try:
+                return self._read(digest)
+            except (zlib.error, ValueError):
+                # Compacted between the two renames, or since the stat above
+                self._load()
+                return self._read(digest)
+
+    def compact(self, live):
+        """Drop blobs whose hash is not in live once they make up most of the pack."""
+        with self._lock:
+            dead = sum(length for digest, (_, length) in self.offsets.items() if digest not in live)
+            total = sum(length for _, length in self.offsets.values())
+            if not total or dead / total < COMPACT_DEAD_RATIO:
+                return 0
+            offsets = {}
+            with open(self.pack_path, "rb") as src, open(self.pack_path + ".tmp", "wb") as dst:
+                for digest, (offset, length) in self.offsets.items():
+                    if digest in live:
+                        src.seek(offset)
+                        offsets[digest] = (dst.tell(), length)
+                        dst.write(src.read(length))
+                dst.flush()
+                os.fsync(dst.fileno())
+            with open(self.index_path + ".tmp", "w", encoding="utf-8") as f:
+                f.write("".join(json.dumps([d, o, n]) + "\n" for d, (o, n) in offsets.items()))
+                f.flush()
+                os.fsync(f.fileno())
+            # A crash between the two renames leaves index entries pointing at
+            # the wrong bytes; resolve() checks the hash of whatever get()
+            # returns, so that reads as a missing blob rather than wrong text.
+            os.replace(self.pack_path + ".tmp", self.pack_path)
+            os.replace(self.index_path + ".tmp", self.index_path)
+            self.offsets = offsets
+            self._index_mtime = os.stat(self.index_path).st_mtime_ns
+            return dead
+
+
+_stores = {}  # root -> BlobStore
+_stores_lock = threading.Lock()
+
+
+def blob_store(root):
+    with _stores_lock:
+        store = _stores.get(root)
+        if store is None:
+            store = _stores[root] = BlobStore(blob_dir(root))
+        return store
+
+
+class PageCache:
+    """Bytes of recently read small files, dropped when the file's mtime or size changes."""
+    def __init__(self, max_bytes=PAGE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._files = OrderedDict()  # path -> (mtime_ns, size, bytes)
+        self._lock = threading.Lock()
+
+    def read(self, path, start, end):
+        st = os.stat(path)
+        if st.st_size >= MMAP_THRESHOLD:
+            with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                return m[start:end]
+        with self._lock:
+            cached = self._files.get(path)
+            if cached and cached[:2] == (st.st_mtime_ns, st.st_size):
+                self._files.move_to_end(path)
+                return cached[2][start:end]
+        with open(path, "rb") as f:
+            data = f.read()
+        with self._lock:
+            old = self._files.pop(path, None)
+            if old:
+                self.size -= len(old[2])
+            self._files[path] = (st.st_mtime_ns, st.st_size, data)
+            self.size += len(data)
+            while self.size > self.max_bytes and self._files:
+                _, (_, _, dropped) = self._files.popitem(last=False)
+                self.size -= len(dropped)
+        return data[start:end]
+
+
+_pages = PageCache()
+
+
+def resolve(meta, root=None):
+    """The text of a chunk stored by reference, or None if it can't be recovered."""
+    digest = meta.get("doc_hash")
+    if not digest:
+        return None
+    start, end = meta.get("start_byte", -1), meta.get("end_byte", -1)
+    if start >= 0:
+        try:
+            text = _pages.read(meta["path"], start, end).decode("utf-8")
+            if text_hash(text) == digest:
+                return text
+        except (OSError, ValueError):
+            pass
+    try:
+        text = blob_store(root or default_root()).get(digest)  # checked against digest
+    except (OSError, zlib.error, ValueError):
+        text = None
+    if text is None:
+        logger.warning("Chunk %s of %s is unavailable", meta.get("chunk"), meta.get("path"))
+        return None
+    return text
+
+
+def resolve_documents(results, root=None):
+    """
+    Fill in the documents of a collection.get() or collection.query() result
+    whose chunks are stored by reference, in place. Needs "metadatas" in the
+    result. Returns results.
+    """
+    documents, metadatas = results.get("documents"), results.get("metadatas")
+    if documents is None or metadatas is None:
+        return results
+    nested = bool(documents) and isinstance(documents[0], list)
+    for docs, metas in (zip(documents, metadatas) if nested else [(documents, metadatas)]):
+        for i, (doc, meta) in enumerate(zip(docs, metas)):
+            if doc is None and meta and meta.get("doc_hash"):
+                docs[i] = resolve(meta, root) or ""
+    return results
@@ -1,22 +1,92 @@
 import difflib
+import logging
 import re
 from collections import defaultdict
 from logic import normalize_path
+from fastdiff import unified_diff
 import os
+import shutil
+import tempfile
+
+logger = logging.getLogger(__name__)
 
 def preview_diff(old, new):
-    diff = difflib.unified_diff(
-        old.splitlines(), new.splitlines(),
-        lineterm="", fromfile="old", tofile="new"
-    )
-    return "\n".join(diff)
+    # difflib.unified_diff(lineterm="") text for files up to fastdiff.SMALL_REGION
+    # lines; a faster patience diff, with possibly different hunks, beyond that
+    return unified_diff(old, new).text
+
+class EditConflict(ValueError):
+    """Two edits for the same file touch overlapping lines."""
+
+class EditMismatch(ValueError):
+    """A search/replace block's SEARCH text could not be located in its file."""
+
+# Minimum similarity for a SEARCH block that matches no lines exactly, even
+# ignoring indentation and trailing whitespace
+FUZZY_THRESHOLD = 0.85
+
+SEARCH_REPLACE_PATTERN = re.compile(
+    r"^<{5,9} SEARCH[^\n]*\n(.*?)^={5,9}[ \t]*\n(.*?)^>{5,9} REPLACE[^\n]*$",
+    re.DOTALL | re.MULTILINE
+)
+FILE_HEADER_PATTERN = re.compile(r"^--- FILE: (.*?) ---[ \t]*$", re.MULTILINE)
+
+def _write_temp(path, content):
+    """Write content to a fsynced temp file next to path and return its name."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(path):
+            shutil.copymode(path, tmp)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return tmp
+
+def _fsync_dir(directory):
+    if os.name != "posix":
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def write_files_atomic(contents):
+    """
+    Write {path: content} so each file is either fully old or fully new: every
+    file goes to a fsynced temp file first and only then are they renamed over
+    the originals. If any temp write fails nothing is replaced.
+    """
+    temps = {}
+    try:
+        for path, content in contents.items():
+            temps[path] = _write_temp(path, content)
+    except BaseException:
+        for tmp in temps.values():
+            os.unlink(tmp)
+        raise
+    for path, tmp in temps.items():
+        os.replace(tmp, path)
+    for directory in {os.path.dirname(os.path.abspath(p)) for p in temps}:
+        _fsync_dir(directory)
 
 def apply_change(path, new_content):
-    with open(path, "w", encoding="utf-8") as f:
-        f.write(new_content)
+    write_files_atomic({path: new_content})
 
 def parse_updated_chunks(text):
-    print("RAW AI OUTPUT:\n", text)
+    """
+    Edits from model output in either protocol: full chunks
+    ({file_path, start_line, end_line, code}) or search/replace blocks
+    ({file_path, search, replace}). apply_chunks_cross_file takes both.
+    """
+    logger.debug("Raw model output:\n%s", text)
+    if SEARCH_REPLACE_PATTERN.search(text):
+        return parse_search_replace(text)
     pattern = re.compile(
         r"--- FILE: (.*?) ---\n--- CHUNK START: lines (\d+)-(\d+) ---\n(.*?)\n--- CHUNK END ---",
         re.DOTALL
@@ -35,25 +105,203 @@ def parse_updated_chunks(text):
         })
     return chunks
 
+def parse_search_replace(text):
+    """Search/replace blocks, each belonging to the nearest preceding FILE header."""
+    headers = [(m.start(), m.group(1).strip()) for m in FILE_HEADER_PATTERN.finditer(text)]
+    edits = []
+    for match in SEARCH_REPLACE_PATTERN.finditer(text):
+        owner = [path for pos, path in headers if pos < match.start()]
+        if not owner:
+            continue
+        edits.append({
+            "file_path": owner[-1],
+            "search": match.group(1).rstrip("\n"),
+            "replace": match.group(2).rstrip("\n"),
+        })
+    return edits
+
+def _indent(line):
+    return line[:len(line) - len(line.lstrip())]
+
+def _reindent(text, old_indent, new_indent):
+    """Move text from old_indent to new_indent, e.g. when the model dropped a level."""
+    if old_indent == new_indent:
+        return text
+    out = []
+    for line in text.splitlines():
+        if line.startswith(old_indent):
+            line = new_indent + line[len(old_indent):]
+        elif line.strip():
+            line = new_indent + line.lstrip()
+        out.append(line)
+    return "\n".join(out)
+
+def _blank_edges(lines):
+    lead = next((i for i, line in enumerate(lines) if line.strip()), len(lines))
+    trail = next((i for i, line in enumerate(reversed(lines)) if line.strip()), len(lines))
+    return lead, trail
+
+def _trim_like(replace, search):
+    """Drop the blank edge lines from replace that locate_search_block ignored in search."""
+    lead, trail = _blank_edges(search.splitlines())
+    lines = replace.splitlines()
+    r_lead, r_trail = _blank_edges(lines)
+    lines = lines[min(lead, r_lead):]
+    return "\n".join(lines[:len(lines) - min(trail, r_trail)] if min(trail, r_trail) else lines)
+
+def locate_search_block(lines, search):
+    """
+    Find the (start, end) 0-based half-open line range in lines matching the
+    SEARCH text, plus the indentation offset to apply to the replacement.
+    Tries an exact line match, then one ignoring indentation and trailing
+    whitespace, then the most similar window above FUZZY_THRESHOLD. A match
+    that is not unique counts as a miss. Returns None on a miss.
+    """
+    wanted = search.splitlines()
+    while wanted and not wanted[0].strip():
+        wanted.pop(0)
+    while wanted and not wanted[-1].strip():
+        wanted.pop()
+    n = len(wanted)
+    if not n or n > len(lines):
+        return None
+    first = wanted[0].strip()
+    stripped = [line.strip() for line in lines]
+
+    exact, loose = [], []
+    for i in range(len(lines) - n + 1):
+        if stripped[i] != first:
+            continue
+        if all(lines[i + j].rstrip() == wanted[j].rstrip() for j in range(n)):
+            exact.append(i)
+        elif all(stripped[i + j] == wanted[j].strip() for j in range(n)):
+            loose.append(i)
+    for found in (exact, loose):
+        if len(found) == 1:
+            i = found[0]
+            return i, i + n, _indent(wanted[0]), _indent(lines[i])
+        if len(found) > 1:
+            return None
+
+    # Fuzzy: score windows starting at lines that resemble the first SEARCH line
+    target = "\n".join(line.strip() for line in wanted)
+    starts = [i for i in range(len(lines) - n + 1)
+              if difflib.SequenceMatcher(None, stripped[i], first).quick_ratio() >= 0.6]
+    scored = []
+    for i in starts:
+        matcher = difflib.SequenceMatcher(None, "\n".join(stripped[i:i + n]), target)
+        if matcher.quick_ratio() >= FUZZY_THRESHOLD:
+            scored.append((matcher.ratio(), i))
+    scored.sort(reverse=True)
+    if not scored or scored[0][0] < FUZZY_THRESHOLD or (len(scored) > 1 and scored[1][0] == scored[0][0]):
+        return None
+    i = scored[0][1]
+    return i, i + n, _indent(wanted[0]), _indent(lines[i])
+
+def search_replace_to_chunks(orig_code, edits):
+    """
+    Turn search/replace edits for one file into line-range chunks against
+    orig_code, so they go through the same validation and single-pass apply
+    as full chunks. Raises EditMismatch listing every block not found.
+    """
+    lines = orig_code.splitlines()
+    chunks, missing, appended = [], [], []
+    for edit in edits:
+        if not edit["search"].strip():
+            # Nothing to search for: append to the file
+            appended.append(edit)
+            continue
+        found = locate_search_block(lines, edit["search"])
+        if found is None:
+            missing.append(edit["search"].splitlines()[0].strip())
+            continue
+        start, end, old_indent, new_indent = found
+        code = _trim_like(edit["replace"], edit["search"])
+        replace_lines = [line for line in code.splitlines() if line.strip()]
+        if replace_lines and _indent(replace_lines[0]) == old_indent:
+            # SEARCH and REPLACE are indented alike but not like the file
+            code = _reindent(code, old_indent, new_indent)
+        if not code.strip():
+            # Deletion: an empty chunk would be skipped, so drop the lines explicitly
+            chunks.append(dict(edit, start_line=start + 1, end_line=end, code="", delete=True))
+        else:
+            chunks.append(dict(edit, start_line=start + 1, end_line=end, code=code))
+    if appended:
+        # Several appends to one file go in as one chunk, in the order given
+        code = "".join(edit["replace"] if edit["replace"].endswith("\n") else edit["replace"] + "\n"
+                       for edit in appended)
+        chunks.append(dict(appended[0], start_line=len(lines) + 1, end_line=len(lines), code=code))
+    if missing:
+        raise EditMismatch(
+            f"{len(missing)} search block(s) not found in {edits[0]['file_path']}: "
+            + "; ".join(repr(m) for m in missing)
+        )
+    return chunks
+
+def validate_edits(chunks, line_count):
+    """
+    Sort chunks by position and check them against the original file: each
+    becomes (start, end) 0-based half-open over the original lines, clamped to
+    the file. Identical duplicates are dropped; overlapping edits raise
+    EditConflict. Chunks with no code are skipped, as before, unless marked
+    delete (a search/replace block with an empty replacement).
+    """
+    edits = []
+    for chunk in chunks:
+        if not chunk['code'].splitlines() and not chunk.get('delete'):
+            continue
+        start = min(max(0, chunk['start_line'] - 1), line_count)
+        end = min(max(start, chunk['end_line']), line_count)
+        edits.append((start, end, chunk))
+    edits.sort(key=lambda e: (e[0], e[1]))
+
+    valid = []
+    for start, end, chunk in edits:
+        if valid:
+            prev_start, prev_end, prev = valid[-1]
+            if (start, end) == (prev_start, prev_end) and chunk['code'] == prev['code']:
+                continue
+            if start < prev_end or (start == prev_start and start == end):
+                raise EditConflict(
+                    f"Edits to lines {prev_start + 1}-{prev_end} and {start + 1}-{end} of "
+                    f"{normalize_path(chunk['file_path'])} overlap"
+                )
+        valid.append((start, end, chunk))
+    return valid
+
 def apply_updated_chunks_to_file(orig_code, chunks):
     """
     Apply multiple chunks to a single file.
-    Chunks must have 'start_line', 'end_line', 'code', 'file_path'.
+    Chunks must have 'start_line', 'end_line', 'code', 'file_path', with line
+    numbers referring to orig_code; edits never shift each other. The result
+    is assembled in one pass over the original lines, keeping their line
+    endings and the file's final newline (or lack of one).
     """
-    lines = orig_code.splitlines()
-    for chunk in sorted(chunks, key=lambda c: c['start_line']):
-        start = max(0, chunk['start_line'] - 1)
-        end = min(len(lines), chunk['end_line'])
-        new_lines = chunk['code'].splitlines()
-        if not new_lines:
+    lines = orig_code.splitlines(keepends=True)
+    newline = "\r\n" if lines and lines[0].endswith("\r\n") else "\n"
+    terminated = not lines or lines[-1].endswith(("\n", "\r"))
+    out = []
+    cursor = 0
+    for start, end, chunk in validate_edits(chunks, len(lines)):
+        logger.debug("Applying chunk to lines %d-%d of %s", start + 1, end, normalize_path(chunk['file_path']))
+        out.extend(lines[cursor:start])
+        cursor = end
+        if chunk.get('delete'):
             continue
-        print(f"Applying chunk to lines {start+1}-{end} of {normalize_path(chunk['file_path'])}")
-        lines[start:end] = new_lines
-    return "\n".join(lines)
+        if start == len(lines) and not terminated:
+            # Appending after an unterminated last line
+            out.append(newline)
+        out.append(newline.join(chunk['code'].splitlines()))
+        if end < len(lines) or terminated:
+            out.append(newline)
+    out.extend(lines[cursor:])
+    return "".join(out)
 
 def apply_chunks_cross_file(updated_chunks):
     """
     Returns a dict: normalized file path -> merged code.
+    Accepts full chunks and search/replace edits (see parse_updated_chunks);
+    raises EditMismatch if a search block can't be located.
     """
     file_map = defaultdict(list)
     for chunk in updated_chunks:
@@ -64,8 +312,10 @@ def apply_chunks_cross_file(updated_chunks):
         if not os.path.exists(path):
             print(f"Warning: file does not exist: {path}")
             continue
-        with open(path, "r", encoding="utf-8") as f:
+        with open(path, "r", encoding="utf-8", newline="") as f:
             orig_code = f.read()
+        if any("search" in chunk for chunk in chunks):
+            chunks = search_replace_to_chunks(orig_code, chunks)
         merged_code = apply_updated_chunks_to_file(orig_code, chunks)
         merged_files[path] = merged_code
     return merged_files
@@ -0,0 +1,148 @@
+import hashlib
+import threading
+from collections import Counter
+import numpy as np
+from openai import OpenAI
+from config import OPENAI_API_KEY, EMBEDDING_DIMENSIONS, EMBEDDING_PROVIDER, LOCAL_EMBEDDING_DIMENSIONS
+from lexical import tokenize, IDENTIFIER_RE
+import tracing
+
+# An embedder turns a list of texts into unit-length vectors. Each codebase's
+# collection records which one built it (see describe()), and queries against
+# that collection must use the same one.
+
+# Words in nearly every chunk; they carry no signal and would dominate the
+# term counts. Stands in for corpus IDF so vectors never depend on what else
+# is in the index, which keeps incremental updates consistent.
+STOPWORDS = frozenset(
+    "self cls def class return import from if else elif for in while try except "
+    "finally with as not and or is none true false pass raise lambda yield the a "
+    "an of to this that be it".split()
+)
+
+
+class OpenAIEmbedder:
+    name = "openai"
+    model = "text-embedding-3-small"
+
+    def __init__(self, dimensions=EMBEDDING_DIMENSIONS):
+        # dimensions=0 keeps the model's full size
+        self.dimensions = dimensions
+        self._client = None
+
+    def describe(self):
+        return {"embedding_provider": self.name, "embedding_dimensions": self.dimensions}
+
+    def embed(self, texts):
+        # Created on first use so the local embedder works without an API key
+        if self._client is None:
+            self._client = OpenAI(api_key=OPENAI_API_KEY)
+        kwargs = {"dimensions": self.dimensions} if self.dimensions else {}
+        with tracing.span("embed", provider=self.name, inputs=len(texts), bytes=sum(len(t) for t in texts)) as s:
+            response = self._client.embeddings.create(model=self.model, input=texts, **kwargs)
+            tracing.record_usage(s, self.model, response.usage)
+        return [d.embedding for d in response.data]
+
+
+class LocalEmbedder:
+    """
+    CPU-only embedder: code-aware tokens (identifiers and their snake/camel
+    parts) with sublinear term weights, hashed straight into `dimensions`
+    buckets through a sparse signed random projection. Each token lands in
+    `hashes` buckets with random signs, so similar token bags give similar
+    vectors without ever materialising a vocabulary or a projection matrix.
+    """
+    name = "local"
+    model = "hashing-rp-v1"
+
+    def __init__(self, dimensions=LOCAL_EMBEDDING_DIMENSIONS, hashes=4, max_cached_tokens=200_000):
+        self.dimensions = dimensions
+        self.hashes = hashes
+        self.max_cached_tokens = max_cached_tokens
+        # Shared embedders are called from several build and query threads
+        self._lock = threading.Lock()
+        self._reset_cache()
+
+    def _reset_cache(self):
+        self._idents = {}     # identifier -> token ids
+        self._token_ids = {}  # token -> row in _buckets/_signs
+        self._buckets = []
+        self._signs = []
+
+    def describe(self):
+        return {"embedding_provider": self.name, "embedding_dimensions": self.dimensions}
+
+    def _token_id(self, token):
+        tid = self._token_ids.get(token)
+        if tid is None:
+            digest = hashlib.blake2b(token.encode("utf-8"), digest_size=4 * self.hashes).digest()
+            words = np.frombuffer(digest, dtype="<u4")
+            tid = self._token_ids[token] = len(self._buckets)
+            self._buckets.append(words % self.dimensions)
+            self._signs.append(np.where(words & 1 << 31, 1.0, -1.0))
+        return tid
+
+    def _ident_ids(self, ident):
+        # Identifiers repeat heavily across chunks, so split and hash each once
+        ids = self._idents.get(ident)
+        if ids is None:
+            ids = self._idents[ident] = [
+                self._token_id(token) for token in tokenize(ident)
+                if token not in STOPWORDS and len(token) > 1
+            ]
+        return ids
+
+    def embed(self, texts):
+        with tracing.span("embed", provider=self.name, inputs=len(texts), bytes=sum(len(t) for t in texts)):
+            rows, ids, tfs = [], [], []
+            with self._lock:
+                if len(self._token_ids) > self.max_cached_tokens:
+                    self._reset_cache()
+                for row, text in enumerate(texts):
+                    counts = Counter()
+                    for ident, n in Counter(IDENTIFIER_RE.findall(text or "")).items():
+                        for tid in self._ident_ids(ident):
+                            counts[tid] += n
+                    rows.extend([row] * len(counts))
+                    ids.extend(counts.keys())
+                    tfs.extend(counts.values())
+                if ids:
+                    # Gather only the tokens in this batch, not the whole cache
+                    used, inverse = np.unique(np.asarray(ids), return_inverse=True)
+                    buckets = np.asarray([self._buckets[i] for i in used])[inverse]
+                    signs = np.asarray([self._signs[i] for i in used])[inverse]
+
+            dims = self.dimensions
+            matrix = np.zeros(len(texts) * dims, dtype=np.float64)
+            if ids:
+                weights = signs * (1.0 + np.log(np.asarray(tfs, dtype=np.float64)))[:, None]
+                flat = np.asarray(rows)[:, None] * dims + buckets
+                matrix = np.bincount(flat.ravel(), weights=weights.ravel(), minlength=len(texts) * dims)
+            matrix = matrix.reshape(len(texts), dims).astype(np.float32)
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            matrix /= np.where(norms > 0, norms, 1.0)
+        return matrix.tolist()
+
+
+PROVIDERS = {
+    "openai": OpenAIEmbedder,
+    "local": LocalEmbedder,
+}
+
+_embedders = {}
+
+
+def make_embedder(name=EMBEDDING_PROVIDER, dimensions=None):
+    """Shared embedder instances, so the API client and token cache are reused across calls."""
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown embedding provider {name!r}; expected one of {sorted(PROVIDERS)}")
+    key = (name, dimensions)
+    if key not in _embedders:
+        _embedders[key] = PROVIDERS[name]() if dimensions is None else PROVIDERS[name](dimensions)
+    return _embedders[key]
+
+
+def collection_embedder(collection):
+    """The embedder a collection was built with; older collections predate providers and used OpenAI."""
+    meta = collection.metadata or {}
+    return make_embedder(meta.get("embedding_provider", "openai"), meta.get("embedding_dimensions", 0))
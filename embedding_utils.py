@@ -2,49 +2,202 @@ import os
 import chromadb
 import ast
 from openai import OpenAI
-from scan import scan_files, chunk_file_by_definitions
-from config import CHROMA_DB_PATH, OPENAI_API_KEY, EXCLUDE_DIRS, PROJECT_PATH
+from scan import scan_files, iter_files, chunk_file_by_definitions, parse_file
+from memstats import MemoryMonitor
+from manifest import IndexManifest, file_hash, text_hash
+from file_meta import FileMeta, read_source
+from config import (
+    OPENAI_API_KEY, TRACE_MEMORY, EMBEDDING_PROVIDER, DOCUMENT_STORAGE, SUMMARY_DRIFT_THRESHOLD
+)
+from embedders import make_embedder, collection_embedder
+from vector_search import sync_vector_index
+from depgraph import analyze_file, sync_dependency_graph
+from docstore import chunk_refs, blob_store, document_storage
+from fingerprint import fingerprint, drift
+from codebases import (
+    default_root, cache_path, manifest_path, collection_name, get_client, touch, enforce_disk_cap,
+    load_versions, begin_version, activate_version, gc_versions, known_versions
+)
 import json
+import math
+import queue
+import threading
+import time
+import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import tracing
 
-CACHE_FILE = "file_summaries_cache.json"
+logger = logging.getLogger(__name__)
 
-def load_cache():
-    if os.path.exists(CACHE_FILE):
-        with open(CACHE_FILE, "r", encoding="utf-8") as f:
+def load_cache(root_dir):
+    path = cache_path(root_dir)
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
             return json.load(f)
     return {}
 
-def save_cache(cache):
-    with open(CACHE_FILE, "w", encoding="utf-8") as f:
-        json.dump(cache, f, indent=2, ensure_ascii=False)
+_cache_lock = threading.Lock()
 
-client = OpenAI(api_key=OPENAI_API_KEY)
+def save_cache(cache, root_dir):
+    """
+    Write cache, keeping any summary the background refresher saved since
+    cache was loaded (entries with a later "summarized_at").
+    """
+    path = cache_path(root_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with _cache_lock:
+        for file_path, entry in load_cache(root_dir).items():
+            mine = cache.get(file_path)
+            if mine is None or entry.get("summarized_at", 0) <= mine.get("summarized_at", 0):
+                continue
+            mine.update(summary=entry["summary"], fingerprint=entry.get("fingerprint"),
+                        summarized_at=entry["summarized_at"])
+            # Still stale only if the file changed again after the refresher read it
+            mine["stale"] = mine.get("stale", False) and mine.get("mtime") != entry.get("mtime")
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(cache, f, indent=2, ensure_ascii=False)
+        os.replace(tmp, path)
 
-def extract_file_metadata(file_path, cache):
-    current_mtime = os.path.getmtime(file_path)
+_client = None
 
-    # Check cache first
-    if file_path in cache:
-        cached = cache[file_path]
-        cached_mtime = cached.get("mtime")
-        if cached_mtime == current_mtime:
-            # Cache is valid
-            return {
-                "path": file_path,
-                "summary": cached["summary"],
-                "symbols": cached["symbols"],
-                "code": None  # optionally don't load full code here
-            }
+def openai_client():
+    """Created on first use: with local embeddings, indexing needs no API key (summaries fall back)."""
+    global _client
+    if _client is None:
+        _client = OpenAI(api_key=OPENAI_API_KEY)
+    return _client
 
-    # Cache is missing or stale, generate metadata and summary
-    try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            source = f.read()
-        tree = ast.parse(source)
-    except Exception as e:
-        print(f"Failed to parse {file_path}: {e}")
-        return None
+def collection_dimensions(collection):
+    """The embedding dimensions a collection was built with (0 = model default)."""
+    return (collection.metadata or {}).get("embedding_dimensions", 0)
+
+def embed_query(text, collection):
+    """Embed a query with the same provider that built collection."""
+    return collection_embedder(collection).embed([text])[0]
+
+# Summaries only need the shape of a file, not all of it. Sources are condensed
+# to roughly this many tokens, then packed several files per request.
+SUMMARY_MODEL = "gpt-4.1-nano"
+SUMMARY_TOKEN_BUDGET = 400
+SUMMARY_BATCH_TOKENS = 3000
+SUMMARY_BATCH_FILES = 8
+SUMMARY_WORKERS = 4
+
+def estimate_tokens(text):
+    return len(text) // 4 + 1
+
+def condense_source(source, tree, budget_tokens=SUMMARY_TOKEN_BUDGET):
+    """
+    Reduce a file to what a purpose summary needs: imports, top-level
+    signatures with the first docstring line, then as much of the file head
+    as still fits in the budget.
+    """
+    budget_chars = budget_tokens * 4
+    if len(source) <= budget_chars:
+        return source
 
+    lines = source.splitlines()
+    outline = []
+    for node in tree.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            outline.append(ast.get_source_segment(source, node) or "")
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            outline.append(lines[node.lineno - 1].strip())
+            doc = ast.get_docstring(node)
+            if doc:
+                outline.append(f'    """{doc.strip().splitlines()[0]}"""')
+            if isinstance(node, ast.ClassDef):
+                for child in node.body:
+                    if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                        outline.append("    " + lines[child.lineno - 1].strip())
+
+    text = "\n".join(outline)[:budget_chars]
+    remaining = budget_chars - len(text)
+    if remaining > 200:
+        text = source[:remaining] + "\n...\n" + text
+    return text
+
+def fallback_summary(symbols):
+    return f"Defines {len(symbols)} symbols: {', '.join(symbols[:5])}" + (", ..." if len(symbols) > 5 else "")
+
+def summarize_batch(items, usage_span=None):
+    """
+    Summarize several files with one request. items is a list of
+    (path, symbols, condensed_source); returns {path: summary} for the files the
+    model answered.
+    """
+    parts = []
+    for i, (path, symbols, condensed) in enumerate(items, 1):
+        parts.append(
+            f"### File {i}: {os.path.basename(path)}\n"
+            f"Symbols: {', '.join(symbols)}\n"
+            f"{condensed}"
+        )
+    prompt = (
+        "Summarize each Python file below in one short sentence, focusing on its purpose, "
+        "not on how it works. Avoid generic phrases.\n"
+        'Respond with JSON only: {"summaries": {"<file number>": "<sentence>", ...}}\n\n'
+        + "\n\n".join(parts)
+    )
+    response = openai_client().chat.completions.create(
+        model=SUMMARY_MODEL,
+        messages=[
+            {"role": "system", "content": "You are a helpful assistant that writes concise file summaries."},
+            {"role": "user", "content": prompt}
+        ],
+        response_format={"type": "json_object"},
+        max_tokens=60 * len(items)
+    )
+    if usage_span is not None:
+        tracing.record_usage(usage_span, SUMMARY_MODEL, response.usage)
+        usage_span.add(requests=1, bytes=len(prompt))
+    answers = json.loads(response.choices[0].message.content).get("summaries", {})
+    summaries = {}
+    for i, (path, _, _) in enumerate(items, 1):
+        text = answers.get(str(i))
+        if isinstance(text, str) and text.strip():
+            summaries[path] = text.strip()
+    return summaries
+
+def summarize_files(items, max_workers=SUMMARY_WORKERS):
+    """
+    Summarize (path, symbols, condensed_source) items by packing them into
+    batches of at most SUMMARY_BATCH_FILES files / SUMMARY_BATCH_TOKENS tokens and
+    running the batches with bounded concurrency. Files the model skips or
+    that fail get the symbol-list fallback.
+    """
+    batches = []
+    current, current_tokens = [], 0
+    for item in items:
+        tokens = estimate_tokens(item[2])
+        if current and (len(current) >= SUMMARY_BATCH_FILES or current_tokens + tokens > SUMMARY_BATCH_TOKENS):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(item)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+
+    summaries = {}
+    if batches:
+        logger.info("Summarizing %d files in %d requests", len(items), len(batches))
+        with tracing.span("summarize", files=len(items)) as s, \
+                ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = {pool.submit(summarize_batch, batch, s): batch for batch in batches}
+            for future in as_completed(futures):
+                try:
+                    summaries.update(future.result())
+                except Exception as e:
+                    logger.warning("Failed to generate AI summaries for batch: %s", e)
+
+    for path, symbols, _ in items:
+        if path not in summaries:
+            summaries[path] = fallback_summary(symbols)
+    return summaries
+
+def top_level_symbols(tree):
     symbols = []
     for node in ast.iter_child_nodes(tree):
         if isinstance(node, (ast.FunctionDef, ast.ClassDef)):
@@ -57,113 +210,520 @@ def extract_file_metadata(file_path, cache):
                     for elt in target.elts:
                         if isinstance(elt, ast.Name):
                             symbols.append(elt.id)
+    return symbols
 
-    summary = ast.get_docstring(tree)
+def extract_file_metadata(file_path, cache, summarize=True, stats=None):
+    """
+    Return a FileMeta for one file, using the cache when its mtime is unchanged.
+    With summarize=False, files without a docstring come back with
+    summary None and the condensed source in meta.pending, so callers can
+    batch them through summarize_files() and then record_summary().
 
-    if not summary:
-        prompt = (
-            "Summarize this Python file in one short sentence, focusing on its purpose, "
-            "not on how it works. Avoid generic phrases.\n\n"
-            f"Symbols: {', '.join(symbols)}\n\n"
-            "Code:\n"
-            f"{source}"
-        )
-        try:
-            response = client.chat.completions.create(
-                model="gpt-4.1-nano",
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant that writes concise file summaries."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=50
-            )
-            summary = response.choices[0].message.content.strip()
-        except Exception as e:
-            print(f"Failed to generate AI summary for {file_path}: {e}")
-            summary = f"Defines {len(symbols)} symbols: {', '.join(symbols[:5])}" + (", ..." if len(symbols) > 5 else "")
+    A changed file keeps its cached summary unless its structural fingerprint
+    has drifted past SUMMARY_DRIFT_THRESHOLD since it was summarized; then
+    the old summary is still returned but the entry is marked "stale" for
+    SummaryRefresher. stats (a Counter) counts "changed", "kept", "stale"
+    and "new" files.
+    """
+    current_mtime = os.path.getmtime(file_path)
 
-    # Update cache with new summary and current mtime
-    cache[file_path] = {
-        "summary": summary,
-        "symbols": symbols,
-        "mtime": current_mtime
-    }
+    # Check cache first
+    cached = cache.get(file_path)
+    if cached and cached.get("mtime") == current_mtime:
+        # Cache is valid; source is only read if meta.code is accessed
+        return FileMeta(file_path, cached["summary"], cached["symbols"])
+
+    # Cache is missing or stale, generate metadata and summary
+    try:
+        source = read_source(file_path)
+        tree = ast.parse(source)
+    except Exception as e:
+        logger.warning("Failed to parse %s: %s", file_path, e)
+        return None
+
+    symbols = top_level_symbols(tree)
+    features = fingerprint(tree)
+    meta = FileMeta(file_path, ast.get_docstring(tree), symbols, mtime=current_mtime, fingerprint=features)
+
+    if not meta.summary and cached and cached.get("summary"):
+        # Edited since it was summarized: keep the summary unless the outline moved
+        baseline = cached.get("fingerprint")
+        stale = baseline is None or drift(baseline, features) > SUMMARY_DRIFT_THRESHOLD
+        if stats is not None:
+            stats["changed"] += 1
+            stats["stale" if stale else "kept"] += 1
+        cached.update(symbols=list(symbols), mtime=current_mtime, stale=cached.get("stale", False) or stale)
+        meta.summary = cached["summary"]
+        meta.fingerprint = None
+        return meta
+
+    if not meta.summary:
+        if stats is not None:
+            stats["new"] += 1
+        condensed = condense_source(source, tree)
+        if not summarize:
+            meta.pending = condensed
+            return meta
+        meta.summary = summarize_files([(file_path, symbols, condensed)])[file_path]
+
+    record_summary(meta, meta.summary, cache)
+    return meta
 
-    return {
-        "path": file_path,
+def record_summary(meta, summary, cache):
+    """Set a freshly generated summary on meta and write it to the cache."""
+    meta.summary = summary
+    meta.pending = None
+    cache[meta.path] = {
         "summary": summary,
-        "symbols": symbols,
-        "code": source
+        "symbols": list(meta.symbols),
+        "mtime": meta.mtime,
+        "fingerprint": meta.fingerprint,
+        "summarized_at": time.time(),
+        "stale": False,
     }
+    meta.fingerprint = None
+
+def extract_all_file_metadata(paths, cache, stats=None):
+    """Metadata for many files, with missing summaries generated in batches."""
+    metas = []
+    counts = Counter()
+    with tracing.span("parse") as s:
+        for path in paths:
+            meta = extract_file_metadata(path, cache, summarize=False, stats=counts)
+            if meta:
+                metas.append(meta)
+        # Cache hits come back without an mtime; parsed files carry theirs
+        s.add(files=len(metas), cache_hits=sum(1 for m in metas if m.mtime is None),
+              summaries_kept=counts["kept"], summaries_stale=counts["stale"])
+    if stats is not None:
+        stats.update(counts)
+
+    pending = [m for m in metas if m.pending is not None]
+    summaries = summarize_files([(m.path, m.symbols, m.pending) for m in pending])
+    for meta in pending:
+        record_summary(meta, summaries[meta.path], cache)
+    return metas
+
+def report_summary_stats(stats):
+    """Log how many changed files needed a new summary and the requests that saved."""
+    if not stats["changed"]:
+        return
+    kept = stats["kept"]
+    logger.info(
+        "Summaries: %d edited files, %d queued for regeneration (%.0f%%), %d kept by fingerprint "
+        "(~%d %s requests avoided); %d new files summarized",
+        stats["changed"], stats["stale"], 100 * stats["stale"] / stats["changed"], kept,
+        math.ceil(kept / SUMMARY_BATCH_FILES), SUMMARY_MODEL, stats["new"],
+    )
 
 def load_all_file_metadata(root_dir=None):
     if root_dir is None:
         root_dir = os.getcwd()  # fallback if nothing is passed
     
-    cache = load_cache()
-    all_paths = scan_files(root_dir)
-    all_metas = []
-    for path in all_paths:
-        meta = extract_file_metadata(path, cache)
-        if meta:
-            all_metas.append(meta)
-    save_cache(cache)
+    cache = load_cache(root_dir)
+    stats = Counter()
+    with tracing.span("scan") as s:
+        all_paths = scan_files(root_dir)
+        s.add(files=len(all_paths))
+    all_metas = extract_all_file_metadata(all_paths, cache, stats)
+    save_cache(cache, root_dir)
+    report_summary_stats(stats)
+    queue_stale_summaries(root_dir, cache, {m.path for m in all_metas})
     return all_metas
 
-def build_index(project_path=None):
-    if project_path is None:
-        project_path = PROJECT_PATH
-    chroma_client = chromadb.PersistentClient(path=CHROMA_DB_PATH)
-    try:
-        chroma_client.delete_collection(name="codebase")
-        collection = chroma_client.create_collection(name="codebase")
-        print("Using existing collection.")
-        all_data = collection.get()
-        all_ids = all_data.get("ids", [])
-        if all_ids:
-            collection.delete(ids=all_ids)
-    except chromadb.errors.NotFoundError:
-        collection = chroma_client.create_collection(name="codebase")
-        print("Created new collection.")
-
-    cache = load_cache()
-    files = scan_files(project_path)
-    print(f"Found {len(files)} files to index.")
-
-    for path in files:
-        meta = extract_file_metadata(path, cache)
-        if not meta:
-            continue
+class SummaryRefresher:
+    """
+    Background queue that regenerates summaries marked stale, a batch of
+    files per round on one daemon thread per codebase. Results are merged
+    into the summary cache and the summary metadata of the file's chunks in
+    the active collection; a file the model fails on keeps its old summary.
+    """
+    def __init__(self, root):
+        self.root = root
+        self.refreshed = 0
+        self._queue = queue.Queue()
+        self._queued = set()
+        self._lock = threading.Lock()
+        self._thread = None
 
-        # Use new chunking by definitions
-        chunks = chunk_file_by_definitions(path)
+    def enqueue(self, paths):
+        with self._lock:
+            for path in paths:
+                if path not in self._queued:
+                    self._queued.add(path)
+                    self._queue.put(path)
+            if self._thread is None and self._queued:
+                self._thread = threading.Thread(target=self._run, name="summary-refresh", daemon=True)
+                self._thread.start()
 
+    @property
+    def pending(self):
+        return len(self._queued)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < SUMMARY_BATCH_FILES * SUMMARY_WORKERS:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with tracing.trace("summary_refresh"):
+                    self._refresh(batch)
+            except Exception as e:
+                logger.warning("Summary refresh failed for %d files: %s", len(batch), e)
+            finally:
+                with self._lock:
+                    self._queued.difference_update(batch)
+
+    def _refresh(self, paths):
+        items, parsed = [], {}
+        for path in paths:
+            try:
+                mtime = os.path.getmtime(path)
+                source = read_source(path)
+                tree = ast.parse(source)
+            except (OSError, SyntaxError, ValueError):
+                continue
+            symbols = top_level_symbols(tree)
+            parsed[path] = (mtime, symbols, fingerprint(tree))
+            items.append((path, symbols, condense_source(source, tree)))
+        summaries = summarize_files(items)
+        done = {}
+        for path, (mtime, symbols, features) in parsed.items():
+            if summaries[path] != fallback_summary(symbols):
+                done[path] = {"summary": summaries[path], "symbols": symbols, "mtime": mtime,
+                              "fingerprint": features, "summarized_at": time.time(), "stale": False}
+        if not done:
+            return
+        cache = load_cache(self.root)
+        for path, entry in done.items():
+            cache[path] = dict(cache.get(path, {}), **entry)
+        save_cache(cache, self.root)
+        self._update_collection(done)
+        self.refreshed += len(done)
+        logger.info("Refreshed %d stale summaries (%d refreshed so far, %d queued)",
+                    len(done), self.refreshed, self.pending - len(paths))
+
+    def _update_collection(self, entries):
+        try:
+            collection = get_client().get_collection(name=collection_name(self.root))
+        except (chromadb.errors.NotFoundError, ValueError):
+            return
+        for path, entry in entries.items():
+            got = collection.get(where={"path": path}, include=["metadatas"])
+            if got["ids"]:
+                collection.update(ids=got["ids"],
+                                  metadatas=[dict(m, summary=entry["summary"]) for m in got["metadatas"]])
+
+
+_refreshers = {}
+_refreshers_lock = threading.Lock()
+
+def summary_refresher(root):
+    root = os.path.abspath(root)
+    with _refreshers_lock:
+        if root not in _refreshers:
+            _refreshers[root] = SummaryRefresher(root)
+        return _refreshers[root]
+
+def queue_stale_summaries(root, cache, paths=None):
+    """Hand every cache entry marked stale (among paths, if given) to root's SummaryRefresher."""
+    stale = [p for p, entry in cache.items() if entry.get("stale") and (paths is None or p in paths)]
+    if stale:
+        summary_refresher(root).enqueue(stale)
+    return stale
+
+# Bounded hand-off between the metadata/chunking stage and the embed/store
+# stage, and how many chunks go into one embeddings request / collection.add.
+INDEX_QUEUE_SIZE = 256
+EMBED_BATCH_SIZE = 64
+MEMORY_REPORT_EVERY = 1000
+
+def iter_file_metadata(paths, cache, window=SUMMARY_BATCH_FILES * SUMMARY_WORKERS, stats=None):
+    """Stream FileMeta for paths, summarizing a window of files at a time."""
+    batch = []
+    for path in paths:
+        batch.append(path)
+        if len(batch) >= window:
+            yield from extract_all_file_metadata(batch, cache, stats)
+            batch = []
+    if batch:
+        yield from extract_all_file_metadata(batch, cache, stats)
+
+def iter_chunks(metas, root, by_reference=False):
+    """
+    Yield (meta, chunk index, chunk data, file info) for every chunk of every
+    file. file info is (os.stat_result, content hash, chunk count, dependency
+    record) as of chunking, used to commit the file to the manifest and the
+    dependency graph. by_reference adds each chunk's byte range in the file
+    as chunk data "ref". A file with no chunks (an empty file, say)
+    yields one item with chunk index and data None, so it is still committed.
+    """
+    for meta in metas:
+        try:
+            with tracing.span("chunk") as s:
+                st = os.stat(meta.path)
+                digest = file_hash(meta.path)
+                source, tree = parse_file(meta.path)
+                chunks = chunk_file_by_definitions(meta.path, source, tree)
+                deps = analyze_file(meta.path, root, tree, chunks, digest)
+                if by_reference:
+                    for chunk_data, ref in zip(chunks, chunk_refs(meta.path, source, chunks)):
+                        chunk_data["ref"] = ref
+                s.add(bytes=st.st_size, chunks=len(chunks))
+        except Exception as e:
+            logger.warning("Failed to chunk %s: %s", meta.path, e)
+            continue
+        info = (st, digest, len(chunks), deps)
+        if not chunks:
+            yield meta, None, None, info
         for i, chunk_data in enumerate(chunks):
-            chunk_code = chunk_data["code"]
-            embedding = client.embeddings.create(
-                model="text-embedding-3-small",
-                input=chunk_code
-            ).data[0].embedding
-
-            # Build metadata for chunk
-            chunk_meta = {
-                "path": path,
-                "chunk": i,
-                "summary": meta["summary"],
-                "symbols": ", ".join(meta["symbols"]),
-                "chunk_type": chunk_data["type"],
-                "chunk_name": chunk_data.get("name", ""),
-                "start_line": chunk_data["start"],
-                "end_line": chunk_data["end"],
-            }
-
-            collection.add(
-                documents=[chunk_code or "NO_CODE_FOUND"],
-                metadatas=[chunk_meta],
-                ids=[f"{path}-{i}"],
-                embeddings=[embedding]
-            )
-            print(f"Indexed chunk {i} from {path}: {chunk_code[:60]}...")
-
-    save_cache(cache)
-    print("Index build complete.")
+            yield meta, i, chunk_data, info
+
+def _put(out_queue, item, stop):
+    """Put item on out_queue unless stop is set first; False if it was."""
+    while not stop.is_set():
+        try:
+            out_queue.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def _produce(items, out_queue, stop, trace=None):
+    try:
+        with tracing.attach(trace):
+            for item in items:
+                if not _put(out_queue, item, stop):
+                    items.close()
+                    return
+    except BaseException as e:
+        _put(out_queue, e, stop)
+    else:
+        _put(out_queue, None, stop)
+
+def _embed_and_store(collection, batch, blobs=None):
+    """
+    Embed and upsert a batch of chunks. With a docstore.BlobStore the chunk
+    text is not stored in the collection: it goes to blobs, and the metadata
+    records where to find it in the file.
+    """
+    documents = [chunk_data["code"] or "NO_CODE_FOUND" for _, _, chunk_data, _ in batch]
+    embeddings = collection_embedder(collection).embed(documents)
+
+    metadatas, ids = [], []
+    for meta, i, chunk_data, _ in batch:
+        # Build metadata for chunk
+        metadatas.append({
+            "path": meta.path,
+            "chunk": i,
+            "summary": meta.summary,
+            "symbols": ", ".join(meta.symbols),
+            "chunk_type": chunk_data["type"],
+            "chunk_name": chunk_data.get("name", ""),
+            "start_line": chunk_data["start"],
+            "end_line": chunk_data["end"],
+        })
+        ids.append(f"{meta.path}-{i}")
+
+    kwargs = {"documents": documents}
+    if blobs is not None:
+        # Blobs first, so a stored reference can always fall back to one
+        hashes = [text_hash(chunk_data["code"]) for _, _, chunk_data, _ in batch]
+        blobs.put_many((h, chunk_data["code"]) for h, (_, _, chunk_data, _) in zip(hashes, batch))
+        for metadata, digest, (_, _, chunk_data, _) in zip(metadatas, hashes, batch):
+            start, end = chunk_data.get("ref", (-1, -1))
+            metadata.update(start_byte=start, end_byte=end, doc_hash=digest)
+        kwargs = {}
+
+    # upsert so a resumed build can safely rewrite chunks it had already stored
+    with tracing.span("store", chunks=len(ids)):
+        collection.upsert(
+            metadatas=metadatas,
+            ids=ids,
+            embeddings=embeddings,
+            **kwargs
+        )
+
+def compact_blobs(root, blobs, manifest, version):
+    """Drop stored chunk texts that no index version of root refers to any more."""
+    live = {h for record in manifest.files.values() for h in record["chunks"]}
+    for other in known_versions(root) - {version}:
+        other_manifest = IndexManifest(manifest_path(root, other))
+        live.update(h for record in other_manifest.files.values() for h in record["chunks"])
+    freed = blobs.compact(live)
+    if freed:
+        logger.info("Compacted stored chunk texts, freed %.1f MiB", freed / 1024 / 1024)
+    logger.info("Stored chunk texts: %.1f MiB compressed", blobs.nbytes / 1024 / 1024)
+
+def build_index(project_path=None, trace_memory=TRACE_MEMORY, full=False, provider=None):
+    """Run _build_index under a "build_index" trace; see _build_index."""
+    with tracing.trace("build_index"):
+        return _build_index(project_path, trace_memory, full, provider)
+
+
+def _build_index(project_path=None, trace_memory=TRACE_MEMORY, full=False, provider=None):
+    """
+    Index project_path as a streaming pipeline: files are scanned lazily,
+    parsed and summarized a window at a time, chunked, and handed over a
+    bounded queue to the embed/store stage in fixed-size batches. Memory stays
+    flat regardless of repository size.
+
+    Each codebase has its own collection and an IndexManifest checkpointing
+    files as they are fully stored. If the codebase already has an index
+    (complete or interrupted), only new and changed files are re-embedded and
+    deleted files are dropped; full=True starts from an empty collection.
+    provider picks the embedder ("openai" or "local"); by default a codebase
+    keeps the one it was built with, and switching forces a full rebuild.
+    The manifest is marked complete only at the end. Returns the final
+    memory/progress stats.
+
+    A full rebuild goes into a new index version (see codebases.py) while
+    queries keep using the active one, which is swapped for it only once the
+    build is complete. An interrupted rebuild is resumed in its own version.
+    """
+    project_path = os.path.abspath(project_path or default_root())
+    chroma_client = get_client()
+    gc_versions(project_path, chroma_client)
+    versions = load_versions(project_path)
+    if versions["building"] is not None and not full:
+        version = versions["building"]
+    else:
+        version = versions["active"]
+    manifest = IndexManifest(manifest_path(project_path, version))
+    try:
+        collection = chroma_client.get_collection(name=collection_name(project_path, version))
+    except (chromadb.errors.NotFoundError, ValueError):
+        collection = None
+    if provider is None:
+        provider = collection_embedder(collection).name if collection is not None else EMBEDDING_PROVIDER
+    embedder = make_embedder(provider)
+    incremental = not full and manifest.has_index(project_path) and collection is not None
+    if incremental and collection_embedder(collection).describe() != embedder.describe():
+        logger.info("Embedding provider or dimensions changed; rebuilding the index from scratch")
+        incremental = False
+    if incremental and document_storage(collection) != DOCUMENT_STORAGE:
+        logger.info("Document storage changed to %s; rebuilding the index from scratch", DOCUMENT_STORAGE)
+        incremental = False
+
+    if incremental:
+        state = "Updating" if manifest.complete else "Resuming interrupted build of"
+        logger.info("%s existing index (%d files committed)", state, len(manifest.files))
+        manifest.begin_update()
+    else:
+        version = begin_version(project_path, chroma_client)
+        collection = chroma_client.create_collection(
+            name=collection_name(project_path, version),
+            metadata=dict(embedder.describe(), document_storage=DOCUMENT_STORAGE),
+        )
+        manifest = IndexManifest(manifest_path(project_path, version))
+        logger.info("Created index version %d (%s embeddings); queries use version %d until it is complete",
+                    version, embedder.name, versions["active"])
+        manifest.begin(project_path)
+    touch(project_path)
+
+    cache = load_cache(project_path)
+    summary_stats = Counter()
+    monitor = MemoryMonitor("build_index", trace=trace_memory)
+    seen = set()
+    blobs = blob_store(project_path) if document_storage(collection) == "reference" else None
+
+    def pending_paths():
+        for path in iter_files(project_path):
+            seen.add(path)
+            if manifest.is_committed(path):
+                continue
+            yield path
+
+    chunk_queue = queue.Queue(maxsize=INDEX_QUEUE_SIZE)
+    chunks = iter_chunks(
+        iter_file_metadata(pending_paths(), cache, stats=summary_stats), project_path, by_reference=blobs is not None
+    )
+    stop = threading.Event()
+    producer = threading.Thread(
+        target=_produce, args=(chunks, chunk_queue, stop, tracing.current_trace()), daemon=True
+    )
+    producer.start()
+
+    files_done = 0
+    chunks_done = 0
+    last_path = None
+    batch = []
+    # path -> (stat, hash, chunk count, [chunk hashes]) for files not yet in the manifest
+    uncommitted = {}
+    # path -> dependency record for every file chunked in this build
+    dep_records = {}
+    try:
+        while True:
+            item = chunk_queue.get()
+            if isinstance(item, BaseException):
+                raise item
+            if item is not None:
+                meta, _, chunk_data, (st, digest, n_chunks, deps) = item
+                dep_records[meta.path] = deps
+                hashes = uncommitted.setdefault(meta.path, (st, digest, n_chunks, []))[3]
+                if chunk_data is not None:
+                    batch.append(item)
+                    hashes.append(text_hash(chunk_data["code"]))
+                if meta.path != last_path:
+                    last_path = meta.path
+                    files_done += 1
+                    if files_done % MEMORY_REPORT_EVERY == 0:
+                        monitor.report(files=files_done, chunks=chunks_done)
+            if item is None or len(batch) >= EMBED_BATCH_SIZE:
+                if batch:
+                    _embed_and_store(collection, batch, blobs)
+                    chunks_done += len(batch)
+                    batch = []
+                # Every file whose chunks have all been stored is now durable
+                entries = []
+                for path in [p for p, (_, _, n, hashes) in uncommitted.items() if len(hashes) == n]:
+                    st, digest, _, hashes = uncommitted.pop(path)
+                    if incremental:
+                        # The new chunks replaced the old ones with the same ids
+                        # in place, so queries never saw the file missing; drop
+                        # any left over from a longer earlier version
+                        collection.delete(where={"$and": [{"path": path}, {"chunk": {"$gte": len(hashes)}}]})
+                    entries.append((path, st, digest, hashes))
+                manifest.commit_files(entries)
+                logger.info("Indexed %d chunks from %d files (last: %s)", chunks_done, files_done, last_path)
+            if item is None:
+                break
+    finally:
+        # If the consumer failed, the producer may be blocked on a full queue;
+        # stop it and let it finish the file it is on before saving the cache
+        stop.set()
+        while True:
+            try:
+                chunk_queue.get_nowait()
+            except queue.Empty:
+                break
+        producer.join()
+        save_cache(cache, project_path)
+
+    removed = [path for path in manifest.files if path not in seen]
+    for i in range(0, len(removed), EMBED_BATCH_SIZE):
+        collection.delete(where={"path": {"$in": removed[i:i + EMBED_BATCH_SIZE]}})
+    manifest.remove_files(removed)
+    if removed:
+        logger.info("Removed %d deleted files from the index", len(removed))
+
+    manifest.mark_complete()
+    sync_vector_index(collection, manifest, project_path, version)
+    sync_dependency_graph(manifest, project_path, dep_records)
+    if version != versions["active"]:
+        activate_version(project_path, version, chroma_client)
+        logger.info("Switched queries to index version %d", version)
+    if blobs is not None:
+        compact_blobs(project_path, blobs, manifest, version)
+    enforce_disk_cap(project_path, chroma_client=chroma_client)
+    report_summary_stats(summary_stats)
+    stale = queue_stale_summaries(project_path, cache, manifest.files)
+    if stale:
+        logger.info("Regenerating %d stale summaries in the background", len(stale))
+    stats = monitor.report(files=files_done, chunks=chunks_done)
+    monitor.stop()
+    logger.info("Index build complete")
+    return stats
@@ -0,0 +1,198 @@
+import difflib
+from bisect import bisect_left
+from collections import Counter
+
+# Line diffs for the GUI that stay fast on very large files. Texts of up to
+# SMALL_REGION lines a side are diffed by difflib itself, so their output is
+# exactly difflib.unified_diff's. Larger ones are interned to ints once, the
+# common prefix/suffix is trimmed, and the middle is split recursively on lines
+# that occur exactly once on both sides (the patience anchors). That can place
+# hunks differently from difflib, but the opcodes always turn the old lines
+# into the new ones. Small anchorless regions go to difflib; a larger region
+# with no anchor is reported as one replace.
+
+SMALL_REGION = 400  # regions up to this many lines a side go to difflib
+CONTEXT = 3
+
+
+def _intern(a, b):
+    ids = {}
+    return [ids.setdefault(line, len(ids)) for line in a], [ids.setdefault(line, len(ids)) for line in b]
+
+
+def _unique_anchors(a, b, alo, ahi, blo, bhi):
+    """(i, j) pairs of lines unique in both ranges, longest increasing run by j."""
+    count_a, count_b = Counter(a[alo:ahi]), Counter(b[blo:bhi])
+    pos_b = dict(zip(b[blo:bhi], range(blo, bhi)))
+    pairs = [(i, pos_b[a[i]]) for i in range(alo, ahi)
+             if count_a[a[i]] == 1 and count_b.get(a[i]) == 1]
+    if all(p[1] < q[1] for p, q in zip(pairs, pairs[1:])):
+        # Usual case: the unique lines kept their order
+        return pairs
+    # Patience sort: longest increasing subsequence of j over pairs ordered by i
+    tails, tails_j, back = [], [], []
+    for k, (_, j) in enumerate(pairs):
+        pos = bisect_left(tails_j, j)
+        back.append(tails[pos - 1] if pos else -1)
+        if pos == len(tails):
+            tails.append(k)
+            tails_j.append(j)
+        else:
+            tails[pos] = k
+            tails_j[pos] = j
+    anchors = []
+    k = tails[-1] if tails else -1
+    while k != -1:
+        anchors.append(pairs[k])
+        k = back[k]
+    anchors.reverse()
+    return anchors
+
+
+def _matches(a, b, alo, ahi, blo, bhi, out):
+    """Append matching (i, j, size) blocks for a[alo:ahi] vs b[blo:bhi] to out."""
+    # Common prefix and suffix
+    start = 0
+    while alo + start < ahi and blo + start < bhi and a[alo + start] == b[blo + start]:
+        start += 1
+    if start:
+        out.append((alo, blo, start))
+        alo, blo = alo + start, blo + start
+    end = 0
+    while alo < ahi - end and blo < bhi - end and a[ahi - end - 1] == b[bhi - end - 1]:
+        end += 1
+    suffix = (ahi - end, bhi - end, end) if end else None
+    ahi, bhi = ahi - end, bhi - end
+
+    if alo < ahi and blo < bhi:
+        anchors = _unique_anchors(a, b, alo, ahi, blo, bhi)
+        if anchors:
+            for i, j in anchors:
+                if i > alo or j > blo:
+                    _matches(a, b, alo, i, blo, j, out)
+                out.append((i, j, 1))
+                alo, blo = i + 1, j + 1
+            _matches(a, b, alo, ahi, blo, bhi, out)
+        elif ahi - alo <= SMALL_REGION and bhi - blo <= SMALL_REGION:
+            matcher = difflib.SequenceMatcher(None, a[alo:ahi], b[blo:bhi], autojunk=False)
+            for i, j, size in matcher.get_matching_blocks():
+                if size:
+                    out.append((alo + i, blo + j, size))
+        # A large region with no unique line in common is reported as replaced
+    if suffix:
+        out.append(suffix)
+
+
+def diff_opcodes(a_lines, b_lines):
+    """difflib-style opcodes (tag, i1, i2, j1, j2) turning a_lines into b_lines."""
+    if len(a_lines) <= SMALL_REGION and len(b_lines) <= SMALL_REGION:
+        return difflib.SequenceMatcher(None, a_lines, b_lines).get_opcodes()
+    a, b = _intern(a_lines, b_lines)
+    blocks = []
+    _matches(a, b, 0, len(a), 0, len(b), blocks)
+    # Merge adjacent blocks and add the terminating sentinel like difflib does
+    merged = []
+    for i, j, size in blocks:
+        if merged and merged[-1][0] + merged[-1][2] == i and merged[-1][1] + merged[-1][2] == j:
+            merged[-1] = (merged[-1][0], merged[-1][1], merged[-1][2] + size)
+        else:
+            merged.append((i, j, size))
+    merged.append((len(a), len(b), 0))
+
+    opcodes = []
+    i = j = 0
+    for ai, bj, size in merged:
+        tag = ""
+        if i < ai and j < bj:
+            tag = "replace"
+        elif i < ai:
+            tag = "delete"
+        elif j < bj:
+            tag = "insert"
+        if tag:
+            opcodes.append((tag, i, ai, j, bj))
+        i, j = ai + size, bj + size
+        if size:
+            opcodes.append(("equal", ai, i, bj, j))
+    return opcodes
+
+
+def group_opcodes(opcodes, n=CONTEXT):
+    """Hunks with n lines of context, as difflib.SequenceMatcher.get_grouped_opcodes."""
+    codes = list(opcodes) or [("equal", 0, 1, 0, 1)]
+    if codes[0][0] == "equal":
+        tag, i1, i2, j1, j2 = codes[0]
+        codes[0] = tag, max(i1, i2 - n), i2, max(j1, j2 - n), j2
+    if codes[-1][0] == "equal":
+        tag, i1, i2, j1, j2 = codes[-1]
+        codes[-1] = tag, i1, min(i2, i1 + n), j1, min(j2, j1 + n)
+    group = []
+    for tag, i1, i2, j1, j2 in codes:
+        if tag == "equal" and i2 - i1 > n * 2:
+            group.append((tag, i1, min(i2, i1 + n), j1, min(j2, j1 + n)))
+            yield group
+            group = []
+            i1, j1 = max(i1, i2 - n), max(j1, j2 - n)
+        group.append((tag, i1, i2, j1, j2))
+    if group and not (len(group) == 1 and group[0][0] == "equal"):
+        yield group
+
+
+class DiffResult:
+    """
+    A unified diff as a list of lines, plus where each hunk starts: its row in
+    the diff and its first line (0-based) in the old and new files.
+    """
+    __slots__ = ("lines", "kinds", "hunks")
+
+    def __init__(self):
+        self.lines = []
+        self.kinds = []   # "header", "hunk", "add", "remove" or "context", per line
+        self.hunks = []   # (diff row, old line, new line)
+
+    def _add(self, kind, line):
+        self.kinds.append(kind)
+        self.lines.append(line)
+
+    @property
+    def text(self):
+        return "\n".join(self.lines)
+
+
+def unified_diff(old, new, fromfile="old", tofile="new", n=CONTEXT):
+    """
+    Diff two texts as unified diff lines. Identical to difflib.unified_diff
+    (lineterm="") for texts of up to SMALL_REGION lines a side; see above
+    for larger ones.
+    """
+    a, b = old.splitlines(), new.splitlines()
+    result = DiffResult()
+    for group in group_opcodes(diff_opcodes(a, b), n):
+        if not result.lines:
+            result._add("header", f"--- {fromfile}")
+            result._add("header", f"+++ {tofile}")
+        first, last = group[0], group[-1]
+        result.hunks.append((len(result.lines), first[1], first[3]))
+        result._add("hunk", "@@ -{} +{} @@".format(
+            _range(first[1], last[2]), _range(first[3], last[4])
+        ))
+        for tag, i1, i2, j1, j2 in group:
+            if tag == "equal":
+                for line in a[i1:i2]:
+                    result._add("context", " " + line)
+                continue
+            for line in a[i1:i2]:
+                result._add("remove", "-" + line)
+            for line in b[j1:j2]:
+                result._add("add", "+" + line)
+    return result
+
+
+def _range(start, stop):
+    # Same formatting as difflib's unified_diff
+    beginning, length = start + 1, stop - start
+    if length == 1:
+        return str(beginning)
+    if not length:
+        beginning -= 1
+    return f"{beginning},{length}"
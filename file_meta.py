@@ -0,0 +1,66 @@
+import mmap
+import os
+import sys
+
+# Files at least this large are decoded straight from an mmap instead of
+# going through a buffered read.
+MMAP_THRESHOLD = 64 * 1024
+
+
+def read_source(path):
+    """Read a source file as text, mmap-backed for large files."""
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return ""
+        if size < MMAP_THRESHOLD:
+            return f.read().decode("utf-8", errors="replace")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            return str(m, "utf-8", errors="replace")
+
+
+class FileMeta:
+    """
+    Compact per-file metadata record.
+
+    Holds only the path (interned), summary and symbols; source text is read
+    from disk when "code" is accessed. Supports the dict-style access
+    (meta["path"], meta.get("summary")) the rest of the code already uses.
+    """
+    __slots__ = ("path", "summary", "symbols", "mtime", "pending", "fingerprint")
+
+    def __init__(self, path, summary=None, symbols=(), mtime=None, pending=None, fingerprint=None):
+        self.path = sys.intern(path)
+        self.summary = summary
+        self.symbols = tuple(sys.intern(s) for s in symbols)
+        self.mtime = mtime
+        # Condensed source waiting for a batched summary, and the structural
+        # fingerprint it will be recorded with; both cleared once summarized
+        self.pending = pending
+        self.fingerprint = fingerprint
+
+    @property
+    def code(self):
+        return read_source(self.path)
+
+    def __getitem__(self, key):
+        if key not in ("path", "summary", "symbols", "code"):
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in ("path", "summary", "symbols"):
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in ("path", "summary", "symbols", "code")
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __repr__(self):
+        return f"FileMeta({self.path!r}, summary={self.summary!r})"
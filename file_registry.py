@@ -0,0 +1,134 @@
+import os
+import re
+import threading
+import time
+
+# One cached listing of a codebase's files, shared by the main file list and
+# the summary manager, so opening a window or typing a filter never walks the
+# tree again. Filtering is a fuzzy (subsequence) match that narrows the
+# previous result while the query only grows, which keeps typing
+# interactive on 100k+ files.
+
+EXCLUDE_NAMES = {".git", "__pycache__", ".venv", "venv", "env", "node_modules", ".pytest_cache"}
+RANK_LIMIT = 5000  # more matches than this are kept in path order instead of ranked
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+
+def _fuzzy_pattern(query):
+    """'abc' -> a[^b]*b[^c]*c: a subsequence match that can't backtrack."""
+    parts = [re.escape(query[0])]
+    for ch in query[1:]:
+        parts.append(f"[^{re.escape(ch)}]*{re.escape(ch)}")
+    return re.compile("".join(parts))
+
+
+class FuzzyIndex:
+    """
+    Fuzzy filter over a fixed list of strings. search() returns indexes into
+    items; when the query extends the previous one only the previous matches
+    are scanned again.
+    """
+    def __init__(self, items):
+        self.items = items
+        self.keys = [s.lower().replace("\\", "/") for s in items]
+        self._last_query = ""
+        self._last_matches = None
+
+    def __len__(self):
+        return len(self.items)
+
+    def search(self, query):
+        query = query.strip().lower().replace("\\", "/")
+        if not query:
+            self._last_query, self._last_matches = "", None
+            return range(len(self.keys))
+        keys = self.keys
+        if self._last_matches is not None and query.startswith(self._last_query):
+            candidates = self._last_matches
+        else:
+            candidates = range(len(keys))
+        search = _fuzzy_pattern(query).search
+        matches = [i for i in candidates if search(keys[i])]
+        self._last_query, self._last_matches = query, matches
+        if len(matches) > RANK_LIMIT:
+            return matches
+        return sorted(matches, key=lambda i: self._score(search(keys[i]), keys[i]))
+
+    @staticmethod
+    def _score(match, key):
+        # Tighter matches first, then ones inside the file name, then shorter paths
+        in_name = match.start() > key.rfind("/")
+        return match.end() - match.start(), not in_name, len(key)
+
+
+class FileRegistry:
+    """
+    Every file under root (relative paths, sorted), walked once and refreshed
+    on demand, plus the latest FileMeta per path for summary lookups.
+    """
+    def __init__(self, root):
+        self.root = root
+        self.rel_paths = []
+        self.index = FuzzyIndex([])
+        self.loaded_at = None
+        self._metas = {}
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self.loaded_at is not None
+
+    def refresh(self):
+        """Walk root again; safe to call from a worker thread."""
+        with self._lock:
+            rel_paths = []
+            prefix = len(os.path.join(self.root, ""))
+            stack = [self.root]
+            while stack:
+                top = stack.pop()
+                try:
+                    entries = list(os.scandir(top))
+                except OSError:
+                    continue
+                for entry in entries:
+                    if entry.name.startswith(".") or entry.name in EXCLUDE_NAMES:
+                        continue
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.is_file():
+                            rel_paths.append(entry.path[prefix:])
+                    except OSError:
+                        continue
+            rel_paths.sort()
+            index = FuzzyIndex(rel_paths)
+            # Swap in whole so readers on the Tk thread never see a half-built list
+            self.rel_paths, self.index, self.loaded_at = rel_paths, index, time.time()
+        return self
+
+    def ensure_loaded(self):
+        return self if self.loaded else self.refresh()
+
+    def abs_path(self, rel_path):
+        return os.path.normpath(os.path.join(self.root, rel_path))
+
+    def set_metas(self, metas):
+        self._metas = {os.path.normpath(m.get("path", "")): m for m in metas}
+
+    def meta(self, path):
+        return self._metas.get(os.path.normpath(path))
+
+    def add_meta(self, meta):
+        self._metas[os.path.normpath(meta.get("path", ""))] = meta
+
+
+def get_registry(root):
+    """The shared registry for root, created (not yet walked) on first use."""
+    root = os.path.normpath(os.path.abspath(root))
+    with _registries_lock:
+        registry = _registries.get(root)
+        if registry is None:
+            registry = _registries[root] = FileRegistry(root)
+        return registry
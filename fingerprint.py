@@ -0,0 +1,69 @@
+import ast
+import hashlib
+
+# A file's summary describes its purpose, which follows from its outline: the
+# imports, top-level names and signatures, and docstrings. The fingerprint is
+# that outline as a set of short feature hashes; bodies, comments and
+# formatting don't touch it. drift() is the Jaccard distance between two
+# fingerprints, so adding one function to a file of twenty moves it ~0.05.
+
+
+def _signature(node):
+    args = ast.unparse(node.args)
+    returns = f" -> {ast.unparse(node.returns)}" if node.returns else ""
+    prefix = "async def" if isinstance(node, ast.AsyncFunctionDef) else "def"
+    return f"{prefix} {node.name}({args}){returns}"
+
+
+def _doc(node):
+    doc = ast.get_docstring(node)
+    # Only the first paragraph; later ones tend to be usage notes
+    return " ".join(doc.split("\n\n")[0].split()) if doc else None
+
+
+def outline(tree):
+    """The structural features of a parsed module, as strings."""
+    features = set()
+    doc = _doc(tree)
+    if doc:
+        features.add(f"doc:{doc}")
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            features.update(f"import:{alias.name}" for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            module = "." * node.level + (node.module or "")
+            features.update(f"import:{module}.{alias.name}" for alias in node.names)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            features.add(_signature(node))
+            doc = _doc(node)
+            if doc:
+                features.add(f"doc:{node.name}:{doc}")
+        elif isinstance(node, ast.ClassDef):
+            bases = ", ".join(ast.unparse(b) for b in node.bases)
+            features.add(f"class {node.name}({bases})")
+            doc = _doc(node)
+            if doc:
+                features.add(f"doc:{node.name}:{doc}")
+            for child in node.body:
+                if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                    features.add(f"{node.name}.{_signature(child)}")
+        elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            for target in targets:
+                if isinstance(target, ast.Name):
+                    features.add(f"name:{target.id}")
+    return features
+
+
+def fingerprint(tree):
+    """Sorted short hashes of outline(tree), compact enough for the summary cache."""
+    return sorted({hashlib.blake2b(f.encode("utf-8"), digest_size=6).hexdigest() for f in outline(tree)})
+
+
+def drift(old, new):
+    """0.0 for identical fingerprints up to 1.0 for nothing in common."""
+    old, new = set(old), set(new)
+    union = old | new
+    if not union:
+        return 0.0
+    return 1.0 - len(old & new) / len(union)
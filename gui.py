@@ -1,20 +1,44 @@
 import tkinter as tk
 from tkinter import ttk, scrolledtext, messagebox, font as tkfont, filedialog
+import logging
 import sys
-import threading
 import traceback
-from query import choose_files_by_summary, build_prompt, prepare_prompt_with_chunks, choose_chunks_by_instruction
+from query import choose_files_by_summary, build_prompt
 import os
-from config import OPENAI_API_KEY, CHROMA_DB_PATH, PROJECT_PATH
+from config import (
+    OPENAI_API_KEY, EDIT_FORMAT,
+    VALIDATION_WORKERS, VALIDATION_TEST_COMMAND, VALIDATION_TEST_TIMEOUT
+)
 from openai import OpenAI
 from logic import clean_code_output, normalize_path
-from edit import preview_diff, apply_change, apply_chunks_cross_file, parse_updated_chunks
-from embedding_utils import load_all_file_metadata, build_index
-import chromadb
+from edit import (
+    apply_chunks_cross_file, parse_updated_chunks, write_files_atomic, EditConflict, EditMismatch
+)
+from embedding_utils import load_all_file_metadata, build_index, embed_query
+from vector_search import query_collection, Scope
 import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from jobs import JobScheduler, JobCancelled, UIDispatcher
+from prefetch import Prefetcher
+from file_meta import FileMeta
+from codebases import get_collection
+from docstore import resolve_documents
+from depgraph import load_dependency_graph, module_name
+from validate import Validator, summarize as summarize_validation
+from fastdiff import unified_diff
+from textview import VirtualText, VirtualList
+from file_registry import get_registry, FuzzyIndex
+import tracing
 
 client = OpenAI(api_key=OPENAI_API_KEY)
 
+logger = logging.getLogger(__name__)
+
+# Chunks of the target file, and chunks from other files, given to the model
+MAX_IN_FILE = 5
+MAX_REFERENCE = 10
+
 class AIEditorGUI:
     def __init__(self, master):
         self.master = master
@@ -87,6 +111,10 @@ class AIEditorGUI:
         self.manage_btn = ttk.Button(top_frame, text="Manage Summaries", command=self.open_summary_manager)
         self.manage_btn.pack(side=tk.LEFT, padx=(8, 0))
 
+        # Timing/cost breakdown of the last Generate
+        self.trace_btn = ttk.Button(top_frame, text="Last Trace", command=self.open_trace_view)
+        self.trace_btn.pack(side=tk.LEFT, padx=(8, 0))
+
         # Codebase chooser
         default_project = os.getenv("PROJECT_PATH", os.getcwd())
         self.codebase_var = tk.StringVar(value=default_project)
@@ -105,15 +133,14 @@ class AIEditorGUI:
 
         # Left pane content
         ttk.Label(left_pane, text="Relevant files:", style="Header.TLabel").pack(anchor=tk.W)
-        listbox_frame = ttk.Frame(left_pane, style="Card.TFrame")
-        listbox_frame.pack(fill=tk.BOTH, expand=False, pady=(6, 6))
-        self.files_listbox = tk.Listbox(listbox_frame, height=8, activestyle='dotbox', selectbackground=accent)
-        self.files_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        list_scroll = ttk.Scrollbar(listbox_frame, orient=tk.VERTICAL, command=self.files_listbox.yview)
-        list_scroll.pack(side=tk.RIGHT, fill=tk.Y)
-        self.files_listbox.config(yscrollcommand=list_scroll.set)
-        self.files_listbox.bind("<<ListboxSelect>>", self.on_file_select)
-        self.files_listbox.bind("<Double-Button-1>", lambda e: self.on_file_select(e))
+        self.files_filter_var = tk.StringVar()
+        ttk.Entry(left_pane, textvariable=self.files_filter_var).pack(fill=tk.X, pady=(6, 0))
+        self.bind_filter(self.files_filter_var, self.filter_files_list)
+        # Only the visible rows are in the widget, so a whole-codebase list is cheap
+        self.files_list = VirtualList(
+            left_pane, height=8, on_select=self.on_file_select, activestyle='dotbox', selectbackground=accent
+        )
+        self.files_list.pack(fill=tk.BOTH, expand=False, pady=(6, 6))
 
         # Add Summary and Symbols display under the files list
         ttk.Label(left_pane, text="Summary:", style="Header.TLabel").pack(anchor=tk.W, pady=(6, 0))
@@ -127,13 +154,14 @@ class AIEditorGUI:
         self.symbols_label.pack(fill=tk.BOTH, expand=False)
 
         ttk.Label(left_pane, text="Original code:", style="Header.TLabel").pack(anchor=tk.W, pady=(6,0))
-        self.original_text = scrolledtext.ScrolledText(left_pane, height=18, font=monospace)
+        # Code and diff panes only render the visible lines, so multi-megabyte
+        # files load instantly
+        self.original_text = VirtualText(left_pane, height=18, font=monospace, background="#ffffff")
         self.original_text.pack(fill=tk.BOTH, expand=True)
-        self.original_text.config(background="#ffffff")
 
         # Right pane content
         ttk.Label(right_pane, text="Generated new code:", style="Header.TLabel").pack(anchor=tk.W)
-        self.new_text = scrolledtext.ScrolledText(right_pane, height=12, font=monospace, background="#f7ffff")
+        self.new_text = VirtualText(right_pane, height=12, font=monospace, background="#f7ffff")
         self.new_text.pack(fill=tk.BOTH, expand=True, pady=(4,6))
 
         ttk.Label(right_pane, text="Prompt sent:", style="Header.TLabel").pack(anchor=tk.W, pady=(6,0))
@@ -141,10 +169,33 @@ class AIEditorGUI:
         self.prompt_text.pack(fill=tk.BOTH, expand=False)
         self.prompt_text.config(state=tk.DISABLED, background=panel_bg)
 
-        ttk.Label(right_pane, text="Preview diff:", style="Header.TLabel").pack(anchor=tk.W, pady=(6,0))
-        self.diff_text = scrolledtext.ScrolledText(right_pane, height=10, font=monospace)
+        diff_header = ttk.Frame(right_pane, style="Card.TFrame")
+        diff_header.pack(fill=tk.X, pady=(6,0))
+        ttk.Label(diff_header, text="Preview diff:", style="Header.TLabel").pack(side=tk.LEFT)
+        self.next_hunk_btn = ttk.Button(diff_header, text="Next hunk", command=lambda: self.show_hunk(1))
+        self.next_hunk_btn.pack(side=tk.RIGHT)
+        self.prev_hunk_btn = ttk.Button(diff_header, text="Prev hunk", command=lambda: self.show_hunk(-1))
+        self.prev_hunk_btn.pack(side=tk.RIGHT, padx=(0, 4))
+        self.hunk_var = tk.StringVar(value="")
+        ttk.Label(diff_header, textvariable=self.hunk_var, style="Small.TLabel").pack(side=tk.RIGHT, padx=(0, 8))
+        self.diff_text = VirtualText(right_pane, height=10, font=monospace, background="#ffffff", tags={
+            "add": {"foreground": "#1a7f37"},
+            "remove": {"foreground": "#cf222e"},
+            "hunk": {"foreground": "#006b7a"},
+        })
         self.diff_text.pack(fill=tk.BOTH, expand=True, pady=(4,0))
-        self.diff_text.config(background="#ffffff")
+
+        # Results of compiling/resolving the change, filled in as files finish
+        checks_header = ttk.Frame(right_pane, style="Card.TFrame")
+        checks_header.pack(fill=tk.X, pady=(6,0))
+        ttk.Label(checks_header, text="Checks:", style="Header.TLabel").pack(side=tk.LEFT)
+        self.validation_var = tk.StringVar(value="")
+        ttk.Label(checks_header, textvariable=self.validation_var, style="Small.TLabel").pack(side=tk.LEFT, padx=(8, 0))
+        self.validation_text = scrolledtext.ScrolledText(right_pane, height=4, wrap=tk.WORD, font=default_font)
+        self.validation_text.pack(fill=tk.BOTH, expand=False, pady=(4,0))
+        self.validation_text.tag_configure("error", foreground="#cf222e")
+        self.validation_text.tag_configure("ok", foreground="#1a7f37")
+        self.validation_text.config(state=tk.DISABLED, background=panel_bg)
 
         # Bottom buttons
         self.apply_btn = ttk.Button(bottom_frame, text="Apply Change", command=self.on_apply, state=tk.DISABLED)
@@ -158,14 +209,51 @@ class AIEditorGUI:
 
         # Internal state
         self.metas = []
+        self.files_index = FuzzyIndex([])
+        self.shown = []  # indexes into self.metas of the rows in files_list
         self.docs = []
         self.current_file_path = None
         self.current_new_code = None
+        self.validation_results = None  # None until the current change has been checked
+        self.current_diff = None
+        self.hunk_index = -1
         self.last_traceback = None
 
+        # Background work runs on a bounded pool; every Tk call made on behalf of
+        # a worker goes through self.ui so it executes on the main thread.
+        self.jobs = JobScheduler(max_workers=2)
+        # Short interactive work (opening the selected file) gets its own lane
+        # so it never queues behind an index build or a validation run
+        self.interactive_jobs = JobScheduler(max_workers=1)
+        # Independent stages within one job (e.g. the vector search running
+        # alongside file ranking) run here
+        self.stage_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="stage")
+        # Checks of generated changes run on processes, one file per task
+        self.validator = Validator(VALIDATION_WORKERS, VALIDATION_TEST_COMMAND, VALIDATION_TEST_TIMEOUT)
+        self.ui = UIDispatcher(master)
+        self.ui.start()
+        master.bind("<Destroy>", self._on_destroy, add="+")
+
+        # Speculatively run retrieval for the instruction while the user types
+        self.prefetcher = Prefetcher(master, self.jobs, self.retrieve_context)
+        self.instruction_var.trace_add(
+            "write",
+            lambda *_: self.prefetcher.on_text_changed(self.instruction_var.get(), self.codebase_var.get())
+        )
+
+    def _on_destroy(self, event):
+        if event.widget is self.master:
+            self.ui.stop()
+            self.jobs.shutdown()
+            self.interactive_jobs.shutdown()
+            self.stage_pool.shutdown(wait=False, cancel_futures=True)
+            self.validator.shutdown()
+            logger.info("UI responsiveness: %s", self.ui.stats())
+            logger.info("Prefetch: %s", self.prefetcher.stats())
+
     def set_status(self, text):
-        self.status_var.set(text)
-        self.master.update_idletasks()
+        # Safe to call from any thread
+        self.ui.call(self.status_var.set, text)
 
     def update_meta_display(self, meta):
         """
@@ -193,11 +281,6 @@ class AIEditorGUI:
         self.symbols_var.set("")
 
     def change_codebase(self):
-        chroma_client = chromadb.PersistentClient(path=CHROMA_DB_PATH)
-        try:
-            chroma_client.delete_collection("codebase")
-        except chromadb.errors.NotFoundError:
-            pass
         new_dir = filedialog.askdirectory(initialdir=os.getcwd(), title="Select a codebase")
         if not new_dir:
             return
@@ -207,24 +290,67 @@ class AIEditorGUI:
         # update working directory so other parts (like load_all_file_metadata) pick it up
         os.chdir(new_dir)
 
-        # reload file metadata
+        self.docs = []
+        self.clear_meta_display()
+        self.original_text.clear()
+        self.new_text.clear()
+        self.show_diff(None)
+
+        # Each codebase keeps its own index, so the previous one is left intact and
+        # this one is reopened and brought up to date in the background.
+        self.jobs.cancel_group("generate")
+        self.jobs.submit(("open_codebase", new_dir), self.open_codebase, new_dir, group="codebase")
+
+    def open_codebase(self, job, new_dir):
         try:
+            self.set_status(f"Updating index for {new_dir}...")
             build_index(new_dir)
-            self.metas = load_all_file_metadata(root_dir=new_dir)
-            self.docs = []
-            self.files_listbox.delete(0, tk.END)
-            for meta in self.metas:
-                display_text = meta['path']
-                if meta.get('summary'):
-                    display_text += " — " + meta['summary'][:60]
-                self.files_listbox.insert(tk.END, display_text)
-            self.clear_meta_display()
-            self.original_text.delete("1.0", tk.END)
-            self.new_text.delete("1.0", tk.END)
-            self.diff_text.delete("1.0", tk.END)
-        
+            job.check()
+            metas = load_all_file_metadata(root_dir=new_dir)
+            job.check()
+            registry = get_registry(new_dir)
+            registry.set_metas(metas)
+            registry.refresh()
+            job.check()
+            self.ui.post(self.populate_files_listbox, metas)
+            self.set_status("Ready")
+        except JobCancelled:
+            pass
         except Exception as e:
-            messagebox.showerror("Error", f"Failed to load new codebase: {e}")
+            traceback.print_exc()
+            self.ui.post(messagebox.showerror, "Error", f"Failed to load new codebase: {e}")
+            self.set_status("Ready")
+
+    def bind_filter(self, var, apply, delay_ms=120):
+        """Call apply(text) once typing in var pauses for delay_ms."""
+        pending = [None]
+
+        def fire():
+            pending[0] = None
+            apply(var.get())
+
+        def changed(*_):
+            if pending[0] is not None:
+                self.master.after_cancel(pending[0])
+            pending[0] = self.master.after(delay_ms, fire)
+
+        var.trace_add("write", changed)
+
+    def populate_files_listbox(self, metas):
+        self.metas = metas
+        self.files_index = FuzzyIndex([m['path'] for m in metas])
+        self.filter_files_list(self.files_filter_var.get())
+
+    def filter_files_list(self, query):
+        self.shown = list(self.files_index.search(query))
+        rows = []
+        for i in self.shown:
+            meta = self.metas[i]
+            display_text = meta['path']
+            if meta.get('summary'):
+                display_text += " — " + meta['summary'][:60]
+            rows.append(display_text)
+        self.files_list.set_items(rows)
 
     def update_prompt_display(self, prompt):
         try:
@@ -266,143 +392,283 @@ class AIEditorGUI:
             messagebox.showwarning("Input required", "Please enter an instruction.")
             return
 
-        # Run search and model call in background thread
-        thread = threading.Thread(target=self.generate_for_instruction, args=(instruction,), daemon=True)
-        thread.start()
+        # Run search and model call on the job pool. A new instruction supersedes
+        # any generate still in flight; resubmitting the same one joins it.
+        key = ("generate", self.codebase_var.get(), instruction, self.bugfix_var.get())
+        self.jobs.submit(key, self.generate_for_instruction, instruction, group="generate")
+
+    def show_ranked_files(self, ranked_metas):
+        # A filter typed for an earlier list would hide the new ranking
+        self.files_filter_var.set("")
+        self.populate_files_listbox(ranked_metas)
+
+        # Select first file
+        self.files_list.select(0)
+        self.update_meta_display(ranked_metas[0])
+
+    def _embed_instruction(self, job, t, instruction, root_dir):
+        with tracing.attach(t):
+            collection = get_collection(root_dir)
+            return collection, embed_query(instruction, collection)
+
+    def _scoped_search(self, t, collection, root_dir, embedding, n_results, scope):
+        with tracing.attach(t):
+            return query_collection(
+                collection, root_dir, embedding, n_results=n_results,
+                include=['metadatas', 'documents'], scope=scope
+            )
 
-    def generate_for_instruction(self, instruction):
+    def retrieve_context(self, job, instruction, root_dir):
+        """
+        Everything generate needs before the completion call. Two independent
+        branches run at once: metadata load -> LLM file ranking -> read of the
+        top file here, and embedding the instruction on the stage pool. Once
+        the target file is known, two exact scoped queries run side by side:
+        the top chunks within it and the top chunks everywhere else. Runs on
+        a worker thread and never touches Tk, so it can also be run
+        speculatively by the prefetcher.
+        """
+        started = time.perf_counter()
+        with tracing.trace("retrieve") as t:
+            search = self.stage_pool.submit(self._embed_instruction, job, t, instruction, root_dir)
+            try:
+                with tracing.span("load_metadata") as s:
+                    all_metas = load_all_file_metadata(root_dir=root_dir)
+                    s.add(files=len(all_metas))
+                get_registry(root_dir).set_metas(all_metas)
+                job.check()
+
+                # Choose relevant files
+                ranked_metas = choose_files_by_summary(instruction, all_metas)
+                job.check()
+                selected = None
+                if ranked_metas:
+                    selected = normalize_path(ranked_metas[0].get("path"))
+                    with tracing.span("read_file") as s:
+                        selected = (selected, *self._read_file(selected))
+                        s.add(bytes=len(selected[2] or ""))
+                results = None
+                if ranked_metas:
+                    collection, embedding = search.result()
+                    job.check()
+                    # The index stores paths as scanned; match the normalized form too
+                    target = {ranked_metas[0].get("path"), selected[0]}
+                    scopes = {
+                        "in_file": (MAX_IN_FILE, Scope(paths=target)),
+                        "elsewhere": (MAX_REFERENCE, Scope(exclude=target)),
+                    }
+                    queries = {
+                        name: self.stage_pool.submit(self._scoped_search, t, collection, root_dir, embedding, k, scope)
+                        for name, (k, scope) in scopes.items()
+                    }
+                    results = {name: query.result() for name, query in queries.items()}
+            finally:
+                search.cancel()
+        return {
+            "ranked_metas": ranked_metas, "selected": selected, "results": results,
+            "elapsed": time.perf_counter() - started, "trace": t,
+        }
+
+    @staticmethod
+    def _read_file(path):
+        """(mtime, text) of path, or (None, None) if it can't be read."""
+        try:
+            mtime = os.path.getmtime(path)
+            with open(path, "r", encoding="utf-8") as f:
+                return mtime, f.read()
+        except OSError:
+            return None, None
+
+    @staticmethod
+    def stage_summary(t):
+        """Per-stage wall time for the status bar, e.g. "ranking 1.2s | embed 0.3s"."""
+        return " | ".join(f"{row['name']} {row['ms'] / 1000:.1f}s" for row in t.breakdown())
+
+    def generate_for_instruction(self, job, instruction):
+        with tracing.trace("generate") as t:
+            done = self._generate(job, instruction, t)
+        logger.info("Generate took %.0f ms, est. $%.4f", t.duration_ms, t.total("cost_usd"))
+        if done:
+            self.set_status(f"Ready ({t.duration_ms / 1000:.1f}s: {self.stage_summary(t)})")
+
+    def _generate(self, job, instruction, t):
         try:
             self.set_status("Searching context...")
-            all_metas = load_all_file_metadata(root_dir=self.codebase_var.get())
-            self.metas = all_metas
+            root_dir = self.codebase_var.get()
+            context = self.prefetcher.take(job, instruction, root_dir)
+            if context is not None:
+                # Retrieval already ran speculatively on another thread
+                t.adopt(context["trace"], prefetched=True)
+            else:
+                context = self.retrieve_context(job, instruction, root_dir)
+            job.check()
 
-            # Choose relevant files
-            ranked_metas = choose_files_by_summary(instruction, all_metas)
+            ranked_metas = context["ranked_metas"]
             if not ranked_metas:
-                messagebox.showinfo("No results", "No relevant files found.")
-                self.clear_file_views()
+                self.ui.post(messagebox.showinfo, "No results", "No relevant files found.")
+                self.ui.post(self.clear_file_views)
                 self.set_status("Ready")
                 return
 
-            self.metas = ranked_metas
-            self.files_listbox.delete(0, tk.END)
-            for meta in ranked_metas:
-                display_text = meta['path']
-                if meta.get('summary'):
-                    display_text += " — " + meta['summary'][:60]
-                self.files_listbox.insert(tk.END, display_text)
-
-            # Select first file
-            first_meta = ranked_metas[0]
-            selected_file_path = normalize_path(first_meta.get("path"))
-            self.files_listbox.selection_clear(0, tk.END)
-            self.files_listbox.selection_set(0)
-            self.files_listbox.event_generate("<<ListboxSelect>>")
-            self.master.after(0, lambda m=first_meta: self.update_meta_display(m))
-
-            if not os.path.exists(selected_file_path):
-                messagebox.showerror("File error", f"Invalid path: {selected_file_path}")
+            self.ui.post(self.show_ranked_files, ranked_metas)
+            selected_file_path, read_mtime, orig_code = context["selected"]
+            try:
+                stale = os.path.getmtime(selected_file_path) != read_mtime
+            except OSError:
+                stale = True
+            if stale:
+                # Changed since a prefetch read it
+                read_mtime, orig_code = self._read_file(selected_file_path)
+
+            if orig_code is None:
+                self.ui.post(messagebox.showerror, "File error", f"Invalid path: {selected_file_path}")
                 self.set_status("Ready")
                 return
 
-            with open(selected_file_path, "r", encoding="utf-8") as f:
-                orig_code = f.read()
-
-            # Build filtered chunks
-            chroma_client = chromadb.PersistentClient(path=CHROMA_DB_PATH)
-            try:
-                collection = chroma_client.get_collection(name="codebase")
-            except chromadb.errors.NotFoundError:
-                collection = chroma_client.create_collection(name="codebase")
-
-            instruction_embedding = client.embeddings.create(
-                model="text-embedding-3-small",
-                input=instruction
-            ).data[0].embedding
-
-            results = collection.query(
-                query_embeddings=[instruction_embedding],
-                n_results=20,
-                include=['metadatas', 'documents']
-            )
-
-            metadatas = results['metadatas'][0]
-            documents = results['documents'][0]
+            # Build filtered chunks: the scoped queries already split the
+            # results into the target file and everything else
+            results = context["results"]
+            in_file, elsewhere = results["in_file"], results["elsewhere"]
 
             filtered_chunks = []
-            MAX_IN_FILE = 5
-            MAX_REFERENCE = 10
-            in_file_count = 0
             reference_count = 0
 
-            for meta, doc in zip(metadatas, documents):
-                chunk_path = normalize_path(meta.get('path', ''))
-                if chunk_path == selected_file_path and in_file_count < MAX_IN_FILE:
-                    filtered_chunks.append({"code": doc, "metadata": meta})
-                    in_file_count += 1
-                elif chunk_path != selected_file_path and reference_count < MAX_REFERENCE:
-                    filtered_chunks.append({"code": doc, "metadata": meta})
-                    reference_count += 1
-
-            # Build prompt
-            prompt = build_prompt(instruction, filtered_chunks, selected_file_path)
-            self.master.after(0, lambda p=prompt: self.update_prompt_display(p))
+            target_ids = []
+            for chunk_id, meta, doc in zip(in_file['ids'][0], in_file['metadatas'][0], in_file['documents'][0]):
+                filtered_chunks.append({"code": doc, "metadata": meta})
+                target_ids.append(chunk_id)
+
+            # References: the direct callers/callees of the target chunks from
+            # the dependency graph first, then the nearest other chunks
+            with tracing.span("expand_references") as s:
+                graph = load_dependency_graph(root_dir)
+                related = graph.neighbors(target_ids, limit=MAX_REFERENCE)
+                if related:
+                    got = resolve_documents(
+                        get_collection(root_dir).get(ids=related, include=['documents', 'metadatas']), root_dir
+                    )
+                    for doc, meta in zip(got['documents'], got['metadatas']):
+                        filtered_chunks.append({"code": doc, "metadata": meta})
+                        reference_count += 1
+                s.add(chunks=reference_count)
+            taken = set(related)
+            for chunk_id, meta, doc in zip(elsewhere['ids'][0], elsewhere['metadatas'][0], elsewhere['documents'][0]):
+                if chunk_id in taken:
+                    continue
+                if reference_count >= MAX_REFERENCE:
+                    break
+                filtered_chunks.append({"code": doc, "metadata": meta})
+                reference_count += 1
 
-            self.set_status("Waiting for model response...")
-            resp = client.chat.completions.create(
-                model="gpt-5-mini",
-                messages=prompt
-            )
-            ai_output = clean_code_output(resp.choices[0].message.content)
-            updated_chunks = parse_updated_chunks(ai_output)
-
-            # Normalize paths in chunks
-            for chunk in updated_chunks:
-                chunk["file_path"] = normalize_path(chunk["file_path"])
-
-            # Merge chunks per file
-            merged_per_file = apply_chunks_cross_file(updated_chunks)
+            try:
+                merged_per_file = self._complete_edits(job, instruction, filtered_chunks, selected_file_path, EDIT_FORMAT)
+            except (EditMismatch, EditConflict) as e:
+                if EDIT_FORMAT == "chunks":
+                    raise
+                # The hunks didn't line up with the files or with each other;
+                # ask again for whole chunks
+                logger.info("Falling back to full-chunk edits: %s", e)
+                merged_per_file = self._complete_edits(job, instruction, filtered_chunks, selected_file_path, "chunks")
 
             # Ensure current file is included even if no AI changes
             if selected_file_path not in merged_per_file:
                 merged_per_file[selected_file_path] = orig_code
-
-            # Save merged code for apply
-            self.current_new_code = merged_per_file
-            self.current_file_path = selected_file_path
-
-            merged_code_for_ui = merged_per_file[selected_file_path]
-            self.master.after(
-                0,
-                lambda: self.update_generated(selected_file_path, orig_code, merged_code_for_ui)
+            # What Apply will write: only the selected file, whose diff is on
+            # screen. Edits the model made to other files are dropped.
+            changes = {selected_file_path: merged_per_file[selected_file_path]}
+            others = [p for p in merged_per_file if p != selected_file_path]
+            if others:
+                logger.info("Ignoring edits to %d other file(s): %s", len(others), ", ".join(others))
+
+            job.check()
+            # Diffing a large file takes a while; do it here, not on the Tk thread
+            with tracing.span("diff") as s:
+                diff = unified_diff(orig_code, merged_per_file[selected_file_path])
+                s.add(hunks=len(diff.hunks))
+            job.check()
+            self.ui.post(
+                self.update_generated, selected_file_path, orig_code, merged_per_file[selected_file_path], diff, changes
             )
+            self.jobs.submit(("validate", id(changes)), self.validate_change, root_dir, changes, group="validate")
+            return True
 
-            self.set_status("Ready")
-
+        except JobCancelled:
+            logger.debug("Generate cancelled: %r", instruction)
         except Exception as e:
             traceback.print_exc()
-            messagebox.showerror("Error", f"An error occurred: {e}")
+            self.ui.post(messagebox.showerror, "Error", f"An error occurred: {e}")
             self.set_status("Ready")
-        finally:
-            self.generate_btn.config(state=tk.NORMAL)
+
+    def _complete_edits(self, job, instruction, filtered_chunks, selected_file_path, edit_format):
+        """Prompt the model in edit_format and return {path: merged code}."""
+        with tracing.span("prompt_build", chunks=len(filtered_chunks)) as s:
+            prompt = build_prompt(instruction, filtered_chunks, selected_file_path, edit_format)
+            s.add(bytes=sum(len(m["content"]) for m in prompt))
+        self.ui.post(self.update_prompt_display, prompt)
+        job.check()
+
+        self.set_status("Waiting for model response...")
+        with tracing.span("completion", edit_format=edit_format) as s:
+            resp = client.chat.completions.create(
+                model="gpt-5-mini",
+                messages=prompt
+            )
+            tracing.record_usage(s, "gpt-5-mini", resp.usage)
+            s.add(bytes=len(resp.choices[0].message.content or ""))
+        # A newer instruction arrived while we waited; drop this result
+        job.check()
+        with tracing.span("parse_output") as s:
+            ai_output = clean_code_output(resp.choices[0].message.content)
+            updated_chunks = parse_updated_chunks(ai_output)
+            s.add(chunks=len(updated_chunks))
+
+        # Normalize paths in chunks
+        for chunk in updated_chunks:
+            chunk["file_path"] = normalize_path(chunk["file_path"])
+
+        # Merge chunks per file
+        with tracing.span("apply", edit_format=edit_format):
+            return apply_chunks_cross_file(updated_chunks)
 
     def clear_file_views(self):
-        self.files_listbox.delete(0, tk.END)
-        self.original_text.delete("1.0", tk.END)
-        self.new_text.delete("1.0", tk.END)
-        self.diff_text.delete("1.0", tk.END)
+        self.shown = []
+        self.files_list.set_items([])
+        self.original_text.clear()
+        self.new_text.clear()
+        self.show_diff(None)
         self.apply_btn.config(state=tk.DISABLED)
         self.clear_prompt_display()
 
-    def update_generated(self, file_path, orig_code, merged_code):
+    def show_diff(self, diff):
+        """Show a fastdiff.DiffResult (or nothing) and jump to its first hunk."""
+        self.current_diff = diff
+        self.hunk_index = -1
+        if diff is None:
+            self.diff_text.clear()
+            self.hunk_var.set("")
+            return
+        self.diff_text.set_lines(diff.lines, diff.kinds)
+        self.show_hunk(1)
+
+    def show_hunk(self, step):
+        """Move to the next (step=1) or previous (step=-1) hunk in all three panes."""
+        diff = self.current_diff
+        if not diff or not diff.hunks:
+            self.hunk_var.set("No changes" if diff else "")
+            return
+        self.hunk_index = max(0, min(len(diff.hunks) - 1, self.hunk_index + step))
+        row, old_line, new_line = diff.hunks[self.hunk_index]
+        self.diff_text.see_line(row)
+        self.original_text.see_line(old_line)
+        self.new_text.see_line(new_line)
+        self.hunk_var.set(f"Hunk {self.hunk_index + 1}/{len(diff.hunks)}")
+
+    def update_generated(self, file_path, orig_code, merged_code, diff, changes):
         try:
             # Highlight selected file
-            try:
-                idx = list(self.files_listbox.get(0, tk.END)).index(file_path)
-                self.files_listbox.selection_clear(0, tk.END)
-                self.files_listbox.selection_set(idx)
-            except ValueError:
-                pass
+            row = next((r for r, i in enumerate(self.shown) if self.metas[i].get("path") == file_path), None)
+            if row is not None:
+                self.files_list.select(row, notify=False)
 
             # Update meta display
             meta_for_file = next((m for m in self.metas if m.get("path") == file_path), None)
@@ -412,58 +678,131 @@ class AIEditorGUI:
             self.current_file_path = file_path
 
             # Original code
-            self.original_text.delete("1.0", tk.END)
-            self.original_text.insert(tk.END, orig_code)
+            self.original_text.set_text(orig_code)
 
             # Merged/AI code
-            self.new_text.delete("1.0", tk.END)
-            self.new_text.insert(tk.END, merged_code)
+            self.new_text.set_text(merged_code)
 
-            # Save merged code to current_new_code for apply
-            # Wrap in a dict so on_apply can iterate over it
-            self.current_new_code = {file_path: merged_code}
+            # Every changed file, by path, for apply; Apply stays disabled
+            # until validate_change has checked them
+            self.current_new_code = changes
 
-            # Diff
-            diff = preview_diff(orig_code, merged_code)
-            self.diff_text.delete("1.0", tk.END)
-            self.diff_text.insert(tk.END, diff)
+            # Diff, computed by the generate job
+            self.show_diff(diff)
 
-            self.apply_btn.config(state=tk.NORMAL)
+            self.apply_btn.config(state=tk.DISABLED)
+            self.clear_validation(f"Checking {len(changes)} file(s)...")
         except Exception as e:
             messagebox.showerror("UI update error", f"Could not update UI: {e}")
 
-    def on_file_select(self, event):
-            sel = self.files_listbox.curselection()
-            if not sel:
-                return
-            idx = sel[0]
-            meta = self.metas[idx]
+    def validate_change(self, job, root_dir, changes):
+        """Compile and resolve changes on the validator's processes, streaming results to the UI."""
+        started = time.perf_counter()
+        try:
+            modules = {path: module_name(path, root_dir) for path in changes}
+            graph = load_dependency_graph(root_dir)
+            results = self.validator.validate(
+                root_dir, changes, modules, graph, job=job,
+                on_result=lambda result: self.ui.post(self.add_validation_result, changes, result),
+            )
+            job.check()
+        except JobCancelled:
+            return
+        except Exception as e:
+            # A broken checker shouldn't block applying; say so and let the user decide
+            traceback.print_exc()
+            results = [{"path": None, "issues": [{
+                "path": None, "line": None, "check": "validator", "message": str(e), "severity": "error"
+            }], "removed": []}]
+        self.ui.post(self.finish_validation, changes, results, time.perf_counter() - started)
+
+    def clear_validation(self, status=""):
+        self.validation_results = None
+        self.validation_var.set(status)
+        self.validation_text.config(state=tk.NORMAL)
+        self.validation_text.delete("1.0", tk.END)
+        self.validation_text.config(state=tk.DISABLED)
+
+    def add_validation_result(self, changes, result):
+        if changes is not self.current_new_code:
+            return  # a newer change replaced this one
+        path = result["path"]
+        name = os.path.basename(path) if path else "tests"
+        self.validation_text.config(state=tk.NORMAL)
+        if not result["issues"]:
+            note = "not checked" if result.get("skipped") else f"ok ({result['seconds'] * 1000:.0f} ms)"
+            self.validation_text.insert(tk.END, f"{name}: {note}\n", "ok")
+        for item in result["issues"]:
+            where = f"{name}:{item['line']}" if item["line"] else name
+            self.validation_text.insert(tk.END, f"{where} [{item['check']}] {item['message']}\n", item["severity"])
+        self.validation_text.config(state=tk.DISABLED)
+
+    def finish_validation(self, changes, results, elapsed):
+        if changes is not self.current_new_code:
+            return
+        self.validation_results = results
+        errors, warnings = summarize_validation(results)
+        status = f"{errors} error(s)" if errors else "all passed"
+        if warnings:
+            status += f", {warnings} warning(s)"
+        self.validation_var.set(f"{status} in {elapsed:.1f}s")
+        self.apply_btn.config(state=tk.NORMAL)
+
+    def on_file_select(self, row):
+            meta = self.metas[self.shown[row]]
             path = meta.get("path")
             if not path or not os.path.exists(path):
                 messagebox.showerror("File error", f"Invalid path: {path}")
                 return
-            try:
-                with open(path, "r", encoding="utf-8") as f:
-                    code = f.read()
-                self.current_file_path = path
-                self.original_text.delete("1.0", tk.END)
-                self.original_text.insert(tk.END, code)
-                # Update summary/symbols for the selected file
-                self.update_meta_display(meta)
-                # Clear new/diff and prompt when switching files until regenerated
-                self.new_text.delete("1.0", tk.END)
-                self.diff_text.delete("1.0", tk.END)
-                self.apply_btn.config(state=tk.DISABLED)
-                self.current_new_code = None
-                self.clear_prompt_display()
-            except Exception as e:
-                messagebox.showerror("Read error", f"Could not read file: {e}")
+            # Read and split off the Tk thread; a newer selection supersedes it
+            self.interactive_jobs.submit(("open_file", path), self.load_file, path, meta, group="file_select")
+
+    def load_file(self, job, path, meta):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                code = f.read()
+        except Exception as e:
+            self.ui.post(messagebox.showerror, "Read error", f"Could not read file: {e}")
+            return
+        job.check()
+        # The pending change may touch this file too; diff it here, not on the Tk thread
+        changes = self.current_new_code
+        diff = unified_diff(code, changes[path]) if changes is not None and path in changes else None
+        job.check()
+        self.ui.post(self.show_file, path, meta, code.splitlines(), changes, diff)
+
+    def show_file(self, path, meta, lines, changes=None, diff=None):
+        self.current_file_path = path
+        self.original_text.set_lines(lines)
+        # Update summary/symbols for the selected file
+        self.update_meta_display(meta)
+        if diff is not None and changes is self.current_new_code:
+            # Part of the change on screen: show this file's side of it and
+            # keep the change, its checks and Apply as they are
+            self.new_text.set_text(changes[path])
+            self.show_diff(diff)
+            return
+        # Clear new/diff and prompt when switching files until regenerated
+        self.new_text.clear()
+        self.show_diff(None)
+        self.apply_btn.config(state=tk.DISABLED)
+        self.current_new_code = None
+        self.jobs.cancel_group("validate")
+        self.clear_validation()
+        self.clear_prompt_display()
 
     def on_apply(self):
         if not self.current_file_path or self.current_new_code is None:
             messagebox.showwarning("Nothing to apply", "No generated change to apply.")
             return
 
+        errors, _ = summarize_validation(self.validation_results or [])
+        if errors and not messagebox.askyesno(
+            "Checks failed",
+            f"Validation found {errors} error(s) in this change (see Checks). Apply anyway?"
+        ):
+            return
+
         confirm = messagebox.askyesno(
             "Apply change",
             f"Apply changes to {self.current_file_path}? A backup will be saved with a .bak extension."
@@ -472,10 +811,12 @@ class AIEditorGUI:
             return
 
         try:
-            for path, code in self.current_new_code.items():
-                shutil.copy2(path, path + ".bak")
-                with open(path, "w", encoding="utf-8") as f:
-                    f.write(code)
+            for path in self.current_new_code:
+                if os.path.exists(path):
+                    shutil.copy2(path, path + ".bak")
+            # All files are staged before any is replaced, so a failure
+            # part-way never leaves a half-written file behind
+            write_files_atomic(self.current_new_code)
 
             messagebox.showinfo(
                 "Success",
@@ -484,18 +825,18 @@ class AIEditorGUI:
 
             # Refresh views
             # After applying, refresh the currently selected file
-            self.original_text.delete("1.0", tk.END)
             curr_path = self.current_file_path
             if curr_path in self.current_new_code:
-                self.original_text.insert("1.0", self.current_new_code[curr_path])
+                self.original_text.set_text(self.current_new_code[curr_path])
             else:
                 # fallback
                 with open(curr_path, "r", encoding="utf-8") as f:
-                    self.original_text.insert("1.0", f.read())
+                    self.original_text.set_text(f.read())
 
-            self.diff_text.delete("1.0", tk.END)
-            self.new_text.delete("1.0", tk.END)
+            self.show_diff(None)
+            self.new_text.clear()
             self.apply_btn.config(state=tk.DISABLED)
+            self.clear_validation()
 
         except Exception as e:
             tb = traceback.format_exc()
@@ -505,6 +846,50 @@ class AIEditorGUI:
                 pass
             messagebox.showerror("Apply error", f"Failed to apply change:\n{e}\n\nTraceback:\n{tb}")
 
+    def open_trace_view(self):
+        t = tracing.last_trace("generate")
+        if t is None:
+            messagebox.showinfo("No trace", "Run Generate first.")
+            return
+
+        win = tk.Toplevel(self.master)
+        win.title(f"Trace: {t.name} ({t.duration_ms:.0f} ms, est. ${t.total('cost_usd'):.4f})")
+        win.geometry("760x320")
+
+        columns = ("calls", "ms", "bytes", "tokens", "cache_hits", "cost")
+        tree = ttk.Treeview(win, columns=columns, show="tree headings")
+        tree.heading("#0", text="span")
+        tree.column("#0", width=160)
+        for col in columns:
+            tree.heading(col, text=col)
+            tree.column(col, width=90, anchor=tk.E)
+        for row in t.breakdown():
+            tree.insert("", tk.END, text=row["name"], values=(
+                row["calls"],
+                f"{row['ms']:.1f}",
+                row.get("bytes", ""),
+                (row.get("prompt_tokens", 0) + row.get("completion_tokens", 0)) or "",
+                row.get("cache_hits", ""),
+                f"${row['cost_usd']:.5f}" if "cost_usd" in row else "",
+            ))
+        tree.pack(fill=tk.BOTH, expand=True, padx=6, pady=6)
+
+        def export(kind):
+            ext = ".jsonl" if kind == "jsonl" else ".json"
+            path = filedialog.asksaveasfilename(parent=win, defaultextension=ext)
+            if not path:
+                return
+            if kind == "jsonl":
+                t.export_jsonl(path)
+            else:
+                t.export_chrome(path)
+
+        btn_frame = ttk.Frame(win)
+        btn_frame.pack(fill=tk.X, padx=6, pady=(0, 6))
+        ttk.Button(btn_frame, text="Export JSONL", command=lambda: export("jsonl")).pack(side=tk.LEFT)
+        ttk.Button(btn_frame, text="Export Chrome trace", command=lambda: export("chrome")).pack(side=tk.LEFT, padx=(6, 0))
+        ttk.Button(btn_frame, text="Close", command=win.destroy).pack(side=tk.RIGHT)
+
     def open_summary_manager(self):
         try:
             mgr = tk.Toplevel(self.master)
@@ -517,25 +902,23 @@ class AIEditorGUI:
             except Exception:
                 pass
 
-            # Left: files list
+            # Left: filter and files list
             left = ttk.Frame(mgr, padding=6, style="Card.TFrame")
             left.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
             ttk.Label(left, text="Files in codebase:", style="Header.TLabel").pack(anchor=tk.W)
-            list_frame = ttk.Frame(left, style="Card.TFrame")
-            list_frame.pack(fill=tk.BOTH, expand=True, pady=(6,6))
-            file_listbox = tk.Listbox(list_frame, activestyle='dotbox', selectbackground="#00c0d8")
-            file_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-            fsb = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=file_listbox.yview)
-            fsb.pack(side=tk.RIGHT, fill=tk.Y)
-            file_listbox.config(yscrollcommand=fsb.set)
+            filter_var = tk.StringVar()
+            ttk.Entry(left, textvariable=filter_var).pack(fill=tk.X, pady=(6, 0))
+            count_var = tk.StringVar(value="Loading file list...")
+            ttk.Label(left, textvariable=count_var, style="Small.TLabel").pack(anchor=tk.W)
+            file_list = VirtualList(left, activestyle='dotbox', selectbackground="#00c0d8")
+            file_list.pack(fill=tk.BOTH, expand=True, pady=(6,6))
 
             # Right: file content and summary editor
             right = ttk.Frame(mgr, padding=6, style="Card.TFrame")
             right.pack(side=tk.RIGHT, fill=tk.BOTH, expand=True)
             ttk.Label(right, text="File content:", style="Header.TLabel").pack(anchor=tk.W)
-            file_content = scrolledtext.ScrolledText(right, height=15, font=("Courier New", 10))
+            file_content = VirtualText(right, height=15, font=("Courier New", 10))
             file_content.pack(fill=tk.BOTH, expand=True, pady=(6,6))
-            file_content.config(state=tk.DISABLED, background="#ffffff")
             ttk.Label(right, text="Summary (editable):", style="Header.TLabel").pack(anchor=tk.W, pady=(6,0))
             summary_editor = scrolledtext.ScrolledText(right, height=8, wrap=tk.WORD)
             summary_editor.pack(fill=tk.BOTH, expand=False)
@@ -546,37 +929,57 @@ class AIEditorGUI:
             save_btn.pack(side=tk.RIGHT, padx=(6,0))
             close_btn = ttk.Button(btn_frame, text="Close", command=mgr.destroy)
             close_btn.pack(side=tk.RIGHT)
+            refresh_btn = ttk.Button(btn_frame, text="Rescan Files")
+            refresh_btn.pack(side=tk.LEFT)
+
+            # The file list comes from the shared registry: walked once per
+            # codebase, so reopening the window is instant
+            registry = get_registry(os.getcwd())
+            shown = []  # registry.rel_paths indexes of the rows in file_list
 
-            # Build file list
-            root_dir = os.getcwd()
-            exclude_dirs = {".git", "__pycache__", ".venv", "venv", "env", "node_modules", ".pytest_cache"}
-            files = []
-            for dirpath, dirnames, filenames in os.walk(root_dir):
-                # filter out excluded directories in-place to avoid descending
-                dirnames[:] = [d for d in dirnames if d not in exclude_dirs and not d.startswith(".")]
-                for fn in filenames:
-                    # skip hidden files at top level
-                    if fn.startswith("."):
-                        continue
-                    full = os.path.join(dirpath, fn)
-                    files.append(os.path.normpath(full))
-            # sort and display relative paths
-            files.sort()
-            rel_paths = [os.path.relpath(p, root_dir) for p in files]
-            for rp in rel_paths:
-                file_listbox.insert(tk.END, rp)
+            def show_matches(query):
+                if not mgr.winfo_exists():
+                    return
+                shown[:] = registry.index.search(query)
+                file_list.set_items([registry.rel_paths[i] for i in shown])
+                count_var.set(f"{len(shown)} of {len(registry.rel_paths)} files")
+
+            def load_registry(refresh):
+                def run(job):
+                    if refresh:
+                        registry.refresh()
+                    else:
+                        registry.ensure_loaded()
+                    job.check()
+                    self.ui.post(on_loaded)
+                self.jobs.submit(("file_registry", registry.root), run, group="file_registry")
+
+            def on_loaded():
+                if not mgr.winfo_exists():
+                    return
+                show_matches(filter_var.get())
+                # Pre-select first file if any
+                if shown and file_list.selected is None:
+                    file_list.select(0)
+
+            self.bind_filter(filter_var, show_matches)
+            refresh_btn.config(command=lambda: (count_var.set("Rescanning..."), load_registry(True)))
 
             # Helper to get absolute path from selection
             def get_selected_path():
-                sel = file_listbox.curselection()
-                if not sel:
+                if file_list.selected is None:
                     return None
-                idx = sel[0]
-                rel = file_listbox.get(idx)
-                return os.path.normpath(os.path.join(root_dir, rel))
+                return registry.abs_path(registry.rel_paths[shown[file_list.selected]])
+
+            def meta_for(path):
+                # Metas from the last index load; the main list may hold others
+                meta = registry.meta(path)
+                if meta is None:
+                    meta = next((m for m in self.metas if os.path.normpath(m.get("path", "")) == path), None)
+                return meta
 
             # When selecting a file, show its content and summary if available
-            def on_mgr_select(event):
+            def on_mgr_select(row):
                 path = get_selected_path()
                 if not path:
                     return
@@ -585,21 +988,13 @@ class AIEditorGUI:
                         content = f.read()
                 except Exception as e:
                     content = f"Could not read file: {e}"
-                file_content.config(state=tk.NORMAL)
-                file_content.delete("1.0", tk.END)
-                file_content.insert(tk.END, content)
-                file_content.config(state=tk.DISABLED)
+                file_content.set_text(content)
                 # Load existing summary from metas if present
-                summary_text = ""
-                abs_norm = os.path.normpath(path)
-                for m in self.metas:
-                    if os.path.normpath(m.get("path", "")) == abs_norm:
-                        summary_text = m.get("summary", "")
-                        break
+                meta = meta_for(path)
                 summary_editor.delete("1.0", tk.END)
-                summary_editor.insert(tk.END, summary_text)
+                summary_editor.insert(tk.END, (meta.get("summary") if meta else "") or "")
 
-            file_listbox.bind("<<ListboxSelect>>", on_mgr_select)
+            file_list.on_select = on_mgr_select
 
             # Save summary handler
             def on_save_summary():
@@ -608,39 +1003,25 @@ class AIEditorGUI:
                     messagebox.showwarning("Select file", "Please select a file first.")
                     return
                 new_summary = summary_editor.get("1.0", tk.END).rstrip()
-                abs_norm = os.path.normpath(path)
-                updated = False
-                for m in self.metas:
-                    if os.path.normpath(m.get("path", "")) == abs_norm:
-                        m["summary"] = new_summary
-                        updated = True
-                        break
-                if not updated:
-                    # Append a new meta entry so the rest of the UI can use it
-                    self.metas.append({"path": abs_norm, "summary": new_summary, "symbols": []})
-                    # If main files listbox currently doesn't include it, don't modify it here
+                meta = meta_for(path)
+                if meta is not None:
+                    meta["summary"] = new_summary
+                else:
+                    # Add a new meta entry so the rest of the UI can use it
+                    meta = FileMeta(path, new_summary)
+                    self.metas.append(meta)
+                    registry.add_meta(meta)
                 messagebox.showinfo("Saved", f"Summary updated for {path}")
                 # If the main UI currently has this file selected, update its summary display
-                try:
-                    if os.path.normpath(self.current_file_path or "") == abs_norm:
-                        # Update the main summary display to reflect new summary
-                        current_meta = None
-                        # try to find meta_for_file and update display
-                        for m in self.metas:
-                            if os.path.normpath(m.get("path", "")) == abs_norm:
-                                current_meta = m
-                                break
-                        if current_meta:
-                            self.update_meta_display(current_meta)
-                except Exception:
-                    pass
+                if os.path.normpath(self.current_file_path or "") == path:
+                    self.update_meta_display(meta)
 
             save_btn.config(command=on_save_summary)
 
-            # Pre-select first file if any
-            if files:
-                file_listbox.selection_set(0)
-                file_listbox.event_generate("<<ListboxSelect>>")
+            if registry.loaded:
+                on_loaded()
+            else:
+                load_registry(False)
 
         except Exception as e:
             messagebox.showerror("Error", f"Could not open summary manager: {e}")
@@ -0,0 +1,108 @@
+import numpy as np
+from quantize import kmeans, nearest
+
+# Inverted-file partitions for a QuantizedIndex. Rows are grouped by their
+# nearest of n_lists k-means centroids; a query scores the centroids, then
+# only the rows of the `probes` best lists. Rows added before the partitions
+# are trained (or before the last retrain caught up) are kept unassigned and
+# always scanned, so results never miss new chunks.
+
+MIN_TRAIN_ROWS = 20000   # below this a flat scan is fast enough
+RETRAIN_GROWTH = 4       # retrain once the index is this many times its size at training
+TRAIN_SAMPLE = 50000
+TRAIN_ITERATIONS = 10
+ASSIGN_BATCH = 16384
+
+
+def default_lists(n_rows):
+    # ~4 * sqrt(rows), but few enough that each list gets ~32 training points
+    return max(16, min(int(4 * np.sqrt(n_rows)), TRAIN_SAMPLE // 32))
+
+
+class IVFPartitions:
+    def __init__(self, n_lists=0, seed=0):
+        self.n_lists = n_lists       # 0 = default_lists(rows) at training time
+        self.seed = seed
+        self.centroids = None        # (lists, dim) float32
+        self.assign = np.empty(0, dtype=np.int32)  # list per index row, -1 = unassigned
+        self.trained_rows = 0
+        self._lists = None           # (rows ordered by list, offsets), rebuilt after changes
+
+    @property
+    def trained(self):
+        return self.centroids is not None
+
+    def _nearest(self, vectors):
+        out = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), ASSIGN_BATCH):
+            out[start:start + ASSIGN_BATCH] = nearest(vectors[start:start + ASSIGN_BATCH], self.centroids)
+        return out
+
+    def extend(self, vectors):
+        """Assign rows appended to the index (unassigned until trained)."""
+        if self.trained:
+            added = self._nearest(np.asarray(vectors, dtype=np.float32))
+        else:
+            added = np.full(len(vectors), -1, dtype=np.int32)
+        self.assign = np.concatenate([self.assign, added])
+        self._lists = None
+
+    def keep(self, rows):
+        """The index dropped every row not in rows."""
+        self.assign = self.assign[rows]
+        self._lists = None
+
+    def needs_training(self, n_rows):
+        if n_rows < MIN_TRAIN_ROWS:
+            return False
+        return not self.trained or n_rows >= RETRAIN_GROWTH * self.trained_rows
+
+    def train(self, decode):
+        """
+        k-means over a sample of the rows, then reassign every row. decode(rows)
+        returns float32 vectors for an index array or slice of rows.
+        """
+        n_rows = len(self.assign)
+        rng = np.random.default_rng(self.seed)
+        sample = decode(np.sort(rng.choice(n_rows, min(n_rows, TRAIN_SAMPLE), replace=False)))
+        k = min(self.n_lists or default_lists(n_rows), len(sample))
+        self.centroids = kmeans(sample, k, TRAIN_ITERATIONS, rng).astype(np.float32)
+        for start in range(0, n_rows, ASSIGN_BATCH):
+            self.assign[start:start + ASSIGN_BATCH] = self._nearest(decode(slice(start, start + ASSIGN_BATCH)))
+        self.trained_rows = n_rows
+        self._lists = None
+
+    def candidates(self, query, probes):
+        """Row numbers in the probes lists nearest to query, plus every unassigned row."""
+        if self._lists is None:
+            order = np.argsort(self.assign, kind="stable")
+            counts = np.bincount(self.assign + 1, minlength=len(self.centroids) + 1)
+            self._lists = (order, np.concatenate([[0], np.cumsum(counts)]))
+        order, offsets = self._lists
+        closeness = self.centroids @ query - 0.5 * (self.centroids ** 2).sum(axis=1)
+        probes = min(probes, len(closeness))
+        probed = np.argpartition(-closeness, probes - 1)[:probes]
+        # Offsets are shifted by one: slot 0 holds the unassigned rows
+        parts = [order[offsets[0]:offsets[1]]]
+        parts.extend(order[offsets[l + 1]:offsets[l + 2]] for l in probed)
+        return np.concatenate(parts)
+
+    def state(self):
+        if not self.trained:
+            return {"ivf_assign": self.assign}
+        return {
+            "ivf_centroids": self.centroids,
+            "ivf_assign": self.assign,
+            "ivf_trained_rows": np.asarray([self.trained_rows]),
+        }
+
+    def load_state(self, arrays, n_rows):
+        assign = arrays.get("ivf_assign")
+        if assign is None or len(assign) != n_rows:
+            # Saved without partitions (or out of step): scan everything until retrained
+            self.assign = np.full(n_rows, -1, dtype=np.int32)
+            return
+        self.assign = assign.astype(np.int32)
+        self.centroids = arrays.get("ivf_centroids")
+        if self.centroids is not None:
+            self.trained_rows = int(arrays["ivf_trained_rows"][0])
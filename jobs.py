@@ -0,0 +1,192 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class JobCancelled(Exception):
+    """Raised inside a job when it has been cancelled or superseded."""
+
+
+class JobHandle:
+    """
+    Handle for a job submitted to a JobScheduler.
+    Jobs are cancelled cooperatively: the job function receives its handle and
+    should call check() between expensive stages.
+    """
+    def __init__(self, key, group=None):
+        self.key = key
+        self.group = group
+        self.future = None
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        self._cancel_event.set()
+        if self.future is not None:
+            self.future.cancel()
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def check(self):
+        if self._cancel_event.is_set():
+            raise JobCancelled(f"Job {self.key!r} was cancelled")
+
+    def done(self):
+        return self.future is not None and self.future.done()
+
+    def result(self, timeout=None):
+        return self.future.result(timeout=timeout)
+
+
+class JobScheduler:
+    """
+    Bounded executor for background work.
+
+    - At most max_workers jobs run at once; the rest wait in the executor queue.
+    - Submitting a job with the same key as one still in flight returns the
+      existing handle instead of starting a duplicate (coalescing).
+    - Submitting a job in a group cancels any older job in that group, so a new
+      instruction aborts the stale request it replaces.
+    """
+    def __init__(self, max_workers=2):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._lock = threading.Lock()
+        self._inflight = {}   # key -> JobHandle
+        self._groups = {}     # group -> JobHandle
+        self.coalesced = 0
+        self.superseded = 0
+
+    def submit(self, key, fn, *args, group=None, **kwargs):
+        """
+        Run fn(handle, *args, **kwargs) on the pool and return its JobHandle.
+        """
+        with self._lock:
+            existing = self._inflight.get(key)
+            if existing is not None and not existing.cancelled and not existing.done():
+                self.coalesced += 1
+                return existing
+
+            if group is not None:
+                previous = self._groups.get(group)
+                if previous is not None and not previous.done():
+                    previous.cancel()
+                    self.superseded += 1
+
+            handle = JobHandle(key, group)
+            self._inflight[key] = handle
+            if group is not None:
+                self._groups[group] = handle
+            handle.future = self._executor.submit(self._run, handle, fn, args, kwargs)
+            return handle
+
+    def _run(self, handle, fn, args, kwargs):
+        try:
+            handle.check()
+            return fn(handle, *args, **kwargs)
+        finally:
+            with self._lock:
+                if self._inflight.get(handle.key) is handle:
+                    del self._inflight[handle.key]
+                if handle.group is not None and self._groups.get(handle.group) is handle:
+                    del self._groups[handle.group]
+
+    def cancel_group(self, group):
+        with self._lock:
+            handle = self._groups.get(group)
+        if handle is not None:
+            handle.cancel()
+
+    def shutdown(self, wait=False):
+        with self._lock:
+            handles = list(self._inflight.values())
+        for handle in handles:
+            handle.cancel()
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+class UIDispatcher:
+    """
+    Marshals callables from worker threads onto the Tk main thread.
+
+    Workers call post(fn, *args); the main loop drains the queue every
+    interval_ms via master.after. Each tick also records how late it ran,
+    which is the main-loop stall time (time the UI could not respond).
+    """
+    def __init__(self, master, interval_ms=15, max_batch=200, stall_warn_ms=100):
+        self.master = master
+        self.interval_ms = interval_ms
+        self.max_batch = max_batch
+        self.stall_warn_ms = stall_warn_ms
+        self._queue = queue.SimpleQueue()
+        self._main_thread = threading.get_ident()
+        self._last_tick = None
+        self._running = False
+        self.ticks = 0
+        self.max_stall_ms = 0.0
+        self.total_stall_ms = 0.0
+        self.stalls_over_warn = 0
+        self.max_callback_ms = 0.0
+
+    def post(self, fn, *args, **kwargs):
+        self._queue.put((fn, args, kwargs))
+
+    def call(self, fn, *args, **kwargs):
+        """Run fn now if already on the main thread, otherwise post it."""
+        if threading.get_ident() == self._main_thread:
+            fn(*args, **kwargs)
+        else:
+            self.post(fn, *args, **kwargs)
+
+    def start(self):
+        if not self._running:
+            self._running = True
+            self._last_tick = time.perf_counter()
+            self.master.after(self.interval_ms, self._drain)
+
+    def stop(self):
+        self._running = False
+
+    def _drain(self):
+        if not self._running:
+            return
+        now = time.perf_counter()
+        stall = max(0.0, (now - self._last_tick) * 1000.0 - self.interval_ms)
+        self.ticks += 1
+        self.total_stall_ms += stall
+        if stall > self.max_stall_ms:
+            self.max_stall_ms = stall
+        if stall > self.stall_warn_ms:
+            self.stalls_over_warn += 1
+        # Callbacks below run on the main loop too, so their time counts
+        # towards the next tick's stall.
+        self._last_tick = now
+
+        for _ in range(self.max_batch):
+            try:
+                fn, args, kwargs = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            started = time.perf_counter()
+            try:
+                fn(*args, **kwargs)
+            except Exception:
+                logger.exception("UI callback %s failed", getattr(fn, "__name__", fn))
+            elapsed = (time.perf_counter() - started) * 1000.0
+            if elapsed > self.max_callback_ms:
+                self.max_callback_ms = elapsed
+
+        self.master.after(self.interval_ms, self._drain)
+
+    def stats(self):
+        return {
+            "ticks": self.ticks,
+            "max_stall_ms": round(self.max_stall_ms, 1),
+            "avg_stall_ms": round(self.total_stall_ms / self.ticks, 2) if self.ticks else 0.0,
+            "stalls_over_warn": self.stalls_over_warn,
+            "max_callback_ms": round(self.max_callback_ms, 1),
+        }
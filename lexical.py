@@ -0,0 +1,86 @@
+import math
+import re
+from collections import Counter, defaultdict
+from docstore import resolve_documents
+
+IDENTIFIER_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*|\d+")
+CAMEL_RE = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+
+
+def tokenize(text):
+    """
+    Code-aware tokens: each identifier lowercased, plus its snake_case and
+    camelCase parts, so "load_all_file_metadata" also matches "metadata".
+    """
+    tokens = []
+    for ident in IDENTIFIER_RE.findall(text):
+        lowered = ident.lower()
+        tokens.append(lowered)
+        parts = [p.lower() for piece in ident.split("_") for p in CAMEL_RE.findall(piece)]
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+
+class BM25Index:
+    """In-memory BM25 over chunk documents."""
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.ids = []
+        self.metas = []
+        self.lengths = []
+        self.postings = defaultdict(list)  # term -> [(doc index, term frequency)]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, doc_id, text, meta=None):
+        index = len(self.ids)
+        counts = Counter(tokenize(text or ""))
+        self.ids.append(doc_id)
+        self.metas.append(meta)
+        self.lengths.append(sum(counts.values()))
+        for term, tf in counts.items():
+            self.postings[term].append((index, tf))
+
+    def search(self, query, k=10):
+        """Return [(doc_id, meta, score)] for the k best documents."""
+        n = len(self.ids)
+        if not n:
+            return []
+        avg_len = sum(self.lengths) / n
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for index, tf in postings:
+                norm = tf + self.k1 * (1 - self.b + self.b * self.lengths[index] / avg_len)
+                scores[index] += idf * tf * (self.k1 + 1) / norm
+        best = sorted(scores.items(), key=lambda item: -item[1])[:k]
+        return [(self.ids[i], self.metas[i], score) for i, score in best]
+
+    @classmethod
+    def from_collection(cls, collection, page_size=1000, root=None):
+        index = cls()
+        offset = 0
+        while True:
+            page = collection.get(include=["documents", "metadatas"], limit=page_size, offset=offset)
+            resolve_documents(page, root)
+            if not page["ids"]:
+                break
+            for doc_id, doc, meta in zip(page["ids"], page["documents"], page["metadatas"]):
+                index.add(doc_id, doc, meta)
+            offset += len(page["ids"])
+        return index
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """Merge ranked id lists; ids ranked high in any list float to the top."""
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] += 1.0 / (k + rank + 1)
+    return [doc_id for doc_id, _ in sorted(scores.items(), key=lambda item: -item[1])]
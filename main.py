@@ -1,8 +1,10 @@
 from openai import OpenAI
 from embedding_utils import build_index
+from codebases import default_root, manifest_path, load_versions
+from manifest import IndexManifest
 from gui import AIEditorGUI
 import os
-import shutil
+import logging
 import time
 import sys
 import tkinter as tk
@@ -82,26 +84,42 @@ def write_index_timestamp(ts=None):
     except Exception as e:
         # Suggestion: consider logging to a logger rather than printing, for better control.
         print(f"Warning: could not write index timestamp file: {e}")
-root_dir = sys.argv[1] if len(sys.argv) > 1 else "."
-print(f"Using root directory: {root_dir}")
-# Store the index timestamp file inside the chosen root directory so the timestamp corresponds to that tree.
-INDEX_TIMESTAMP_FILE = os.path.join(root_dir, ".index_timestamp")
 
-# Initial index status check to avoid expensive rebuilds when not necessary.
-print("Checking index status...")
-latest_source_mtime = get_latest_source_mtime(root_dir)
-index_timestamp = read_index_timestamp()
+def prepare_index():
+    """
+    Startup index check. Not run at import: the validation worker processes
+    import __main__ and must not rebuild the index.
+    """
+    global INDEX_TIMESTAMP_FILE
+    root_dir = sys.argv[1] if len(sys.argv) > 1 else "."
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"), format="%(levelname)s %(name)s: %(message)s")
+
+    print(f"Using root directory: {root_dir}")
+    # Store the index timestamp file inside the chosen root directory so the timestamp corresponds to that tree.
+    INDEX_TIMESTAMP_FILE = os.path.join(root_dir, ".index_timestamp")
+
+    # Initial index status check to avoid expensive rebuilds when not necessary.
+    print("Checking index status...")
+    latest_source_mtime = get_latest_source_mtime(root_dir)
+    index_timestamp = read_index_timestamp()
+
+    # An interrupted build leaves its manifest in progress (or an unfinished
+    # rebuild version); finish it even if the timestamp from an earlier
+    # complete build still looks fresh.
+    index_interrupted = (IndexManifest(manifest_path(default_root())).in_progress
+                         or load_versions(default_root())["building"] is not None)
+
+    if index_timestamp >= latest_source_mtime and index_timestamp > 0 and not index_interrupted:
+        print("Index is up-to-date. Skipping rebuild.")
+    else:
+        print("Building/rebuilding index...")
+        # NOTE: build_index can be expensive. We only rebuild when source files changed since last build.
+        # Suggestion: consider running build_index in a background thread/process if startup latency matters.
+        # Also check build_index signature — other parts of the code call build_index(new_dir),
+        # so passing root_dir here is likely more correct and avoids global state reliance.
+        build_index()
+        write_index_timestamp()
 
-if index_timestamp >= latest_source_mtime and index_timestamp > 0:
-    print("Index is up-to-date. Skipping rebuild.")
-else:
-    print("Building/rebuilding index...")
-    # NOTE: build_index can be expensive. We only rebuild when source files changed since last build.
-    # Suggestion: consider running build_index in a background thread/process if startup latency matters.
-    # Also check build_index signature — other parts of the code call build_index(new_dir),
-    # so passing root_dir here is likely more correct and avoids global state reliance.
-    build_index()
-    write_index_timestamp()
 def main():
     # Consider initializing resources (API client, embedding index, etc.) here and
     # passing them into AIEditorGUI so dependencies are explicit and easier to test.
@@ -110,7 +128,9 @@ def main():
     app = AIEditorGUI(root)
     root.mainloop()
 if __name__ == "__main__":
-    # On Windows, if using multiprocessing/threads for background indexing, consider:
-    # from multiprocessing import freeze_support; freeze_support()
+    # Needed for the validation process pool in frozen Windows builds.
     # Also consider parsing CLI args with argparse and returning proper exit codes.
+    from multiprocessing import freeze_support
+    freeze_support()
+    prepare_index()
     main()
\ No newline at end of file
@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+import time
+
+
+def file_hash(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def text_hash(text):
+    return hashlib.sha1(text.encode("utf-8", errors="replace")).hexdigest()
+
+
+class IndexManifest:
+    """
+    Append-only, fsynced log of what build_index has committed to the store.
+
+    Records are JSON lines:
+        {"type": "begin", "root": ..., "started": ...}
+        {"type": "file", "path": ..., "mtime": ..., "size": ..., "hash": ..., "chunks": [chunk hashes]}
+        {"type": "update", "started": ...}
+        {"type": "remove", "path": ...}
+        {"type": "complete", "finished": ...}
+
+    A file record is only written after all of that file's chunks are in the
+    collection, so after a crash every recorded file can be skipped and the
+    rest re-indexed. An "update" record reopens a completed index for an
+    incremental pass. A torn last line from a crash mid-write is ignored.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.root = None
+        self.complete = False
+        self.files = {}
+        self._valid_size = 0
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                self._valid_size += len(line)
+                kind = record.get("type")
+                if kind == "begin":
+                    self.root = record["root"]
+                    self.complete = False
+                    self.files = {}
+                elif kind == "update":
+                    self.complete = False
+                elif kind == "file":
+                    self.files[record["path"]] = record
+                elif kind == "remove":
+                    self.files.pop(record["path"], None)
+                elif kind == "complete":
+                    self.complete = True
+
+    @property
+    def in_progress(self):
+        return self.root is not None and not self.complete
+
+    def has_index(self, root):
+        return self.root is not None and os.path.abspath(self.root) == os.path.abspath(root)
+
+    def is_committed(self, path):
+        """True if path was committed and is unchanged on disk (by mtime and size)."""
+        record = self.files.get(path)
+        if record is None:
+            return False
+        try:
+            st = os.stat(path)
+        except OSError:
+            return False
+        return record["mtime"] == st.st_mtime and record["size"] == st.st_size
+
+    def _append(self, records, truncate=False):
+        dirpath = os.path.dirname(self.path)
+        if dirpath:
+            os.makedirs(dirpath, exist_ok=True)
+        with open(self.path, "w" if truncate else "a", encoding="utf-8") as f:
+            if not truncate and f.tell() > self._valid_size:
+                # Cut off a torn record left by a crash before appending
+                f.truncate(self._valid_size)
+            for record in records:
+                line = json.dumps(record) + "\n"
+                f.write(line)
+                self._valid_size += len(line.encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def begin(self, root):
+        self.root = root
+        self.complete = False
+        self.files = {}
+        self._valid_size = 0
+        self._append([{"type": "begin", "root": root, "started": time.time()}], truncate=True)
+
+    def commit_files(self, entries):
+        """entries: list of (path, os.stat_result, file hash, [chunk hashes])."""
+        records = []
+        for path, st, digest, chunk_hashes in entries:
+            record = {
+                "type": "file",
+                "path": path,
+                "mtime": st.st_mtime,
+                "size": st.st_size,
+                "hash": digest,
+                "chunks": chunk_hashes,
+            }
+            self.files[path] = record
+            records.append(record)
+        if records:
+            self._append(records)
+
+    def begin_update(self):
+        self.complete = False
+        self._append([{"type": "update", "started": time.time()}])
+
+    def remove_files(self, paths):
+        for path in paths:
+            self.files.pop(path, None)
+        if paths:
+            self._append([{"type": "remove", "path": path} for path in paths])
+
+    def mark_complete(self):
+        self.complete = True
+        self._append([{"type": "complete", "finished": time.time()}])
@@ -0,0 +1,50 @@
+import logging
+import sys
+import time
+import tracemalloc
+
+logger = logging.getLogger(__name__)
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MiB, or None if unavailable."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS reports bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class MemoryMonitor:
+    """
+    Tracks peak RSS and, when trace=True, tracemalloc current/peak for a long
+    running job. report() returns a dict and logs a one-line summary.
+    """
+    def __init__(self, label, trace=False):
+        self.label = label
+        self.trace = trace
+        self.started = time.perf_counter()
+        if trace and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def snapshot(self):
+        stats = {
+            "elapsed_s": round(time.perf_counter() - self.started, 2),
+            "peak_rss_mb": round(peak_rss_mb() or 0.0, 1),
+        }
+        if self.trace and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            stats["traced_current_mb"] = round(current / 1024 / 1024, 1)
+            stats["traced_peak_mb"] = round(peak / 1024 / 1024, 1)
+        return stats
+
+    def report(self, **extra):
+        stats = dict(self.snapshot(), **extra)
+        logger.info("[%s] %s", self.label, ", ".join(f"{k}={v}" for k, v in stats.items()))
+        return stats
+
+    def stop(self):
+        if self.trace and tracemalloc.is_tracing():
+            tracemalloc.stop()
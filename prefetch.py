@@ -0,0 +1,110 @@
+import logging
+import threading
+import time
+from concurrent.futures import CancelledError, TimeoutError as FutureTimeout
+from jobs import JobCancelled
+
+logger = logging.getLogger(__name__)
+
+
+class Prefetcher:
+    """
+    Debounced speculative retrieval for the instruction being typed.
+
+    on_text_changed() is called from the Tk main thread on every keystroke. Once
+    typing pauses for delay_ms, compute(job, text, root_dir) is submitted to the
+    job pool. Only the result for the latest text is kept; anything else is
+    cancelled or discarded, so a hit always matches the exact instruction.
+    """
+    def __init__(self, master, jobs, compute, delay_ms=800, min_chars=8):
+        self.master = master
+        self.jobs = jobs
+        self.compute = compute
+        self.delay_ms = delay_ms
+        self.min_chars = min_chars
+        self._lock = threading.Lock()
+        self._after_id = None
+        self._key = None
+        self._handle = None
+        self.requests = 0
+        self.hits = 0
+        self.saved_seconds = 0.0
+
+    def on_text_changed(self, text, root_dir):
+        text = text.strip()
+        key = (root_dir, text)
+        if self._after_id is not None:
+            self.master.after_cancel(self._after_id)
+            self._after_id = None
+        with self._lock:
+            if key == self._key:
+                return
+            self._drop()
+        if len(text) >= self.min_chars:
+            self._after_id = self.master.after(self.delay_ms, self._fire, key)
+
+    def _drop(self):
+        if self._handle is not None and not self._handle.done():
+            self._handle.cancel()
+        self._key = None
+        self._handle = None
+
+    def _fire(self, key):
+        self._after_id = None
+        root_dir, text = key
+        with self._lock:
+            self._key = key
+            self._handle = self.jobs.submit(("prefetch", root_dir, text), self.compute, text, root_dir, group="prefetch")
+
+    def take(self, job, text, root_dir):
+        """
+        Return the prefetched result for exactly this text, or None on a miss.
+        If the prefetch is still running we wait for it (checking our own job for
+        cancellation) since it is already ahead of a fresh start. One still
+        queued is cancelled instead: waiting for it would hold this worker
+        while the prefetch waits for a free one.
+        """
+        key = (root_dir, text.strip())
+        with self._lock:
+            self.requests += 1
+            handle = self._handle if self._key == key else None
+        if handle is not None and not (handle.future.running() or handle.future.done()):
+            handle.cancel()
+            handle = None
+        if handle is None:
+            self._report(False, 0.0)
+            return None
+
+        waited_from = time.perf_counter()
+        while True:
+            job.check()
+            try:
+                result = handle.result(timeout=0.1)
+                break
+            except FutureTimeout:
+                continue
+            except (JobCancelled, CancelledError):
+                self._report(False, 0.0)
+                return None
+            except Exception as e:
+                logger.warning("Prefetch failed, recomputing: %s", e)
+                self._report(False, 0.0)
+                return None
+        waited = time.perf_counter() - waited_from
+        self._report(True, max(0.0, result["elapsed"] - waited))
+        return result
+
+    def _report(self, hit, saved):
+        with self._lock:
+            if hit:
+                self.hits += 1
+                self.saved_seconds += saved
+        logger.debug("Prefetch %s: %s", "hit" if hit else "miss", self.stats())
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "hits": self.hits,
+            "hit_rate": round(self.hits / self.requests, 2) if self.requests else 0.0,
+            "saved_seconds": round(self.saved_seconds, 2),
+        }
@@ -0,0 +1,333 @@
+import json
+import os
+import threading
+import numpy as np
+
+# Compact vector codes kept alongside a Chroma collection. Scores from codes are
+# approximate; callers re-rank the top candidates with the exact float32
+# vectors from the collection.
+
+
+class Float16Codec:
+    name = "float16"
+    needs_training = False
+
+    def encode(self, vectors):
+        return vectors.astype(np.float16)
+
+    def scores(self, codes, query):
+        return codes.astype(np.float32) @ query
+
+    def decode(self, codes):
+        return codes.astype(np.float32)
+
+    def state(self):
+        return {}
+
+    def load_state(self, arrays):
+        pass
+
+
+class Int8Codec:
+    """Symmetric per-vector scalar quantization; the scale is stored as an extra column."""
+    name = "int8"
+    needs_training = False
+
+    def encode(self, vectors):
+        scales = np.abs(vectors).max(axis=1, keepdims=True) / 127.0
+        scales[scales == 0] = 1.0
+        q = np.round(vectors / scales).astype(np.int8)
+        # Pack the float32 scale as 4 int8 columns so codes stay one 2-D array
+        return np.hstack([q, scales.astype(np.float32).view(np.int8)])
+
+    def scores(self, codes, query):
+        q, scales = codes[:, :-4], codes[:, -4:].copy().view(np.float32)[:, 0]
+        return (q.astype(np.float32) @ query) * scales
+
+    def decode(self, codes):
+        q, scales = codes[:, :-4], codes[:, -4:].copy().view(np.float32)
+        return q.astype(np.float32) * scales
+
+    def state(self):
+        return {}
+
+    def load_state(self, arrays):
+        pass
+
+
+class PQCodec:
+    """
+    Product quantization: vectors are split into m sub-vectors, each replaced
+    by the index of its nearest of 256 trained centroids (m bytes per vector).
+    Scores use per-query lookup tables (asymmetric distance computation).
+    """
+    name = "pq"
+    needs_training = True
+
+    def __init__(self, m=64, n_centroids=256, iterations=15, seed=0):
+        self.m = m
+        self.n_centroids = n_centroids
+        self.iterations = iterations
+        self.seed = seed
+        self.codebooks = None  # (m, n_centroids, sub_dim)
+
+    @property
+    def trained(self):
+        return self.codebooks is not None
+
+    def train(self, vectors):
+        dim = vectors.shape[1]
+        if dim % self.m:
+            raise ValueError(f"PQ needs the dimension ({dim}) to be divisible by m ({self.m})")
+        sub_dim = dim // self.m
+        rng = np.random.default_rng(self.seed)
+        k = min(self.n_centroids, len(vectors))
+        books = np.empty((self.m, k, sub_dim), dtype=np.float32)
+        for j in range(self.m):
+            sub = vectors[:, j * sub_dim:(j + 1) * sub_dim]
+            books[j] = kmeans(sub, k, self.iterations, rng)
+        self.codebooks = books
+
+    def encode(self, vectors):
+        m, k, sub_dim = self.codebooks.shape
+        codes = np.empty((len(vectors), m), dtype=np.uint8)
+        for j in range(m):
+            sub = vectors[:, j * sub_dim:(j + 1) * sub_dim]
+            codes[:, j] = nearest(sub, self.codebooks[j])
+        return codes
+
+    def scores(self, codes, query):
+        m, _, sub_dim = self.codebooks.shape
+        tables = np.einsum("mkd,md->mk", self.codebooks, query.reshape(m, sub_dim))
+        return tables[np.arange(m), codes].sum(axis=1)
+
+    def decode(self, codes):
+        m = self.codebooks.shape[0]
+        return self.codebooks[np.arange(m), codes].reshape(len(codes), -1)
+
+    def state(self):
+        return {"codebooks": self.codebooks}
+
+    def load_state(self, arrays):
+        self.codebooks = arrays.get("codebooks")
+
+
+def nearest(vectors, centroids):
+    # argmin ||v - c||^2 == argmax (v.c - |c|^2 / 2)
+    return np.argmax(vectors @ centroids.T - 0.5 * (centroids ** 2).sum(axis=1), axis=1)
+
+
+def kmeans(vectors, k, iterations, rng):
+    centroids = vectors[rng.choice(len(vectors), k, replace=False)].copy()
+    for _ in range(iterations):
+        assign = nearest(vectors, centroids)
+        counts = np.bincount(assign, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, vectors)
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        # Re-seed empty clusters from random points
+        if empty.any():
+            centroids[empty] = vectors[rng.integers(len(vectors), size=int(empty.sum()))]
+    return centroids
+
+
+CODECS = {"float16": Float16Codec, "int8": Int8Codec, "pq": PQCodec}
+
+
+def make_codec(name, **kwargs):
+    try:
+        return CODECS[name](**kwargs)
+    except KeyError:
+        raise ValueError(f"Unknown vector storage {name!r}; expected one of {sorted(CODECS)}")
+
+
+class QuantizedIndex:
+    """
+    Quantized copy of a collection's vectors: ids, owning file paths and chunk
+    types, the file content hash each path was indexed at, and the codes.
+    Saved as .npz/.json files in a directory next to the codebase's manifest.
+    """
+    TRAIN_SAMPLE = 20000
+    FLAT_SCOPE_ROWS = 20000  # scopes this small are scanned in full even with partitions
+
+    def __init__(self, codec, ivf=None):
+        self.codec = codec
+        self.ivf = ivf  # optional ivf.IVFPartitions
+        self.ids = []
+        self.paths = []
+        self.types = []
+        self.file_hashes = {}
+        self._codes = []     # list of 2-D arrays, concatenated lazily
+        self._untrained = [] # raw vectors waiting for PQ training
+        self._tables = None  # (unique paths, row -> path number, type per row) for rows_where
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def codes(self):
+        self._finalize()
+        if len(self._codes) > 1:
+            self._codes = [np.concatenate(self._codes)]
+        return self._codes[0] if self._codes else None
+
+    @property
+    def nbytes(self):
+        codes = self.codes
+        return 0 if codes is None else codes.nbytes
+
+    def _finalize(self):
+        if not self._untrained:
+            return
+        raw = np.concatenate(self._untrained)
+        self._untrained = []
+        if not self.codec.trained:
+            sample = raw
+            if len(raw) > self.TRAIN_SAMPLE:
+                sample = raw[np.random.default_rng(0).choice(len(raw), self.TRAIN_SAMPLE, replace=False)]
+            self.codec.train(sample)
+        self._codes.append(self.codec.encode(raw))
+
+    def add(self, ids, paths, vectors, types=None):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if not len(vectors):
+            return
+        with self._lock:
+            self.ids.extend(ids)
+            self.paths.extend(paths)
+            self.types.extend(types if types is not None else [""] * len(ids))
+            self._tables = None
+            if self.ivf is not None:
+                self.ivf.extend(vectors)
+            if self.codec.needs_training and not self.codec.trained:
+                self._untrained.append(vectors)
+            else:
+                self._finalize()
+                self._codes.append(self.codec.encode(vectors))
+
+    def remove_paths(self, paths):
+        paths = set(paths)
+        if not paths:
+            return
+        with self._lock:
+            for path in paths:
+                self.file_hashes.pop(path, None)
+            keep = [i for i, p in enumerate(self.paths) if p not in paths]
+            if len(keep) == len(self.ids):
+                return
+            codes = self.codes
+            self.ids = [self.ids[i] for i in keep]
+            self.paths = [self.paths[i] for i in keep]
+            self.types = [self.types[i] for i in keep]
+            self._codes = [codes[keep]] if keep else []
+            self._tables = None
+            if self.ivf is not None:
+                self.ivf.keep(keep)
+
+    def rows_where(self, path_ok=None, chunk_types=None):
+        """
+        Boolean mask over rows: path_ok(path) is true and the chunk type is in
+        chunk_types. path_ok is called once per distinct path, not per row.
+        """
+        with self._lock:
+            if self._tables is None:
+                unique, inverse = np.unique(np.asarray(self.paths, dtype=object).astype(str), return_inverse=True)
+                self._tables = (unique, inverse, np.asarray(self.types, dtype=str))
+            unique, inverse, types = self._tables
+            mask = np.ones(len(self.ids), dtype=bool)
+            if path_ok is not None:
+                keep = np.fromiter((path_ok(p) for p in unique), dtype=bool, count=len(unique))
+                mask &= keep[inverse]
+            if chunk_types:
+                mask &= np.isin(types, list(chunk_types))
+            return mask
+
+    def maintain(self):
+        """(Re)train the IVF partitions once the index is big enough or has outgrown them."""
+        with self._lock:
+            codes = self.codes
+            if self.ivf is None or codes is None or not self.ivf.needs_training(len(codes)):
+                return False
+            self.ivf.train(lambda rows: self.codec.decode(codes[rows]))
+            return True
+
+    def search(self, query, k, allowed=None, probes=None):
+        """
+        Return [(id, approximate score)] for the k best codes, among the allowed
+        rows if given. With trained IVF partitions only the rows of the probes
+        nearest lists are scored; small scopes are still scanned in full.
+        """
+        query = np.asarray(query, dtype=np.float32)
+        with self._lock:
+            codes = self.codes
+            if codes is None:
+                return []
+            rows = None
+            allowed_rows = np.flatnonzero(allowed) if allowed is not None else None
+            if (self.ivf is not None and self.ivf.trained and probes
+                    and (allowed_rows is None or len(allowed_rows) > self.FLAT_SCOPE_ROWS)):
+                rows = self.ivf.candidates(query, probes)
+                if allowed is not None:
+                    rows = rows[allowed[rows]]
+            elif allowed_rows is not None:
+                rows = allowed_rows
+            scores = self.codec.scores(codes if rows is None else codes[rows], query)
+            k = min(k, len(scores))
+            if k <= 0:
+                return []
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            if rows is not None:
+                return [(self.ids[rows[i]], float(scores[i])) for i in top]
+            return [(self.ids[i], float(scores[i])) for i in top]
+
+    def save(self, directory):
+        with self._lock:
+            os.makedirs(directory, exist_ok=True)
+            codes = self.codes
+            arrays = {"codes": codes if codes is not None else np.empty((0, 0))}
+            arrays.update({k: v for k, v in self.codec.state().items() if v is not None})
+            if self.ivf is not None:
+                arrays.update(self.ivf.state())
+            tmp = os.path.join(directory, "vectors.tmp.npz")
+            np.savez(tmp, **arrays)
+            os.replace(tmp, os.path.join(directory, "vectors.npz"))
+            meta = {
+                "codec": self.codec.name,
+                "ids": self.ids,
+                "paths": self.paths,
+                "types": self.types,
+                "file_hashes": self.file_hashes,
+            }
+            tmp = os.path.join(directory, "vectors.tmp.json")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            os.replace(tmp, os.path.join(directory, "vectors.json"))
+
+    @classmethod
+    def load(cls, directory, codec, ivf=None):
+        """Load a saved index, or return an empty one if missing or built with another codec."""
+        index = cls(codec, ivf)
+        try:
+            with open(os.path.join(directory, "vectors.json"), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta["codec"] != codec.name or "types" not in meta:
+                # Another codec, or saved before chunk types were kept: start
+                # empty so sync_vector_index re-reads every file
+                return index
+            with np.load(os.path.join(directory, "vectors.npz")) as data:
+                arrays = {k: data[k] for k in data.files}
+        except (OSError, ValueError, KeyError):
+            return index
+        codec.load_state(arrays)
+        index.ids = meta["ids"]
+        index.paths = meta["paths"]
+        index.types = meta["types"]
+        index.file_hashes = meta["file_hashes"]
+        if len(index.ids):
+            index._codes = [arrays["codes"]]
+        if ivf is not None:
+            ivf.load_state(arrays, len(index.ids))
+        return index
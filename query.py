@@ -1,27 +1,38 @@
 import chromadb
 from openai import OpenAI
-from config import OPENAI_API_KEY, CHROMA_DB_PATH
-from embedding_utils import build_index
+from config import OPENAI_API_KEY, EDIT_FORMAT
+from codebases import collection_name, default_root, get_client
+from embedding_utils import embed_query
+from vector_search import query_collection
+from docstore import resolve_documents
 import json
+import logging
 from collections import defaultdict
+import tracing
+
+logger = logging.getLogger(__name__)
 
 client = OpenAI(api_key=OPENAI_API_KEY)
-chroma_client = chromadb.PersistentClient(path=CHROMA_DB_PATH)
-
-try:
-    collection = chroma_client.get_collection(name="codebase")
-except chromadb.errors.NotFoundError:
-    raise RuntimeError("No collection found. Run build_index() first.")
-
-def search_context(query, top_k=5):
-    query_embedding = client.embeddings.create(
-        model="text-embedding-3-small",
-        input=query
-    ).data[0].embedding
-
-    results = collection.query(query_embeddings=[query_embedding], n_results=top_k)
-    print("Search results documents:", results["documents"])
-    print("Search results metadatas:", results["metadatas"])
+
+
+def active_collection(root=None):
+    """
+    The collection queries should use right now. Looked up on every call: a
+    rebuild swaps in a new index version when it completes.
+    """
+    try:
+        return get_client().get_collection(name=collection_name(root or default_root()))
+    except (chromadb.errors.NotFoundError, ValueError):
+        raise RuntimeError("No collection found. Run build_index() first.")
+
+
+def search_context(query, top_k=5, scope=None):
+    """Top chunks for query, limited to a vector_search.Scope if given."""
+    collection = active_collection()
+    query_embedding = embed_query(query, collection)
+
+    results = query_collection(collection, default_root(), query_embedding, n_results=top_k, scope=scope)
+    logger.debug("Search results metadatas: %s", results["metadatas"])
     # results["documents"] is a list of lists (one per query), so flatten it.
     docs = [doc for sublist in results["documents"] for doc in sublist]
     metas = [meta for sublist in results["metadatas"] for meta in sublist]
@@ -29,20 +40,17 @@ def search_context(query, top_k=5):
     # distances = [dist for sublist in results.get("distances", []) for dist in sublist]
     return docs, metas
 
-def choose_chunks_by_instruction(instruction, max_chunks=5):
-    # Get embedding for instruction
-    instruction_embedding = client.embeddings.create(
-        model="text-embedding-3-small",
-        input=instruction
-    ).data[0].embedding
+def choose_chunks_by_instruction(instruction, max_chunks=5, scope=None):
+    collection = active_collection()
 
-    chroma_client = chromadb.PersistentClient(path=CHROMA_DB_PATH)
-    collection = chroma_client.get_collection(name="codebase")
+    # Get embedding for instruction
+    instruction_embedding = embed_query(instruction, collection)
 
-    results = collection.query(
-        query_embeddings=[instruction_embedding],
+    results = query_collection(
+        collection, default_root(), instruction_embedding,
         n_results=max_chunks,
-        include=['documents', 'metadatas']
+        include=['documents', 'metadatas'],
+        scope=scope
     )
 
     chunks = []
@@ -64,7 +72,7 @@ def group_chunks_by_file(chunks):
 def prepare_prompt_with_chunks(user_request, metas, collection, chunk_ids, current_file_path):
     chunked_docs = []
     for chunk_id in chunk_ids:
-        results = collection.get(ids=[str(chunk_id)])
+        results = resolve_documents(collection.get(ids=[str(chunk_id)], include=['documents', 'metadatas']))
         if not results or not results['documents']:
             continue
 
@@ -101,12 +109,14 @@ def choose_files_by_summary(instruction, metas, max_files=5):
     Please rank the files by relevance to the instruction and return the top {max_files} paths as a JSON list.
     """
 
-    print(f"Instruction passed to search: {instruction}")
+    logger.debug("Instruction passed to search: %s", instruction)
 
-    response = client.chat.completions.create(
-        model="gpt-5-nano",
-        messages=[{"role": "user", "content": prompt}],
-    )
+    with tracing.span("ranking", files=len(metas), bytes=len(prompt)) as s:
+        response = client.chat.completions.create(
+            model="gpt-5-nano",
+            messages=[{"role": "user", "content": prompt}],
+        )
+        tracing.record_usage(s, "gpt-5-nano", response.usage)
     try:
         ranked_paths = json.loads(response.choices[0].message.content)
 
@@ -129,7 +139,30 @@ def choose_files_by_summary(instruction, metas, max_files=5):
         print("Ranking parse failed:", e)
         return metas[:max_files]
 
-def build_prompt(user_request, chunked_docs, current_file_path):
+CHUNK_INSTRUCTIONS = (
+    "You can modify any [TARGET] chunks across multiple files.\n"
+    "For each modified chunk, return it with the file path included in this exact format:\n\n"
+    "--- FILE: <file_path> ---\n"
+    "--- CHUNK START: lines <start_line>-<end_line> ---\n"
+    "<updated code here>\n"
+    "--- CHUNK END ---\n\n"
+    "Do NOT include explanations, comments outside the code, or code fences."
+)
+
+SEARCH_REPLACE_INSTRUCTIONS = (
+    "You can modify any [TARGET] chunks across multiple files.\n"
+    "Return only the lines that change, as search/replace blocks in this exact format:\n\n"
+    "--- FILE: <file_path> ---\n"
+    "<<<<<<< SEARCH\n"
+    "<existing lines, copied exactly, with 1-2 unchanged lines of context>\n"
+    "=======\n"
+    "<replacement lines>\n"
+    ">>>>>>> REPLACE\n\n"
+    "Use one block per separate change; the SEARCH text must match only one place in the file.\n"
+    "Do NOT include explanations, comments outside the code, or code fences."
+)
+
+def build_prompt(user_request, chunked_docs, current_file_path, edit_format=EDIT_FORMAT):
     sections = []
     for chunk in chunked_docs:
         meta = chunk.get('metadata', {})
@@ -148,15 +181,7 @@ def build_prompt(user_request, chunked_docs, current_file_path):
     return [
         {
             "role": "system",
-            "content": (
-                "You can modify any [TARGET] chunks across multiple files.\n"
-                "For each modified chunk, return it with the file path included in this exact format:\n\n"
-                "--- FILE: <file_path> ---\n"
-                "--- CHUNK START: lines <start_line>-<end_line> ---\n"
-                "<updated code here>\n"
-                "--- CHUNK END ---\n\n"
-                "Do NOT include explanations, comments outside the code, or code fences."
-            )
+            "content": SEARCH_REPLACE_INSTRUCTIONS if edit_format == "search_replace" else CHUNK_INSTRUCTIONS
         },
         {
             "role": "user",
@@ -1,23 +1,71 @@
 import os
 import ast
-from config import EXCLUDE_DIRS
+import logging
+import re
+from config import EXCLUDE_DIRS, MAX_FILE_BYTES
 
-def scan_files(root_dir):
-    files = []
-    for dirpath, _, filenames in os.walk(root_dir):
+logger = logging.getLogger(__name__)
+
+# Header comments that code generators put at the top of files nobody edits
+# by hand: "@generated" (Meta and others), "Code generated ... DO NOT EDIT."
+# (the Go convention, also used by protoc plugins) and "<auto-generated>" (.NET)
+GENERATED_HEADER = re.compile(
+    r"^\s*(?:#|//|/\*+|\*|<!--)\s*"
+    r"(?:@generated\b|Code generated .* DO NOT EDIT\.|<auto-generated\b)"
+)
+GENERATED_HEADER_LINES = 10
+
+def is_generated_file(path, head_bytes=2048):
+    """A generator header comment in the first few lines, or minified-length lines."""
+    try:
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            head = f.read(head_bytes)
+    except OSError:
+        return False
+    lines = head.splitlines()
+    if any(GENERATED_HEADER.match(line) for line in lines[:GENERATED_HEADER_LINES]):
+        return True
+    return len(head) >= head_bytes and len(lines) <= 2
+
+def iter_files(root_dir, max_bytes=MAX_FILE_BYTES, skip_generated=True):
+    """
+    Lazily yield indexable files under root_dir. Excluded directories are
+    pruned instead of walked, and oversized or generated files are skipped.
+    """
+    if any(skip in root_dir for skip in EXCLUDE_DIRS):
+        return
+    for dirpath, dirnames, filenames in os.walk(root_dir):
         # Skip common irrelevant folders
-        if any(skip in dirpath for skip in EXCLUDE_DIRS):
-            continue
+        dirnames[:] = [d for d in dirnames if not any(skip in os.path.join(dirpath, d) for skip in EXCLUDE_DIRS)]
         for f in filenames:
-            if f.endswith((".py", ".js", ".ts", ".md")):
-                files.append(os.path.join(dirpath, f))
-    return files
+            if not f.endswith((".py", ".js", ".ts", ".md")):
+                continue
+            path = os.path.join(dirpath, f)
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                continue
+            if max_bytes and size > max_bytes:
+                logger.info("Skipping oversized file (%d bytes): %s", size, path)
+                continue
+            if skip_generated and is_generated_file(path):
+                logger.warning("Skipping generated file: %s", path)
+                continue
+            yield path
+
+def scan_files(root_dir):
+    return list(iter_files(root_dir))
 
-def chunk_file_by_definitions(path):
+def parse_file(path):
     with open(path, "r", encoding="utf-8", errors="ignore") as f:
         source = f.read()
+    return source, ast.parse(source)
 
-    tree = ast.parse(source)
+def chunk_file_by_definitions(path, source=None, tree=None):
+    """Split a file into function chunks and the loose code between them. Pass
+    source and tree if the file is already parsed."""
+    if source is None or tree is None:
+        source, tree = parse_file(path)
     chunks = []
     def_spans = []
 
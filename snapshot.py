@@ -0,0 +1,215 @@
+"""
+Export an indexed codebase to a portable snapshot, or import one to start
+with a warm index.
+
+    python snapshot.py export <codebase root> <snapshot.zip> [--float16]
+    python snapshot.py import <snapshot.zip> <codebase root>
+"""
+import argparse
+import io
+import json
+import os
+import time
+import zipfile
+from collections import defaultdict
+import numpy as np
+from codebases import get_client, collection_name, manifest_path, touch, begin_version
+from embedders import make_embedder, collection_embedder
+from embedding_utils import build_index, load_cache, save_cache
+from config import DOCUMENT_STORAGE
+from manifest import IndexManifest, file_hash, text_hash
+from docstore import resolve_documents, chunk_refs, blob_store
+
+SNAPSHOT_VERSION = 1
+PAGE_SIZE = 1000
+
+# Chunk metadata stored column by column; path is stored relative to the root
+COLUMNS = ("path", "chunk", "summary", "symbols", "chunk_type", "chunk_name", "start_line", "end_line")
+
+
+def to_relative(path, root):
+    return os.path.relpath(path, root).replace(os.sep, "/")
+
+
+def to_local(rel, root):
+    return os.path.join(root, *rel.split("/"))
+
+
+def export_snapshot(root, out_path, float16=False):
+    root = os.path.abspath(root)
+    collection = get_client().get_collection(name=collection_name(root))
+    manifest = IndexManifest(manifest_path(root))
+    if not manifest.complete:
+        raise RuntimeError(f"The index for {root} is not complete; run build_index first.")
+
+    columns = {name: [] for name in COLUMNS}
+    documents, embeddings = [], []
+    offset = 0
+    while True:
+        page = collection.get(
+            include=["embeddings", "documents", "metadatas"], limit=PAGE_SIZE, offset=offset
+        )
+        resolve_documents(page, root)
+        if not page["ids"]:
+            break
+        for meta, doc, emb in zip(page["metadatas"], page["documents"], page["embeddings"]):
+            for name in COLUMNS:
+                value = meta.get(name, "")
+                columns[name].append(to_relative(value, root) if name == "path" else value)
+            documents.append(doc)
+            embeddings.append(emb)
+        offset += len(page["ids"])
+
+    matrix = np.asarray(embeddings, dtype=np.float16 if float16 else np.float32)
+    files = {
+        to_relative(path, root): {"hash": record["hash"], "chunks": record["chunks"]}
+        for path, record in manifest.files.items()
+    }
+    summaries = {
+        to_relative(path, root): {"summary": entry["summary"], "symbols": entry["symbols"]}
+        for path, entry in load_cache(root).items()
+        if path in manifest.files
+    }
+    embedder = collection_embedder(collection)
+    header = {
+        "version": SNAPSHOT_VERSION,
+        "created": time.time(),
+        "source_root": root,
+        "embedding_provider": embedder.name,
+        "embedding_model": embedder.model,
+        "embedding_dimensions": embedder.dimensions,
+        "dtype": str(matrix.dtype),
+        "chunks": len(documents),
+        "files": len(files),
+    }
+
+    buf = io.BytesIO()
+    np.save(buf, matrix, allow_pickle=False)
+    with zipfile.ZipFile(out_path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("snapshot.json", json.dumps(header, indent=2))
+        zf.writestr("columns.json", json.dumps(columns))
+        zf.writestr("documents.json", json.dumps(documents))
+        zf.writestr("files.json", json.dumps(files))
+        zf.writestr("summaries.json", json.dumps(summaries))
+        # Already dense binary; deflating float noise gains little
+        zf.writestr("embeddings.npy", buf.getvalue(), compress_type=zipfile.ZIP_STORED)
+    print(f"Exported {len(documents)} chunks from {len(files)} files to {out_path}")
+    return header
+
+
+def import_snapshot(snapshot_path, root):
+    """
+    Load a snapshot into root's collection, keeping only files whose content
+    hash matches the local copy, then run an incremental build_index for
+    whatever differs locally. The snapshot is loaded as a new index version,
+    so an existing index stays queryable until that build completes.
+    """
+    root = os.path.abspath(root)
+    with zipfile.ZipFile(snapshot_path) as zf:
+        header = json.loads(zf.read("snapshot.json"))
+        if header["version"] > SNAPSHOT_VERSION:
+            raise RuntimeError(f"Snapshot version {header['version']} is newer than supported ({SNAPSHOT_VERSION}).")
+        # The codebase adopts the snapshot's provider, so it must match what this
+        # machine would build with that provider, or queries would not line up
+        embedder = make_embedder(header.get("embedding_provider", "openai"))
+        if header["embedding_model"] != embedder.model or header["embedding_dimensions"] != embedder.dimensions:
+            raise RuntimeError(
+                f"Snapshot was built with {header['embedding_model']} at {header['embedding_dimensions']} dimensions; "
+                f"this machine uses {embedder.model} at {embedder.dimensions}."
+            )
+        columns = json.loads(zf.read("columns.json"))
+        documents = json.loads(zf.read("documents.json"))
+        files = json.loads(zf.read("files.json"))
+        summaries = json.loads(zf.read("summaries.json"))
+        embeddings = np.load(io.BytesIO(zf.read("embeddings.npy")), allow_pickle=False).astype(np.float32)
+
+    # Only files identical to the local copy can reuse their chunks
+    matching = {}
+    for rel, record in files.items():
+        local = to_local(rel, root)
+        try:
+            if file_hash(local) == record["hash"]:
+                matching[rel] = (local, os.stat(local), record)
+        except OSError:
+            continue
+    print(f"{len(matching)} of {len(files)} snapshot files match the local tree.")
+
+    chroma_client = get_client()
+    version = begin_version(root, chroma_client)
+    collection = chroma_client.create_collection(
+        name=collection_name(root, version), metadata=dict(embedder.describe(), document_storage=DOCUMENT_STORAGE)
+    )
+    manifest = IndexManifest(manifest_path(root, version))
+    manifest.begin(root)
+    touch(root)
+
+    rows = [i for i, rel in enumerate(columns["path"]) if rel in matching]
+    by_reference = DOCUMENT_STORAGE == "reference"
+    refs = {}  # row -> (start_byte, end_byte) in the local file
+    if by_reference:
+        blobs = blob_store(root)
+        rows_by_file = defaultdict(list)
+        for i in rows:
+            rows_by_file[columns["path"][i]].append(i)
+        for rel, file_rows in rows_by_file.items():
+            local = matching[rel][0]
+            with open(local, "r", encoding="utf-8", errors="ignore") as f:
+                source = f.read()
+            chunks = [{"code": documents[i], "start": columns["start_line"][i]} for i in file_rows]
+            refs.update(zip(file_rows, chunk_refs(local, source, chunks)))
+    for start in range(0, len(rows), PAGE_SIZE):
+        batch = rows[start:start + PAGE_SIZE]
+        metadatas, ids = [], []
+        for i in batch:
+            meta = {name: columns[name][i] for name in COLUMNS}
+            meta["path"] = matching[meta["path"]][0]
+            metadatas.append(meta)
+            ids.append(f"{meta['path']}-{meta['chunk']}")
+        kwargs = {"documents": [documents[i] for i in batch]}
+        if by_reference:
+            digests = [text_hash(documents[i]) for i in batch]
+            blobs.put_many(zip(digests, kwargs["documents"]))
+            for meta, i, digest in zip(metadatas, batch, digests):
+                meta.update(start_byte=refs[i][0], end_byte=refs[i][1], doc_hash=digest)
+            kwargs = {}
+        collection.add(
+            ids=ids,
+            metadatas=metadatas,
+            embeddings=embeddings[batch].tolist(),
+            **kwargs
+        )
+    manifest.commit_files([
+        (local, st, record["hash"], record["chunks"]) for local, st, record in matching.values()
+    ])
+
+    cache = load_cache(root)
+    for rel, (local, st, _) in matching.items():
+        if rel in summaries:
+            cache[local] = dict(summaries[rel], mtime=st.st_mtime)
+    save_cache(cache, root)
+
+    # The new version is still building, so this resumes it, picks up only what
+    # differs locally and then makes it the active version
+    return build_index(root)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+    exp = sub.add_parser("export", help="write a snapshot of an indexed codebase")
+    exp.add_argument("root")
+    exp.add_argument("out")
+    exp.add_argument("--float16", action="store_true", help="store embeddings as float16 (half the size)")
+    imp = sub.add_parser("import", help="load a snapshot and reindex local differences")
+    imp.add_argument("snapshot")
+    imp.add_argument("root")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_snapshot(args.root, args.out, float16=args.float16)
+    else:
+        import_snapshot(args.snapshot, args.root)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+import pytest
+
+pytest.importorskip("chromadb")
+pytest.importorskip("dotenv")
+
+from docstore import BlobStore
+from manifest import text_hash
+
+
+def test_get_after_another_process_compacts(tmp_path):
+    texts = [f"def f{i}():\n    return {i}\n" * 20 for i in range(10)]
+    writer = BlobStore(str(tmp_path))
+    writer.put_many((text_hash(t), t) for t in texts)
+    reader = BlobStore(str(tmp_path))
+    kept = texts[-1]
+    assert reader.get(text_hash(kept)) == kept
+
+    # Most blobs go dead, so the pack is rewritten and the survivor moves
+    assert writer.compact({text_hash(kept)})
+    assert reader.get(text_hash(kept)) == kept
+    assert reader.get(text_hash(texts[0])) is None
@@ -0,0 +1,83 @@
+import stat
+
+import pytest
+
+from edit import EditConflict, apply_chunks_cross_file, apply_updated_chunks_to_file, write_files_atomic
+from logic import normalize_path
+
+ORIGINAL = "".join(f"line {i}\n" for i in range(1, 11))
+
+
+def chunk(start, end, code, path="f.py", **extra):
+    return dict(file_path=path, start_line=start, end_line=end, code=code, **extra)
+
+
+def test_chunks_use_original_line_numbers():
+    # The first edit grows the file by two lines; the second still refers to
+    # the original line 8
+    merged = apply_updated_chunks_to_file(ORIGINAL, [
+        chunk(8, 8, "eight"),
+        chunk(2, 2, "two\ntwo b\ntwo c"),
+    ])
+    lines = merged.splitlines()
+    assert lines[:5] == ["line 1", "two", "two b", "two c", "line 3"]
+    assert lines[9] == "eight"
+    assert len(lines) == 12
+
+
+def test_final_newline_and_line_endings_are_kept():
+    crlf = "a\r\nb\r\nc"
+    assert apply_updated_chunks_to_file(crlf, [chunk(2, 2, "B")]) == "a\r\nB\r\nc"
+    assert apply_updated_chunks_to_file("a\nb", [chunk(3, 2, "c")]) == "a\nb\nc"
+
+
+def test_overlapping_edits_conflict():
+    with pytest.raises(EditConflict):
+        apply_updated_chunks_to_file(ORIGINAL, [chunk(2, 4, "x"), chunk(4, 5, "y")])
+
+
+def test_identical_duplicate_edits_apply_once():
+    merged = apply_updated_chunks_to_file(ORIGINAL, [chunk(3, 3, "three"), chunk(3, 3, "three")])
+    assert merged.splitlines()[2] == "three"
+    assert len(merged.splitlines()) == 10
+
+
+def test_delete_removes_lines():
+    merged = apply_updated_chunks_to_file(ORIGINAL, [chunk(2, 3, "", delete=True)])
+    assert merged.splitlines()[:2] == ["line 1", "line 4"]
+
+
+def test_cross_file_edits(tmp_path):
+    a, b = tmp_path / "a.py", tmp_path / "b.py"
+    a.write_text(ORIGINAL)
+    b.write_text("x = 1\n")
+    merged = apply_chunks_cross_file([
+        chunk(1, 1, "first", path=str(a)),
+        chunk(1, 1, "x = 2", path=str(b)),
+    ])
+    assert merged[normalize_path(str(a))].startswith("first\nline 2\n")
+    assert merged[normalize_path(str(b))] == "x = 2\n"
+    # Nothing is written until the caller applies the result
+    assert a.read_text() == ORIGINAL
+
+
+def test_write_files_atomic_replaces_and_keeps_mode(tmp_path):
+    script = tmp_path / "run.sh"
+    script.write_text("echo old\n")
+    script.chmod(0o755)
+    other = tmp_path / "new.txt"
+    write_files_atomic({str(script): "echo new\n", str(other): "created\n"})
+    assert script.read_text() == "echo new\n"
+    assert stat.S_IMODE(script.stat().st_mode) == 0o755
+    assert other.read_text() == "created\n"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["new.txt", "run.sh"]
+
+
+def test_write_files_atomic_replaces_nothing_on_failure(tmp_path):
+    good = tmp_path / "good.py"
+    good.write_text("old\n")
+    missing_dir = tmp_path / "missing" / "bad.py"
+    with pytest.raises(OSError):
+        write_files_atomic({str(good): "new\n", str(missing_dir): "x\n"})
+    assert good.read_text() == "old\n"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["good.py"]
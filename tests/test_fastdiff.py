@@ -0,0 +1,81 @@
+import difflib
+import random
+
+from edit import preview_diff
+from fastdiff import SMALL_REGION, diff_opcodes, unified_diff
+
+
+def reference_diff(old, new):
+    return "\n".join(difflib.unified_diff(
+        old.splitlines(), new.splitlines(), lineterm="", fromfile="old", tofile="new"
+    ))
+
+
+def random_edit(rng, lines, edits, alphabet="abcdef"):
+    lines = list(lines)
+    for _ in range(edits):
+        i = rng.randint(0, len(lines))
+        op = rng.random()
+        if op < 0.4 or not lines:
+            lines.insert(i, rng.choice(alphabet))
+        elif op < 0.8:
+            lines.pop(min(i, len(lines) - 1))
+        else:
+            lines[min(i, len(lines) - 1)] = rng.choice(alphabet)
+    return lines
+
+
+def rebuild(a, b, opcodes):
+    out = []
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag == "equal":
+            assert a[i1:i2] == b[j1:j2]
+            out.extend(a[i1:i2])
+        else:
+            out.extend(b[j1:j2])
+    return out
+
+
+def test_preview_diff_matches_difflib_for_small_files():
+    for seed in range(1000):
+        rng = random.Random(seed)
+        old = [rng.choice("abcde") for _ in range(rng.randint(0, 40))]
+        new = random_edit(rng, old, rng.randint(0, 6))
+        old_text, new_text = "\n".join(old), "\n".join(new)
+        assert preview_diff(old_text, new_text) == reference_diff(old_text, new_text), seed
+
+
+def test_preview_diff_repeated_lines():
+    old, new = "e\nc\nc\nd\nd\ne\na", "e\nc\nd\nd\na\ne\na"
+    assert preview_diff(old, new) == reference_diff(old, new)
+
+
+def test_no_changes_gives_empty_diff():
+    assert unified_diff("a\nb\n", "a\nb\n").lines == []
+    assert unified_diff("", "").lines == []
+
+
+def test_large_file_opcodes_rebuild_the_new_text():
+    rng = random.Random(0)
+    old = [f"line {i % 700}" for i in range(3 * SMALL_REGION)]
+    new = random_edit(rng, old, 50, alphabet=["x", "y", "line 5"])
+    assert rebuild(old, new, diff_opcodes(old, new)) == new
+
+
+def test_large_anchorless_region_is_one_replace():
+    old = ["a", "b"] * SMALL_REGION
+    new = ["b", "a"] * SMALL_REGION + ["c"]
+    opcodes = diff_opcodes(old, new)
+    assert opcodes == [("replace", 0, len(old), 0, len(new))]
+    assert rebuild(old, new, opcodes) == new
+
+
+def test_hunk_positions_point_at_the_changes():
+    old = "\n".join(f"line {i}" for i in range(2000))
+    new = old.replace("line 1500\n", "line 1500 changed\n")
+    result = unified_diff(old, new)
+    assert len(result.hunks) == 1
+    row, old_line, new_line = result.hunks[0]
+    assert result.kinds[row] == "hunk"
+    assert (old_line, new_line) == (1497, 1497)
+    assert "-line 1500" in result.lines and "+line 1500 changed" in result.lines
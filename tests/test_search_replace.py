@@ -0,0 +1,119 @@
+import pytest
+
+from edit import (
+    EditMismatch, apply_chunks_cross_file, apply_updated_chunks_to_file, locate_search_block,
+    parse_search_replace, parse_updated_chunks, search_replace_to_chunks,
+)
+
+SOURCE = '''import os
+
+
+def load(path):
+    with open(path) as f:
+        return f.read()
+
+
+class Store:
+    def get(self, key):
+        value = self.items.get(key)
+        return value
+
+    def put(self, key, value):
+        self.items[key] = value
+'''
+
+
+def block(path, search, replace):
+    return f"--- FILE: {path} ---\n<<<<<<< SEARCH\n{search}\n=======\n{replace}\n>>>>>>> REPLACE\n"
+
+
+def apply(edits, source=SOURCE):
+    return apply_updated_chunks_to_file(source, search_replace_to_chunks(source, edits))
+
+
+def edit(search, replace, path="store.py"):
+    return {"file_path": path, "search": search, "replace": replace}
+
+
+def test_parse_assigns_blocks_to_the_preceding_file():
+    text = (
+        "Some explanation first.\n"
+        + block("a.py", "x = 1", "x = 2")
+        + "<<<<<<< SEARCH\ny = 1\n=======\ny = 2\n>>>>>>> REPLACE\n"
+        + block("b.py", "z = 1", "")
+    )
+    assert parse_updated_chunks(text) == [
+        {"file_path": "a.py", "search": "x = 1", "replace": "x = 2"},
+        {"file_path": "a.py", "search": "y = 1", "replace": "y = 2"},
+        {"file_path": "b.py", "search": "z = 1", "replace": ""},
+    ]
+
+
+def test_blocks_before_any_file_header_are_dropped():
+    assert parse_search_replace("<<<<<<< SEARCH\na\n=======\nb\n>>>>>>> REPLACE\n") == []
+
+
+def test_exact_replace():
+    merged = apply([edit("        value = self.items.get(key)", "        value = self.items.get(key, None)")])
+    assert "        value = self.items.get(key, None)\n" in merged
+    assert merged.count("\n") == SOURCE.count("\n")
+
+
+def test_replace_is_reindented_like_the_file():
+    # The model dropped the class indentation on both sides
+    merged = apply([edit(
+        "def put(self, key, value):\n    self.items[key] = value",
+        "def put(self, key, value):\n    self.check(key)\n    self.items[key] = value",
+    )])
+    assert "    def put(self, key, value):\n        self.check(key)\n        self.items[key] = value\n" in merged
+
+
+def test_fuzzy_match_above_threshold():
+    # One small typo in the SEARCH text
+    merged = apply([edit(
+        "def load(path):\n    with open(path) as f:\n        return f.raed()",
+        "def load(path):\n    with open(path, encoding=\"utf-8\") as f:\n        return f.read()",
+    )])
+    assert 'with open(path, encoding="utf-8") as f:' in merged
+
+
+def test_mismatch_below_threshold_lists_every_missing_block():
+    lines = SOURCE.splitlines()
+    unrelated = "def totally_different():\n    pass"
+    assert locate_search_block(lines, unrelated) is None
+    with pytest.raises(EditMismatch) as e:
+        search_replace_to_chunks(SOURCE, [
+            edit(unrelated, "x"),
+            edit("import os", "import sys"),
+            edit("raise NotImplementedError", "pass"),
+        ])
+    message = str(e.value)
+    assert "2 search block(s)" in message
+    assert "totally_different" in message and "NotImplementedError" in message
+
+
+def test_ambiguous_search_is_a_miss():
+    source = "x = 1\ny = 2\nx = 1\n"
+    assert locate_search_block(source.splitlines(), "x = 1") is None
+
+
+def test_empty_replace_deletes():
+    merged = apply([edit("import os\n", "")])
+    assert not merged.startswith("import os")
+
+
+def test_several_appends_go_in_order():
+    merged = apply([
+        edit("", "\ndef first():\n    pass"),
+        edit("import os", "import os\nimport sys"),
+        edit("", "\ndef second():\n    pass\n"),
+    ])
+    assert merged.startswith("import os\nimport sys\n")
+    assert merged.endswith("\n\ndef first():\n    pass\n\ndef second():\n    pass\n")
+
+
+def test_cross_file_search_replace(tmp_path):
+    target = tmp_path / "store.py"
+    target.write_text(SOURCE)
+    merged = apply_chunks_cross_file([edit("import os", "import json", path=str(target))])
+    assert list(merged.values())[0].startswith("import json\n")
@@ -0,0 +1,26 @@
+import sys
+import threading
+
+import tracing
+
+
+def test_span_add_from_many_threads_keeps_every_count():
+    usage = type("Usage", (), {"prompt_tokens": 2, "completion_tokens": 1})
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        span = tracing.Span("summarize", {})
+
+        def worker():
+            for _ in range(20000):
+                tracing.record_usage(span, "gpt-4.1-nano", usage)
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert span.attrs["prompt_tokens"] == 8 * 20000 * 2
+    assert span.attrs["completion_tokens"] == 8 * 20000
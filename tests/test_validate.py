@@ -0,0 +1,14 @@
+import sys
+
+from validate import run_tests
+
+
+def test_run_tests_never_writes_the_real_tree(tmp_path):
+    (tmp_path / "a.py").write_text("x = 1\n")
+    (tmp_path / "b.py").write_text("y = 1\n")
+    script = "open('b.py', 'w').write('clobbered'); import a; assert a.x == 2"
+    command = f'"{sys.executable}" -c "{script}"'
+    result = run_tests(str(tmp_path), {str(tmp_path / "a.py"): "x = 2\n"}, command, 60)
+    assert result["issues"] == []
+    assert (tmp_path / "a.py").read_text() == "x = 1\n"
+    assert (tmp_path / "b.py").read_text() == "y = 1\n"
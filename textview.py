@@ -0,0 +1,223 @@
+import tkinter as tk
+from tkinter import ttk
+
+# Read-only text pane for very large files. It keeps the lines in a Python
+# list and only inserts the visible rows plus a margin into the Text widget,
+# re-rendering when the view scrolls out of that window. Setting a
+# 50k-line file costs the same as setting a 100-line one. VirtualList does
+# the same for file lists.
+
+MARGIN = 200  # rows rendered above and below the visible region
+
+
+class VirtualText(ttk.Frame):
+    def __init__(self, master, height=10, font=None, background="#ffffff", tags=None, **kwargs):
+        super().__init__(master, **kwargs)
+        self.text = tk.Text(self, height=height, font=font, background=background, wrap=tk.NONE)
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self._on_scrollbar)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.text.config(yscrollcommand=self._on_text_scroll, state=tk.DISABLED)
+        for name, options in (tags or {}).items():
+            self.text.tag_configure(name, **options)
+
+        self.lines = []
+        self.kinds = None   # optional tag name per line
+        self.top = 0        # first line shown at the top of the view
+        self._window = None  # (start, stop) of the lines currently in the widget
+        self._rendering = False
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.text.bind(sequence, self._on_wheel)
+        self.text.bind("<Configure>", lambda e: self._render())
+        for key, step in (("<Prior>", -1), ("<Next>", 1)):
+            self.text.bind(key, lambda e, s=step: self.scroll_pages(s) or "break")
+
+    def set_lines(self, lines, kinds=None, top=0):
+        self.lines = lines
+        self.kinds = kinds
+        self._window = None
+        self.see_line(top)
+
+    def set_text(self, text):
+        self.set_lines(text.splitlines())
+
+    def clear(self):
+        self.set_lines([])
+
+    def get_text(self):
+        return "\n".join(self.lines)
+
+    def visible_rows(self):
+        line_height = max(1, int(self.text.tk.call("font", "metrics", self.text.cget("font"), "-linespace")))
+        return max(1, self.text.winfo_height() // line_height)
+
+    def see_line(self, line):
+        """Scroll so that line (0-based) is at the top of the view."""
+        self.top = max(0, min(line, len(self.lines) - 1)) if self.lines else 0
+        self._render()
+
+    def scroll_pages(self, pages):
+        self.see_line(self.top + pages * self.visible_rows())
+
+    def _render(self):
+        start = max(0, self.top - MARGIN)
+        stop = min(len(self.lines), self.top + self.visible_rows() + MARGIN)
+        self._rendering = True
+        try:
+            if (start, stop) != self._window:
+                self._window = (start, stop)
+                self.text.config(state=tk.NORMAL)
+                self.text.delete("1.0", tk.END)
+                self.text.insert("1.0", "\n".join(self.lines[start:stop]))
+                if self.kinds:
+                    for row, kind in enumerate(self.kinds[start:stop], 1):
+                        if kind:
+                            self.text.tag_add(kind, f"{row}.0", f"{row}.end")
+                self.text.config(state=tk.DISABLED)
+            self.text.yview_moveto((self.top - start) / max(1, stop - start))
+        finally:
+            self._rendering = False
+        self._update_scrollbar()
+
+    def _update_scrollbar(self):
+        total = max(1, len(self.lines))
+        first = self.top / total
+        self.scrollbar.set(first, min(1.0, first + self.visible_rows() / total))
+
+    def _on_text_scroll(self, first, last):
+        # The Text widget scrolled itself (keys, selection drag); map its
+        # position in the window back to a file line
+        if self._rendering or not self.lines:
+            return
+        if self._window is None:
+            return
+        start, stop = self._window
+        top = start + int(float(first) * (stop - start))
+        if top != self.top:
+            self.top = top
+            near_top = start > 0 and top - start < MARGIN // 4
+            near_bottom = stop < len(self.lines) and stop - top < self.visible_rows() + MARGIN // 4
+            if near_top or near_bottom:
+                self._render()
+            else:
+                self._update_scrollbar()
+
+    def _on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self.see_line(int(float(amount) * len(self.lines)))
+        elif unit == "pages":
+            self.scroll_pages(int(amount))
+        else:
+            self.see_line(self.top + int(amount))
+
+    def _on_wheel(self, event):
+        if getattr(event, "num", None) == 4 or getattr(event, "delta", 0) > 0:
+            step = -3
+        else:
+            step = 3
+        self.see_line(self.top + step)
+        return "break"
+
+
+class VirtualList(ttk.Frame):
+    """
+    Single-selection list over any number of items that only puts the visible
+    rows into its Listbox. on_select(index) is called with the index into the
+    items when the user picks a row.
+    """
+    def __init__(self, master, height=8, on_select=None, **listbox_options):
+        super().__init__(master)
+        self.listbox = tk.Listbox(self, height=height, exportselection=False, **listbox_options)
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self._on_scrollbar)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.on_select = on_select
+
+        self.items = []
+        self.top = 0
+        self.selected = None
+        self.listbox.bind("<<ListboxSelect>>", self._on_listbox_select)
+        self.listbox.bind("<Configure>", lambda e: self._render())
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.listbox.bind(sequence, self._on_wheel)
+        for key, step in (("<Up>", -1), ("<Down>", 1)):
+            self.listbox.bind(key, lambda e, s=step: self._move(s) or "break")
+        for key, step in (("<Prior>", -1), ("<Next>", 1)):
+            self.listbox.bind(key, lambda e, s=step: self._move(s * self.visible_rows()) or "break")
+
+    def set_items(self, items):
+        self.items = items
+        self.top = 0
+        self.selected = None
+        self._render()
+
+    def get(self, index):
+        return self.items[index]
+
+    def __len__(self):
+        return len(self.items)
+
+    def visible_rows(self):
+        line_height = int(self.listbox.tk.call("font", "metrics", self.listbox.cget("font"), "-linespace")) + 1
+        height = self.listbox.winfo_height()
+        if height <= 1:
+            return int(self.listbox.cget("height"))
+        return max(1, height // line_height)
+
+    def select(self, index, notify=True):
+        """Select items[index], scrolling it into view."""
+        if not self.items:
+            return
+        index = max(0, min(index, len(self.items) - 1))
+        self.selected = index
+        self.see(index)
+        if notify and self.on_select:
+            self.on_select(index)
+
+    def see(self, index):
+        rows = self.visible_rows()
+        if index < self.top:
+            self.top = index
+        elif index >= self.top + rows:
+            self.top = index - rows + 1
+        self._render()
+
+    def _scroll_to(self, top):
+        self.top = max(0, min(top, len(self.items) - self.visible_rows()))
+        self._render()
+
+    def _render(self):
+        rows = self.visible_rows()
+        self.top = max(0, min(self.top, len(self.items) - rows))
+        self.listbox.delete(0, tk.END)
+        window = self.items[self.top:self.top + rows + 1]
+        if window:
+            self.listbox.insert(tk.END, *window)
+        if self.selected is not None and self.top <= self.selected < self.top + len(window):
+            self.listbox.selection_set(self.selected - self.top)
+        total = max(1, len(self.items))
+        self.scrollbar.set(self.top / total, min(1.0, (self.top + rows) / total))
+
+    def _on_listbox_select(self, event):
+        sel = self.listbox.curselection()
+        if sel and self.top + sel[0] != self.selected:
+            self.select(self.top + sel[0])
+
+    def _move(self, step):
+        self.select(step if self.selected is None else self.selected + step)
+
+    def _on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self._scroll_to(int(float(amount) * len(self.items)))
+        elif unit == "pages":
+            self._scroll_to(self.top + int(amount) * self.visible_rows())
+        else:
+            self._scroll_to(self.top + int(amount))
+
+    def _on_wheel(self, event):
+        if getattr(event, "num", None) == 4 or getattr(event, "delta", 0) > 0:
+            step = -3
+        else:
+            step = 3
+        self._scroll_to(self.top + step)
+        return "break"
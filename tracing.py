@@ -0,0 +1,200 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Estimated USD per 1M tokens (input, output); used for span cost estimates only
+MODEL_PRICES = {
+    "text-embedding-3-small": (0.02, 0.0),
+    "gpt-4.1-nano": (0.10, 0.40),
+    "gpt-5-nano": (0.05, 0.40),
+    "gpt-5-mini": (0.25, 2.00),
+}
+
+RECENT_TRACES = 20
+
+_local = threading.local()
+_recent = deque(maxlen=RECENT_TRACES)
+_recent_lock = threading.Lock()
+# Worker threads may add to a span they share (e.g. summary batches); one lock
+# for all spans keeps them small, and the updates it guards are tiny
+_attrs_lock = threading.Lock()
+
+
+class Span:
+    __slots__ = ("name", "start", "end", "thread", "attrs")
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.start = time.perf_counter()
+        self.end = None
+        self.thread = threading.get_ident()
+        self.attrs = attrs
+
+    @property
+    def duration_ms(self):
+        return ((self.end or time.perf_counter()) - self.start) * 1000.0
+
+    def add(self, **attrs):
+        """Accumulate numeric attributes (bytes, tokens, cache_hits, cost_usd...)."""
+        with _attrs_lock:
+            for key, value in attrs.items():
+                self.attrs[key] = self.attrs.get(key, 0) + value
+
+    def set(self, **attrs):
+        with _attrs_lock:
+            self.attrs.update(attrs)
+
+
+class Trace:
+    """The spans recorded for one request (a Generate, a prefetch, an index build)."""
+    def __init__(self, name):
+        self.name = name
+        self.wall_start = time.time()
+        self.start = time.perf_counter()
+        self.end = None
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def adopt(self, other, **attrs):
+        """Include another trace's spans, e.g. a prefetch this request reused."""
+        with self._lock:
+            for span in other.spans:
+                span.attrs.update(attrs)
+                self.spans.append(span)
+
+    @property
+    def duration_ms(self):
+        return ((self.end or time.perf_counter()) - self.start) * 1000.0
+
+    def breakdown(self):
+        """Per stage totals in first-seen order: name, calls, ms and summed attributes."""
+        rows = {}
+        for span in list(self.spans):
+            row = rows.setdefault(span.name, {"name": span.name, "calls": 0, "ms": 0.0})
+            row["calls"] += 1
+            row["ms"] += span.duration_ms
+            for key, value in span.attrs.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    row[key] = row.get(key, 0) + value
+        return list(rows.values())
+
+    def total(self, key):
+        return sum(span.attrs.get(key, 0) for span in self.spans)
+
+    def to_records(self):
+        return [
+            {
+                "trace": self.name,
+                "span": span.name,
+                "start_ms": round((span.start - self.start) * 1000.0, 3),
+                "duration_ms": round(span.duration_ms, 3),
+                "thread": span.thread,
+                **span.attrs,
+            }
+            for span in self.spans
+        ]
+
+    def export_jsonl(self, path):
+        with open(path, "a", encoding="utf-8") as f:
+            for record in self.to_records():
+                f.write(json.dumps(record) + "\n")
+
+    def export_chrome(self, path):
+        """Chrome trace event format; open in chrome://tracing or Perfetto."""
+        base_us = self.wall_start * 1e6
+        events = [
+            {
+                "name": span.name,
+                "cat": self.name,
+                "ph": "X",
+                "ts": base_us + (span.start - self.start) * 1e6,
+                "dur": span.duration_ms * 1000.0,
+                "pid": os.getpid(),
+                "tid": span.thread,
+                "args": span.attrs,
+            }
+            for span in self.spans
+        ]
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+
+def current_trace():
+    return getattr(_local, "trace", None)
+
+
+@contextmanager
+def trace(name):
+    """
+    Collect spans started on this thread into a new Trace. If a trace is already
+    active on this thread, spans keep going to it instead.
+    """
+    existing = current_trace()
+    if existing is not None:
+        yield existing
+        return
+    t = Trace(name)
+    _local.trace = t
+    try:
+        yield t
+    finally:
+        _local.trace = None
+        t.end = time.perf_counter()
+        with _recent_lock:
+            _recent.append(t)
+
+
+@contextmanager
+def attach(t):
+    """Record this thread's spans into t, e.g. in a worker started for t's request."""
+    previous = current_trace()
+    _local.trace = t
+    try:
+        yield t
+    finally:
+        _local.trace = previous
+
+
+@contextmanager
+def span(name, **attrs):
+    """Time a stage. Outside any trace() the span is simply discarded."""
+    s = Span(name, attrs)
+    try:
+        yield s
+    finally:
+        s.end = time.perf_counter()
+        t = current_trace()
+        if t is not None:
+            t.add(s)
+
+
+def record_usage(s, model, usage):
+    """Add token counts and estimated cost from an OpenAI usage object to span s."""
+    if usage is None:
+        return
+    prompt = getattr(usage, "prompt_tokens", 0) or 0
+    completion = getattr(usage, "completion_tokens", 0) or 0
+    price_in, price_out = MODEL_PRICES.get(model, (0.0, 0.0))
+    s.add(
+        prompt_tokens=prompt,
+        completion_tokens=completion,
+        cost_usd=(prompt * price_in + completion * price_out) / 1e6,
+    )
+
+
+def recent_traces(name=None):
+    with _recent_lock:
+        traces = list(_recent)
+    return [t for t in traces if name is None or t.name == name]
+
+
+def last_trace(name=None):
+    traces = recent_traces(name)
+    return traces[-1] if traces else None
@@ -0,0 +1,318 @@
+import ast
+import multiprocessing
+import os
+import re
+import shlex
+import shutil
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Checks run on merged code before it is applied: each changed file is
+# compiled, its imports of project modules are resolved against what those
+# modules define (the merged version where the change touches them), and
+# names the change removes are looked up in the dependency graph for files
+# still using them. An optional test command runs against a scratch copy of
+# the tree with the change written in. Files are checked in parallel on a
+# process pool and each result is reported as soon as it is ready.
+
+EXCLUDE_FROM_COPY = (".git", "node_modules", ".venv", "venv", "__pycache__", ".pytest_cache")
+TEST_OUTPUT_LINES = 30  # tail of the test output kept in the report
+
+_names_cache = {}  # path -> (mtime, top-level names), per worker process
+
+IDENTIFIER_RE = re.compile(r"[A-Za-z_]\w*")
+
+
+def issue(path, line, check, message, severity="error"):
+    return {"path": path, "line": line, "check": check, "message": message, "severity": severity}
+
+
+def _top_level_statements(body):
+    """Module-level statements, including those nested in if/try/with blocks."""
+    for node in body:
+        yield node
+        if isinstance(node, (ast.If, ast.Try, ast.With, ast.For, ast.While)):
+            for field in ("body", "orelse", "finalbody"):
+                yield from _top_level_statements(getattr(node, field, []))
+            for handler in getattr(node, "handlers", []):
+                yield from _top_level_statements(handler.body)
+
+
+def _targets(node):
+    if isinstance(node, ast.Name):
+        yield node.id
+    elif isinstance(node, (ast.Tuple, ast.List)):
+        for elt in node.elts:
+            yield from _targets(elt)
+    elif isinstance(node, ast.Starred):
+        yield from _targets(node.value)
+
+
+def top_level_names(tree):
+    """
+    Names a module binds at top level, or None when they can't be known
+    statically (a star import or a module-level __getattr__).
+    """
+    names = set()
+    for node in _top_level_statements(tree.body):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            if node.name == "__getattr__":
+                return None
+            names.add(node.name)
+        elif isinstance(node, ast.Assign):
+            for target in node.targets:
+                names.update(_targets(target))
+        elif isinstance(node, (ast.AnnAssign, ast.AugAssign)):
+            names.update(_targets(node.target))
+        elif isinstance(node, ast.Import):
+            for alias in node.names:
+                names.add(alias.asname or alias.name.split(".")[0])
+        elif isinstance(node, ast.ImportFrom):
+            for alias in node.names:
+                if alias.name == "*":
+                    return None
+                names.add(alias.asname or alias.name)
+    return names
+
+
+def module_path(root, module, overrides=()):
+    """The file (or namespace package directory) for a root-relative module, else None."""
+    base = os.path.join(root, *module.split("."))
+    for candidate in (base + ".py", os.path.join(base, "__init__.py")):
+        if candidate in overrides or os.path.isfile(candidate):
+            return candidate
+    if os.path.isdir(base):
+        return base
+    return None
+
+
+def _module_names(path, overrides):
+    if path in overrides:
+        try:
+            return top_level_names(ast.parse(overrides[path]))
+        except SyntaxError:
+            return None  # reported when that file is checked
+    if not path.endswith(".py"):
+        return None  # namespace package: anything may be a submodule
+    try:
+        mtime = os.path.getmtime(path)
+        cached = _names_cache.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            names = top_level_names(ast.parse(f.read()))
+    except (OSError, SyntaxError, ValueError):
+        return None
+    _names_cache[path] = (mtime, names)
+    return names
+
+
+def _resolve_relative(module, is_package, level, name):
+    package = module if is_package else module.rpartition(".")[0]
+    base = package.split(".") if package else []
+    if level > 1:
+        base = base[:len(base) - (level - 1)]
+    return ".".join(base + ([name] if name else []))
+
+
+def _check_imports(root, path, tree, module, overrides):
+    is_package = os.path.basename(path) == "__init__.py"
+    issues = []
+    module_aliases = {}  # local name -> project module it is bound to
+    names_of = {}        # module path -> its top-level names, for this file
+
+    def names(module_file):
+        if module_file not in names_of:
+            names_of[module_file] = _module_names(module_file, overrides)
+        return names_of[module_file]
+
+    def is_project(dotted):
+        return module_path(root, dotted.split(".")[0], overrides) is not None
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                if not is_project(alias.name):
+                    continue
+                if module_path(root, alias.name, overrides) is None:
+                    issues.append(issue(path, node.lineno, "symbols", f"No module named {alias.name!r} in the project"))
+                elif alias.asname or "." not in alias.name:
+                    module_aliases[alias.asname or alias.name] = alias.name
+        elif isinstance(node, ast.ImportFrom):
+            source = _resolve_relative(module, is_package, node.level, node.module) if node.level else node.module
+            if not source or not is_project(source):
+                continue
+            source_path = module_path(root, source, overrides)
+            if source_path is None:
+                issues.append(issue(path, node.lineno, "symbols", f"No module named {source!r} in the project"))
+                continue
+            defined = names(source_path)
+            for alias in node.names:
+                if alias.name == "*":
+                    continue
+                if module_path(root, f"{source}.{alias.name}", overrides) is not None:
+                    module_aliases[alias.asname or alias.name] = f"{source}.{alias.name}"
+                elif defined is not None and alias.name not in defined:
+                    issues.append(issue(
+                        path, node.lineno, "symbols", f"cannot import {alias.name!r} from {source!r}"
+                    ))
+
+    # module.attr on project modules bound by the imports above
+    for node in ast.walk(tree):
+        if (isinstance(node, ast.Attribute) and isinstance(node.ctx, ast.Load)
+                and isinstance(node.value, ast.Name) and node.value.id in module_aliases):
+            target = module_aliases[node.value.id]
+            target_path = module_path(root, target, overrides)
+            defined = names(target_path) if target_path else None
+            if (defined is not None and node.attr not in defined and not node.attr.startswith("__")
+                    and module_path(root, f"{target}.{node.attr}", overrides) is None):
+                issues.append(issue(
+                    path, node.lineno, "symbols", f"module {target!r} has no attribute {node.attr!r}"
+                ))
+    return issues
+
+
+def check_file(root, path, source, module, overrides):
+    """
+    Compile and resolve one changed file. Runs in a worker process. overrides
+    maps the changed paths this file may import to their merged source (see
+    overrides_for). Returns the issues and the top-level names the change
+    removes from the file.
+    """
+    started = time.perf_counter()
+    result = {"path": path, "issues": [], "removed": [], "seconds": 0.0}
+    if not path.endswith(".py"):
+        result["skipped"] = True
+        return result
+    try:
+        tree = ast.parse(source, filename=path)
+        compile(tree, path, "exec", dont_inherit=True)
+    except SyntaxError as e:
+        result["issues"].append(issue(path, e.lineno, "syntax", f"{e.msg}"))
+    else:
+        result["issues"].extend(_check_imports(root, path, tree, module, overrides))
+        new_names = top_level_names(tree)
+        old_names = _module_names(path, {}) if os.path.exists(path) else None
+        if new_names is not None and old_names is not None:
+            result["removed"] = sorted(old_names - new_names)
+    result["seconds"] = time.perf_counter() - started
+    return result
+
+
+def overrides_for(source, changes, modules):
+    """
+    The changes one file's check can need: those whose module name shares a
+    component with an identifier in the file, and every changed __init__.py
+    (a relative import can reach its package without naming it). Saves
+    pickling every changed source into every check_file task.
+    """
+    words = set(IDENTIFIER_RE.findall(source))
+    return {
+        path: code for path, code in changes.items()
+        if os.path.basename(path) == "__init__.py" or not words.isdisjoint(modules[path].split("."))
+    }
+
+
+def run_tests(root, changes, command, timeout):
+    """
+    Run command in a scratch copy of root with changes written in. Runs in a
+    worker process. Files are copied, not linked, so tests and tools that
+    rewrite files in place never touch the real tree.
+    """
+    started = time.perf_counter()
+    scratch = tempfile.mkdtemp(prefix="validate_")
+    try:
+        copy = os.path.join(scratch, os.path.basename(root.rstrip(os.sep)) or "root")
+        shutil.copytree(root, copy, symlinks=True, ignore=shutil.ignore_patterns(*EXCLUDE_FROM_COPY))
+        for path, code in changes.items():
+            target = os.path.join(copy, os.path.relpath(path, root))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, "w", encoding="utf-8") as f:
+                f.write(code)
+        try:
+            proc = subprocess.run(shlex.split(command), cwd=copy, capture_output=True, text=True, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            return {"path": None, "issues": [issue(None, None, "tests", f"{command!r} timed out after {timeout}s")],
+                    "removed": [], "seconds": time.perf_counter() - started}
+        issues = []
+        if proc.returncode != 0:
+            tail = "\n".join((proc.stdout + proc.stderr).strip().splitlines()[-TEST_OUTPUT_LINES:])
+            issues.append(issue(None, None, "tests", f"{command!r} exited with {proc.returncode}:\n{tail}"))
+        return {"path": None, "issues": issues, "removed": [], "seconds": time.perf_counter() - started}
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+class Validator:
+    """
+    Validates changes ({path: merged code}) on a process pool that is created
+    on first use and kept for later changes.
+    """
+    def __init__(self, max_workers=None, test_command="", test_timeout=120):
+        self.max_workers = max_workers or os.cpu_count() or 2
+        self.test_command = test_command
+        self.test_timeout = test_timeout
+        self._pool = None
+
+    def _executor(self):
+        if self._pool is None:
+            # Spawned workers don't inherit the GUI's threads, locks or Tk state
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers,
+                                             mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def validate(self, root, changes, modules, graph=None, on_result=None, job=None):
+        """
+        Check changes, calling on_result(result) as each file (and the test
+        run, whose path is None) finishes. modules maps each changed path to
+        its module name; graph is the codebase's DependencyGraph, used to find
+        files that still use a removed name. Returns all results.
+        """
+        pool = self._executor()
+        futures = [
+            pool.submit(check_file, root, path, code, modules[path], overrides_for(code, changes, modules))
+            for path, code in changes.items()
+        ]
+        if self.test_command:
+            futures.append(pool.submit(run_tests, root, changes, self.test_command, self.test_timeout))
+        results = []
+        try:
+            for future in as_completed(futures):
+                if job is not None:
+                    job.check()
+                result = future.result()
+                if graph is not None and result["removed"]:
+                    result["issues"].extend(self._removed_in_use(result, modules, changes, graph))
+                results.append(result)
+                if on_result:
+                    on_result(result)
+        finally:
+            for future in futures:
+                future.cancel()
+        return results
+
+    @staticmethod
+    def _removed_in_use(result, modules, changes, graph):
+        path = result["path"]
+        issues = []
+        for name in result["removed"]:
+            users = sorted(p for p in graph.users(f"{modules[path]}.{name}") if p != path)
+            # Changed files that use it are checked against the merged code themselves
+            users = [p for p in users if p not in changes]
+            if users:
+                shown = ", ".join(os.path.basename(p) for p in users[:5]) + (" ..." if len(users) > 5 else "")
+                issues.append(issue(path, None, "symbols", f"{name!r} is removed but still used by {shown}"))
+        return issues
+
+
+def summarize(results):
+    errors = sum(1 for r in results for i in r["issues"] if i["severity"] == "error")
+    warnings = sum(1 for r in results for i in r["issues"] if i["severity"] != "error")
+    return errors, warnings
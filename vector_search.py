@@ -0,0 +1,248 @@
+import logging
+import os
+import numpy as np
+from config import VECTOR_STORAGE, RERANK_FACTOR, PQ_SUBVECTORS, VECTOR_INDEX, IVF_LISTS, IVF_PROBES
+from codebases import version_dir, manifest_path
+from manifest import IndexManifest
+from quantize import QuantizedIndex, make_codec
+from ivf import IVFPartitions
+from docstore import resolve_documents
+import tracing
+
+SYNC_BATCH_FILES = 64
+# A scope matching more files than this is sent to Chroma as the excluded
+# complement, or failing that applied to a widening unfiltered query
+MAX_WHERE_PATHS = 2000
+
+logger = logging.getLogger(__name__)
+
+LANGUAGES = {".py": "python", ".js": "javascript", ".ts": "typescript", ".md": "markdown"}
+
+_loaded = {}  # root -> (vectors directory, mtime of vectors.json, QuantizedIndex)
+_manifest_paths = {}  # manifest path -> (mtime, [indexed paths])
+
+
+class Scope:
+    """
+    The part of a codebase a vector query searches. Every given criterion must
+    hold: paths (exact file set), prefixes (directories or path prefixes),
+    exclude (files to leave out), chunk_types ("function", "loose") and
+    languages ("python", "javascript", ...; by file extension).
+    """
+    def __init__(self, paths=None, prefixes=None, exclude=None, chunk_types=None, languages=None):
+        self.paths = set(paths) if paths is not None else None
+        self.prefixes = tuple(prefixes) if prefixes else None
+        self.exclude = set(exclude or ())
+        self.chunk_types = list(chunk_types) if chunk_types else None
+        self.languages = set(languages) if languages else None
+
+    def __repr__(self):
+        fields = {k: v for k, v in vars(self).items() if v}
+        return f"Scope({fields})"
+
+    @property
+    def needs_file_list(self):
+        """True if matching paths have to be enumerated from the manifest."""
+        return self.paths is None and (self.prefixes is not None or self.languages is not None)
+
+    def matches_path(self, path):
+        if path in self.exclude:
+            return False
+        if self.paths is not None and path not in self.paths:
+            return False
+        if self.prefixes is not None and not path.startswith(self.prefixes):
+            return False
+        if self.languages is not None and LANGUAGES.get(os.path.splitext(path)[1]) not in self.languages:
+            return False
+        return True
+
+    def where(self, all_paths):
+        """
+        Chroma where clause for this scope, or (None, True) when the path part
+        is too large to send and has to be applied after the query instead.
+        all_paths() lists every indexed file. Returns (where or None, post_filter).
+        """
+        clauses = []
+        post_filter = False
+        if self.paths is not None or self.needs_file_list:
+            candidates = self.paths if self.paths is not None else all_paths()
+            matched = sorted(p for p in candidates if self.matches_path(p))
+            if len(matched) <= MAX_WHERE_PATHS:
+                clauses.append({"path": {"$in": matched}})
+            else:
+                rest = sorted(p for p in all_paths() if not self.matches_path(p))
+                if len(rest) <= MAX_WHERE_PATHS:
+                    clauses.append({"path": {"$nin": rest}})
+                else:
+                    post_filter = True
+        elif self.exclude:
+            exclude = sorted(self.exclude)
+            clauses.append({"path": {"$nin": exclude}} if len(exclude) > 1 else {"path": {"$ne": exclude[0]}})
+        if self.chunk_types:
+            clauses.append({"chunk_type": {"$in": self.chunk_types}})
+        if not clauses:
+            return None, post_filter
+        return (clauses[0] if len(clauses) == 1 else {"$and": clauses}), post_filter
+
+
+def indexed_paths(root):
+    """Every file committed to root's active index, reloaded only when the manifest changes."""
+    path = manifest_path(root)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return []
+    cached = _manifest_paths.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    paths = list(IndexManifest(path).files)
+    _manifest_paths[path] = (mtime, paths)
+    return paths
+
+
+def vector_dir(root, version=None):
+    return os.path.join(version_dir(root, version), "vectors")
+
+
+def new_codec(storage=VECTOR_STORAGE):
+    return make_codec(storage, m=PQ_SUBVECTORS) if storage == "pq" else make_codec(storage)
+
+
+def new_ivf():
+    return IVFPartitions(IVF_LISTS) if VECTOR_INDEX == "ivf" else None
+
+
+def load_vector_index(root):
+    """The saved quantized index of root's active version, reloaded only when it changed on disk."""
+    directory = vector_dir(root)
+    try:
+        mtime = os.path.getmtime(os.path.join(directory, "vectors.json"))
+    except OSError:
+        return None
+    cached = _loaded.get(root)
+    if cached and cached[:2] == (directory, mtime):
+        return cached[2]
+    index = QuantizedIndex.load(directory, new_codec(), new_ivf())
+    _loaded[root] = (directory, mtime, index)
+    return index
+
+
+def sync_vector_index(collection, manifest, root, version=None):
+    """
+    Bring root's quantized index in line with the manifest: files whose content
+    hash differs are re-read from the collection, files no longer in the
+    manifest are dropped. Safe to call after a crash or resume since it only
+    trusts the manifest. version is the index version being built (default:
+    the active one).
+    """
+    if VECTOR_STORAGE == "float32":
+        return None
+    directory = vector_dir(root, version)
+    index = QuantizedIndex.load(directory, new_codec(), new_ivf())
+    stale = [p for p, record in manifest.files.items() if index.file_hashes.get(p) != record["hash"]]
+    gone = [p for p in index.file_hashes if p not in manifest.files]
+    index.remove_paths(stale + gone)
+
+    for i in range(0, len(stale), SYNC_BATCH_FILES):
+        batch = stale[i:i + SYNC_BATCH_FILES]
+        got = collection.get(where={"path": {"$in": batch}}, include=["embeddings", "metadatas"])
+        index.add(
+            got["ids"], [m["path"] for m in got["metadatas"]], got["embeddings"],
+            [m.get("chunk_type", "") for m in got["metadatas"]],
+        )
+        for path in batch:
+            index.file_hashes[path] = manifest.files[path]["hash"]
+
+    # New chunks are assigned to the existing IVF lists as they are added;
+    # the lists themselves are retrained only when the index has outgrown them
+    if index.maintain():
+        logger.info("Trained %d IVF lists over %d vectors", len(index.ivf.centroids), len(index))
+    index.save(directory)
+    logger.info("%s vector index: %d vectors, %.1f MiB", VECTOR_STORAGE, len(index), index.nbytes / 1024 / 1024)
+    return index
+
+
+def query_collection(collection, root, query_embedding, n_results, include=("documents", "metadatas"), scope=None):
+    """
+    Nearest chunks to query_embedding, in the same shape as collection.query(),
+    searching only within scope (a Scope) if given. The scope is applied
+    inside the search (a where clause, or a row mask on the quantized
+    codes), so n_results in-scope chunks come back when that many exist.
+    With quantized storage the compact codes pick RERANK_FACTOR * n_results
+    candidates and their exact float32 vectors decide the final order.
+    Documents stored by reference are read back from the working tree.
+    """
+    with tracing.span("vector_query", n_results=n_results, storage=VECTOR_STORAGE, scope=repr(scope) if scope else ""):
+        fields = list(include)
+        if "documents" in fields and "metadatas" not in fields:
+            fields.append("metadatas")  # resolve_documents needs them
+        results = _query_collection(collection, root, query_embedding, n_results, fields, scope)
+        if "documents" in fields:
+            with tracing.span("resolve_documents"):
+                resolve_documents(results, root)
+        if "metadatas" not in include:
+            results.pop("metadatas", None)
+        return results
+
+
+def _empty_results(include):
+    results = {"ids": [[]], "distances": [[]]}
+    for field in include:
+        results[field] = [[]]
+    return results
+
+
+def _chroma_query(collection, root, query_embedding, n_results, include, scope):
+    if scope is None:
+        return collection.query(query_embeddings=[query_embedding], n_results=n_results, include=list(include))
+    where, post_filter = scope.where(lambda: indexed_paths(root))
+    if where is not None and any(c.get("path") == {"$in": []} for c in where.get("$and", [where])):
+        return _empty_results(include)  # no indexed file is in scope
+    if not post_filter:
+        kwargs = {"where": where} if where is not None else {}
+        return collection.query(query_embeddings=[query_embedding], n_results=n_results, include=list(include), **kwargs)
+
+    # The path part is too big for a where clause: widen an unfiltered (but
+    # chunk-type filtered) query until it yields n_results in scope
+    fields = list(dict.fromkeys(list(include) + ["metadatas"]))
+    total = collection.count()
+    fetch = n_results * RERANK_FACTOR
+    while True:
+        kwargs = {"where": where} if where is not None else {}
+        got = collection.query(query_embeddings=[query_embedding], n_results=min(fetch, total), include=fields, **kwargs)
+        keep = [i for i, m in enumerate(got["metadatas"][0]) if scope.matches_path(m["path"])][:n_results]
+        if len(keep) >= n_results or fetch >= total:
+            break
+        fetch *= 4
+    results = {"ids": [[got["ids"][0][i] for i in keep]]}
+    for field in set(include) | {"distances"}:
+        if field in got and got[field] is not None:
+            results[field] = [[got[field][0][i] for i in keep]]
+    return results
+
+
+def _query_collection(collection, root, query_embedding, n_results, include, scope=None):
+    index = None if VECTOR_STORAGE == "float32" else load_vector_index(root)
+    if index is None or not len(index):
+        return _chroma_query(collection, root, query_embedding, n_results, include, scope)
+
+    query = np.asarray(query_embedding, dtype=np.float32)
+    allowed = None
+    if scope is not None:
+        allowed = index.rows_where(scope.matches_path, scope.chunk_types)
+    candidates = [cid for cid, _ in index.search(query, n_results * RERANK_FACTOR, allowed, IVF_PROBES)]
+    if not candidates:
+        return _empty_results(include)
+    fields = [f for f in include if f != "distances"]
+    got = collection.get(ids=candidates, include=["embeddings"] + fields)
+    scores = np.asarray(got["embeddings"], dtype=np.float32) @ query
+    order = np.argsort(-scores)[:n_results]
+
+    # Unit-length embeddings: squared L2 distance, matching Chroma's default space
+    results = {
+        "ids": [[got["ids"][i] for i in order]],
+        "distances": [[float(2.0 - 2.0 * scores[i]) for i in order]],
+    }
+    for field in fields:
+        results[field] = [[got[field][i] for i in order]]
+    return results